@@ -1,21 +1,83 @@
 from __future__ import annotations
 import symengine as se
 from ..Symbols import DynamicSymbol
+from ..Symbols.SymbolRegistry import current_registry
+from .Substitution import batched_subs, batched_subs_all
+from ..Instrumentation import instrumented
 from typing import Union
 
 
 
+class _OrderedSymbolSet:
+    """ Insertion ordered set of symbols, used to keep track of the inputs and outputs of a Calculation.
+    Membership tests are done with a hash lookup instead of a list scan.
+    """
+
+    def __init__(self, symbols=()) -> None:
+        self._index: dict = dict.fromkeys(symbols)
+
+    def append(self, symbol) -> None:
+        self._index[symbol] = None
+
+    def update(self, symbols) -> None:
+        self._index.update(dict.fromkeys(symbols))
+
+    def __contains__(self, symbol) -> bool:
+        return symbol in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __getitem__(self, i):
+        return list(self._index)[i]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, _OrderedSymbolSet):
+            other = list(other)
+        return list(self._index) == other
+
+    def __repr__(self) -> str:
+        return repr(list(self._index))
+
+
+def _uses_time(expr: Union[se.Expr, se.Matrix]) -> bool:
+    """ True if the derivation variable t is used outside of the dynamic symbols (and their derivatives), e.g. in sin(t)*q(t)
+    """
+    t = DynamicSymbol._derivation_variable
+    dynamic = list(expr.atoms(se.Derivative)) + list(expr.atoms(se.AppliedUndef))
+    if not dynamic:
+        return t in expr.free_symbols
+    return t in expr.xreplace({d: se.Dummy() for d in dynamic}).free_symbols
+
+
 class Calculation:
 
-    def __init__(self) -> None:
+    def __init__(self, inline: bool = True) -> None:
         """ An object to store a calculation and the variables used in it.
         Left side of the calculation has to be a Symbol or a Matrix of Symbols.
+
+        Parameters
+        ----------
+        inline : bool, optional
+            If True every earlier result is substituted into the following calculations (the variables are only defined by their inputs).
+            If False every calculation is stored as a node of a dependency graph and the intermediate variables are kept
+            in the generated code, use inlined() to substitute them where needed, by default True
         """
-        self._inputs: list[se.Symbol | se.Function] = []
-        self._outputs: list[se.Symbol | se.Function] = []
+        self._inline: bool = inline
+        self._inputs: _OrderedSymbolSet = _OrderedSymbolSet()
+        self._outputs: _OrderedSymbolSet = _OrderedSymbolSet()
         self._vars: list[se.Matrix] = []
         self._calcs: list[se.Matrix] = []
+        self._dependencies: list[tuple[int, ...]] = []
+        self._var_nodes: dict = {}
+        self._indizes_shapes: list[tuple[tuple[int, int], tuple[int, int]]] = []
+        self._code_elements: list[se.Expr] = []
+        self._code_vector: se.Matrix = None
 
+    @instrumented()
     def addCalculation(self, var: Union[se.Symbol, se.Function, se.Matrix], calc: Union[se.Expr, se.Matrix], is_matrix_input: bool = False):
         """ adds a calculation to the object
             var = calc.
@@ -50,8 +112,11 @@ class Calculation:
                     for col in range(var.cols):
                         self.addCalculation(var[row, col], se.Symbol(str(calc) + f"({row+1},{col+1})"), is_matrix_input=False)
         else:
-            for i in range(len(self._calcs)):
-                calc = calc.subs(self._vars[i], self._calcs[i])
+            if self._inline:
+                calc = self._inline_previous(calc)
+                dependencies = ()
+            else:
+                dependencies = self._find_dependencies(calc)
 
             # add calculation
             self._check_and_add_outputs(var)
@@ -62,81 +127,171 @@ class Calculation:
             if isinstance(calc, se.Expr):
                 calc = se.Matrix([calc])
 
-            self._vars.append(var)
-            self._calcs.append(calc)
+            self._append_node(var, calc, dependencies)
+
+    def _append_node(self, var: se.Matrix, calc: se.Matrix, dependencies: tuple[int, ...]) -> None:
+        """ Stores an already checked calculation and updates the flattened code vector.
+        """
+        self._vars.append(var)
+        self._calcs.append(calc)
+        self._dependencies.append(dependencies)
+        for v in var:
+            self._var_nodes[v] = len(self._vars) - 1
+
+        index = len(self._code_elements)
+        self._indizes_shapes.append(((index, index + len(calc)), calc.shape))
+        self._code_elements.extend(calc)
+        self._code_vector = None
+
+    def _inline_previous(self, calc: Union[se.Expr, se.Matrix]) -> Union[se.Expr, se.Matrix]:
+        """ Substitutes the earlier calculations into calc, with the same result as substituting every calculation in the
+        order in which they were added, but only the calculations whose variables appear in calc (or in the substituted
+        calculations) are visited.
+        """
+        if len(self._var_nodes) != len(self._code_elements):
+            # a variable is defined more than once, all definitions are substituted in order
+            for i in range(len(self._calcs)):
+                calc = calc.subs(self._vars[i], self._calcs[i])
+            return calc
+        pending = self._referenced_nodes(calc)
+        later = {i: {j for j in self._referenced_nodes(self._calcs[i]) if j > i} for i in pending}
+        if not any(later.values()):
+            # the substituted calculations don't bring in variables which would be substituted afterwards
+            subs = {v: c for i in pending for v, c in zip(self._vars[i], self._calcs[i])}
+            return batched_subs(calc, subs)
+        while pending:
+            i = min(pending)
+            calc = calc.subs(self._vars[i], self._calcs[i])
+            pending = {j for j in pending | self._referenced_nodes(self._calcs[i]) if j > i}
+        return calc
+
+    def _referenced_nodes(self, calc: Union[se.Expr, se.Matrix]) -> set[int]:
+        if not self._var_nodes:
+            return set()
+        return {self._var_nodes[a] for a in calc.atoms(se.Symbol, se.AppliedUndef) if a in self._var_nodes}
+
+    def _find_dependencies(self, calc) -> tuple[int, ...]:
+        """ Returns the indices of the earlier calculations (nodes) the given calculation depends on.
+        """
+        if not self._var_nodes:
+            return ()
+        atoms = calc.atoms(se.Symbol, se.AppliedUndef)
+        return tuple(sorted({self._var_nodes[a] for a in atoms if a in self._var_nodes}))
 
     def _check_and_add_outputs(self, var):
         """ Checks if the outputs are already defined and if issue a warning.
         """
         if isinstance(var,( se.Symbol, se.Function)):
-            if var == DynamicSymbol._derivation_variable:
-                return  # do not add the derivation variable to the outputs
-            elif self._outputs.__contains__(var):
-                print(f"WARNING: Output {var} is already defined, variable will maybe be overwritten")
+            var = [var]
+        for i in var:
+            if i == DynamicSymbol._derivation_variable:
+                continue  # do not add the derivation variable to the outputs
+            elif i in self._outputs:
+                print(f"WARNING: Output {i} is already defined, variable will maybe be overwritten")
             else:
-                self._outputs.append(var)
-        else:
-            for i in var:
-                self._check_and_add_outputs(i)
+                self._outputs.append(i)
 
     def _check_and_add_Inputs(self, calc):
-
         """ Checks if the inputs are already defined and if not, defines them.
+        The atoms of the whole expression/matrix are collected in one traversal, only when new inputs are found
+        the elements are visited in order to keep the order of the inputs stable.
         """
-        if not isinstance(calc, se.Matrix):
-            l1 = list(calc.atoms(se.Symbol))
-            l2 = list(calc.atoms(se.AppliedUndef))
-
-            if l2 != []:
-                l1.remove(DynamicSymbol._derivation_variable)
-            l = l1 + l2
-            del l1, l2
-
-            for i in l:
-                if not self._inputs.__contains__(i):
-                    self._inputs.append(i)
-        else:
-            for i in calc:
-                self._check_and_add_Inputs(i)
+        atoms = calc.atoms(se.Symbol, se.AppliedUndef)
+        new = {a for a in atoms if a not in self._inputs and (self._inline or a not in self._var_nodes)}
+        if any(isinstance(a, se.AppliedUndef) for a in atoms) and not _uses_time(calc):
+            new.discard(DynamicSymbol._derivation_variable)  # t is only an input when it is used explicitly
+        if not new:
+            return
+
+        elements = calc if isinstance(calc, se.Matrix) else [calc]
+        for element in elements:
+            symbols = list(element.atoms(se.Symbol))
+            functions = list(element.atoms(se.AppliedUndef))
+            if functions and not _uses_time(element):
+                symbols.remove(DynamicSymbol._derivation_variable)
+            for a in symbols + functions:
+                if a in new:
+                    self._inputs.append(a)
+                    new.discard(a)
+            if not new:
+                break
 
+    @instrumented()
     def subs(self, subs: dict):
         """ Substitutes the variables in the calculation.
+        All substitutions are applied in a single traversal of every expression.
         ----------
         subs : dict
             A dictionary with the substitutions.
         """
-        for i in range(len(self._vars)):
-            self._vars[i] = self._vars[i].subs(subs)
-            temp1 = self._calcs[i]
-            temp2 = self._calcs[i].subs(subs)
-            self._calcs[i] = self._calcs[i].subs(subs)
+        if not subs:
+            return
+        self._vars = batched_subs_all(self._vars, subs)
+        self._calcs = batched_subs_all(self._calcs, subs)
 
-        for i in range(len(self._inputs)):
-            self._inputs[i] = self._inputs[i].subs(subs)
+        self._inputs = _OrderedSymbolSet(batched_subs_all(list(self._inputs), subs))
+        self._outputs = _OrderedSymbolSet(batched_subs_all(list(self._outputs), subs))
 
-        for i in range(len(self._outputs)):
-            self._outputs[i] = self._outputs[i].subs(subs)
+        self._var_nodes = {v: i for i, var in enumerate(self._vars) for v in var}
+        self._code_elements = [e for calc in self._calcs for e in calc]
+        self._code_vector = None
+
+    @instrumented()
+    def to_printable(self) -> None:
+        """ Replaces the registered symbols by their printable names (see SymbolRegistry), in place like subs.
+        Only the symbols which appear in the calculation are looked up.
+        """
+        self.subs(current_registry().printable_subs(*self._vars, *self._calcs))
 
     def _generate_shape_index_list(self) -> tuple[list[tuple[tuple[int, int], tuple[int, int]]], se.Matrix]:
         """
-        Generates a list of tuples with the shape and the index for cse code generation.
+        Returns a list of tuples with the shape and the index for cse code generation and the stacked column vector of all calculations.
+        Both are kept up to date when calculations are added, the returned objects are cached and must not be modified.
+        """
+        if self._code_vector is None and self._code_elements:
+            self._code_vector = se.Matrix(len(self._code_elements), 1, self._code_elements)
+        return self._indizes_shapes, self._code_vector
+
+    @instrumented()
+    def inlined(self, variables: Union[list, se.Matrix, None] = None) -> Calculation:
+        """ Substitutes the intermediate variables into the calculations which depend on them.
+        Every calculation is only substituted once, following the dependency graph.
+        ----------
+        variables : Union[list, se.Matrix, None], optional
+            The intermediate variables which should be inlined. If None all of them are inlined, by default None
+
+        Returns
+        -------
+        Calculation
+            A new Calculation with the requested variables inlined
         """
-        indizes_shapes: list[tuple[tuple[int, int], tuple[int, int]]] = []
-        index: int = 0
-        code_vector: se.Matrix = None
+        if variables is None:
+            selected = None
+        else:
+            selected = set(se.Matrix(variables)) if isinstance(variables, se.Matrix) else set(variables)
 
+        calc = Calculation(inline=self._inline)
+        resolved: dict = {}
         for i in range(len(self._vars)):
-            indizes = (index, index + len(self._calcs[i]))
-            index = indizes[1]
-            shape = self._calcs[i].shape
-            indizes_shapes.append((indizes, shape))
+            expr = self._calcs[i]
+            if self._dependencies[i] and resolved:
+                atoms = expr.atoms(se.Symbol, se.AppliedUndef)
+                subs = {a: resolved[a] for a in atoms if a in resolved}
+                if subs:
+                    expr = expr.subs(subs)
 
-            if code_vector == None:
-                code_vector = self._calcs[i].reshape(len(self._calcs[i]), 1)
-            else:
-                code_vector = code_vector.col_join(self._calcs[i].reshape(len(self._calcs[i]), 1))
-        return indizes_shapes, code_vector
+            for v, e in zip(self._vars[i], expr):
+                if selected is None or v in selected:
+                    resolved[v] = e
+                else:
+                    resolved.pop(v, None)
+
+            calc._check_and_add_outputs(self._vars[i])
+            calc._check_and_add_Inputs(expr)
+            calc._append_node(self._vars[i], expr, calc._find_dependencies(expr) if not calc._inline else ())
+        return calc
 
+    @instrumented()
     def append_Calculation(self, calc: Calculation) -> Calculation:
         """ Appends a Calculation to the current one.
         ----------
@@ -152,24 +307,29 @@ class Calculation:
         return self
 
     @staticmethod
-    def append_Calculations(calcs: list[Calculation]) -> Calculation:
+    @instrumented()
+    def append_Calculations(calcs: list[Calculation], inline: bool = None) -> Calculation:
         """ Appends two Calculations.
         ----------
         calcs : list[Calculation]
             The Calculations to be appended.
+        inline : bool, optional
+            Mode of the resulting Calculation, if None it is only inlined when all given Calculations are inlined, by default None
         """
-        calc = Calculation()
+        if inline is None:
+            inline = all(c._inline for c in calcs)
+        calc = Calculation(inline)
         for calc1 in calcs:
             calc.append_Calculation(calc1)
         return calc
 
     @property
     def inputs(self):
-        return se.Matrix(self._inputs)
+        return se.Matrix(list(self._inputs))
 
     @property
     def outputs(self):
-        return se.Matrix(self._outputs)
+        return se.Matrix(list(self._outputs))
 
     @property
     def vars(self):
@@ -178,6 +338,17 @@ class Calculation:
     @property
     def calcs(self):
         return self._calcs
+
+    @property
+    def is_inline(self) -> bool:
+        return self._inline
+
+    @property
+    def dependencies(self) -> list[tuple[int, ...]]:
+        """ Edges of the dependency graph, for every calculation the indices of the calculations it depends on.
+        Always empty when the calculation is inlined.
+        """
+        return self._dependencies
     
     
     def __len__(self):
@@ -0,0 +1,137 @@
+from __future__ import annotations
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import symengine as se
+from typing import Iterable
+
+
+def partitioned_cse(exprs: Iterable[se.Expr], n_workers: int = None, n_clusters: int = None) -> tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr]]:
+    """ Common subexpression elimination for very large code vectors.
+    The expressions are grouped into clusters which share symbols, cse is run for every cluster
+    (in parallel on a process pool) and the results are merged. The temporaries are renamed to be globally unique
+    and temporaries which were found in more than one cluster are only kept once.
+    ----------
+    exprs : Iterable[se.Expr]
+        The expressions (e.g. the flattened code vector of a Calculation).
+    n_workers : int, optional
+        Number of processes used, if None os.cpu_count() is used, by default None
+    n_clusters : int, optional
+        Number of clusters the expressions are split into, if None n_workers is used, by default None
+
+    Returns
+    -------
+    tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr]]
+        The temporaries and the reduced expressions (same format as se.cse)
+    """
+    exprs = list(exprs)
+    if not exprs:
+        return [], []
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    if n_workers < 1:
+        raise ValueError(f"n_workers has to be at least 1 but {n_workers} was given")
+    if n_clusters is None:
+        n_clusters = n_workers
+    if n_clusters < 1:
+        raise ValueError(f"n_clusters has to be at least 1 but {n_clusters} was given")
+    if n_clusters == 1:
+        return _cse(exprs)
+
+    clusters = _cluster_expressions(exprs, n_clusters)
+    if n_workers > 1 and len(clusters) > 1:
+        results = _parallel_cse(exprs, clusters, n_workers)
+    else:
+        results = [_cse([exprs[i] for i in cluster]) for cluster in clusters]
+
+    return _merge_cse_results(results, clusters, len(exprs))
+
+
+# expressions of the running partitioned_cse, inherited by forked worker processes so they don't have to be pickled
+_shared_exprs: list[se.Expr] = []
+
+
+def _parallel_cse(exprs: list[se.Expr], clusters: list[list[int]], n_workers: int) -> list[tuple[list, list]]:
+    """ Runs cse for every cluster on a process pool. Where fork is available the workers inherit the
+    expressions and only the indices are send, otherwise the expressions are pickled.
+    """
+    global _shared_exprs
+    n_workers = min(n_workers, len(clusters))
+    if "fork" in multiprocessing.get_all_start_methods():
+        _shared_exprs = exprs
+        try:
+            with ProcessPoolExecutor(n_workers, mp_context=multiprocessing.get_context("fork")) as pool:
+                return list(pool.map(_cse_indices, clusters))
+        finally:
+            _shared_exprs = []
+    with ProcessPoolExecutor(n_workers) as pool:
+        return list(pool.map(_cse, [[exprs[i] for i in cluster] for cluster in clusters]))
+
+
+def _cse_indices(indices: list[int]) -> tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr]]:
+    return _cse([_shared_exprs[i] for i in indices])
+
+
+def _cse(exprs: list[se.Expr]) -> tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr]]:
+    """ module level wrapper so the call can be send to the worker processes
+    """
+    replacements, reduced = se.cse(exprs)
+    return list(replacements), list(reduced)
+
+
+def _cluster_expressions(exprs: list[se.Expr], n_clusters: int) -> list[list[int]]:
+    """ Greedily assigns every expression to the (not yet full) cluster with which it shares the most symbols.
+    The clusters have at most ceil(len(exprs) / n_clusters) elements so the work is balanced.
+
+    Returns
+    -------
+    list[list[int]]
+        indices of the expressions in every cluster (empty clusters are dropped)
+    """
+    n_clusters = min(n_clusters, len(exprs))
+    capacity = math.ceil(len(exprs) / n_clusters)
+    clusters: list[list[int]] = [[] for _ in range(n_clusters)]
+    cluster_atoms: list[set] = [set() for _ in range(n_clusters)]
+
+    for i, expr in enumerate(exprs):
+        # free_symbols is evaluated in the C++ core, searching for shared function calls (atoms) would
+        # take longer than the cse itself
+        signature = expr.free_symbols
+        best = None
+        best_score = None
+        for k in range(n_clusters):
+            if len(clusters[k]) >= capacity:
+                continue
+            score = (len(signature & cluster_atoms[k]), -len(clusters[k]))
+            if best_score is None or score > best_score:
+                best, best_score = k, score
+        clusters[best].append(i)
+        cluster_atoms[best] |= signature
+
+    return [c for c in clusters if c]
+
+
+def _merge_cse_results(results: list[tuple[list, list]], clusters: list[list[int]], n: int) -> tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr]]:
+    """ Renames the temporaries of all clusters to x0, x1, ... (in order), removes duplicated temporaries
+    and puts the reduced expressions back into their original order.
+    """
+    replacements: list[tuple[se.Symbol, se.Expr]] = []
+    reduced: list[se.Expr] = [None] * n
+    known: dict = {}
+
+    for (cluster_replacements, cluster_reduced), cluster in zip(results, clusters):
+        rename: dict = {}
+        for temp, expr in cluster_replacements:
+            expr = expr.xreplace(rename) if rename else expr
+            if expr in known:
+                rename[temp] = known[expr]
+            else:
+                symbol = se.Symbol(f"x{len(replacements)}")
+                rename[temp] = symbol
+                known[expr] = symbol
+                replacements.append((symbol, expr))
+        for index, expr in zip(cluster, cluster_reduced):
+            reduced[index] = expr.xreplace(rename) if rename else expr
+
+    return replacements, reduced
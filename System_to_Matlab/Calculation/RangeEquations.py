@@ -0,0 +1,144 @@
+from __future__ import annotations
+import symengine as se
+
+from ..Symbols.SymbolRegistry import current_registry
+from .Substitution import batched_subs
+from typing import Union
+
+
+class RangeEquations:
+    def __init__(self, size: int) -> None:
+        """ Vector of equations in which ranges of equal equations are given once with a symbolic index, e.g. the state
+        equations of a discretized rod with the IndexedSymbol T (positions and indices start at 1 like in Matlab):
+
+            i = se.Symbol("i")
+            f = RangeEquations(n)
+            f.set(1, c*(T[2] - T[1]))
+            f.set_range(i, 2, n - 1, c*(T[i - 1] - 2*T[i] + T[i + 1]))
+            f.set(n, c*(T[n - 1] - T[n]))
+            system.addStateEquations(f)
+
+        expand() returns the equations as usual Matrix (used for linearize, compile, C functions, ...), the Matlab
+        functions emit the ranges as for loops or slice expressions instead of one line per equation.
+
+        Parameters
+        ----------
+        size : int
+            number of equations
+        """
+        if size <= 0:
+            raise ValueError("size has to be greater than 0")
+        self._size: int = size
+        self._scalars: dict[int, se.Expr] = {}
+        self._ranges: list[tuple[se.Symbol, int, int, se.Expr]] = []
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def scalars(self) -> dict[int, se.Expr]:
+        """ the single equations as {position: expression}
+        """
+        return dict(self._scalars)
+
+    @property
+    def ranges(self) -> list[tuple[se.Symbol, int, int, se.Expr]]:
+        """ the ranges as [(index, start, stop, expression)], start and stop are included
+        """
+        return list(self._ranges)
+
+    def set(self, position: int, expr: se.Expr) -> None:
+        """ sets the equation at the given (1 based) position
+        """
+        self._check_free(position, position)
+        self._scalars[position] = se.sympify(expr)
+
+    def set_range(self, index: se.Symbol, start: int, stop: int, expr: se.Expr) -> None:
+        """ sets the equations at the positions start..stop (1 based, stop included) to expr with index = position
+
+        Parameters
+        ----------
+        index : se.Symbol
+            index of the range, used in the expression e.g. as T[index - 1]
+        start : int
+            first position
+        stop : int
+            last position
+        expr : se.Expr
+            expression of the equations
+        """
+        if not isinstance(index, se.Symbol):
+            raise TypeError(f"index has to be a Symbol but {type(index)} was given")
+        if stop < start:
+            raise ValueError(f"stop has to be at least start but {start} and {stop} were given")
+        self._check_free(start, stop)
+        self._ranges.append((index, start, stop, se.sympify(expr)))
+
+    def _check_free(self, start: int, stop: int) -> None:
+        if start < 1 or stop > self._size:
+            raise IndexError(f"positions {start}..{stop} are out of range 1..{self._size}")
+        for position in self._scalars:
+            if start <= position <= stop:
+                raise ValueError(f"equation {position} is already set")
+        for _, first, last, _ in self._ranges:
+            if start <= last and first <= stop:
+                raise ValueError(f"equations {max(start, first)}..{min(stop, last)} are already set")
+
+    def subs(self, subs: dict) -> RangeEquations:
+        """ returns a copy with the substitutions applied to all expressions (see batched_subs)
+        """
+        result = RangeEquations(self._size)
+        result._scalars = {p: batched_subs(e, subs) for p, e in self._scalars.items()}
+        result._ranges = [(index, start, stop, batched_subs(e, subs)) for index, start, stop, e in self._ranges]
+        return result
+
+    def expand(self) -> se.Matrix:
+        """ the equations as column vector, the ranges are expanded and the indexed array elements (e.g. T(i - 1))
+        are replaced by the variables of their IndexedSymbol
+
+        Raises
+        ------
+        ValueError
+            if an equation is not set
+        """
+        equations: list[se.Expr] = [None]*self._size
+        for position, expr in self._scalars.items():
+            equations[position - 1] = _resolve(expr, {})
+        for index, start, stop, expr in self._ranges:
+            for position in range(start, stop + 1):
+                equations[position - 1] = _resolve(expr, {index: se.Integer(position)})
+        missing = [i + 1 for i, e in enumerate(equations) if e is None]
+        if missing:
+            raise ValueError(f"the equations {missing} are not set")
+        return se.Matrix(equations)
+
+    def arrays(self) -> set[str]:
+        """ names of the indexed symbols which are used with a symbolic index
+        """
+        return {a.get_name() for a in indexed_elements(*[r[3] for r in self._ranges])}
+
+
+def indexed_elements(*exprs: se.Basic) -> set[se.Basic]:
+    """ the indexed array elements (e.g. T(i - 1) of an IndexedSymbol) of the expressions
+    """
+    registry = current_registry()
+    elements = set()
+    for expr in exprs:
+        elements |= {a for a in expr.atoms(se.AppliedUndef) if registry.array(a.get_name()) is not None}
+    return elements
+
+
+def _resolve(expr: se.Expr, index_subs: dict) -> se.Expr:
+    """ inserts the index and replaces the indexed array elements by the variables
+    """
+    subs = dict(index_subs)
+    for element in indexed_elements(expr):
+        position = element.args[0].subs(index_subs)
+        if not position.is_Integer:
+            raise ValueError(f"the index of {element} is not an integer for {index_subs}")
+        variables = current_registry().array(element.get_name())
+        if not 1 <= int(position) <= len(variables):
+            raise IndexError(f"{element} is out of range 1..{len(variables)} for {index_subs}")
+        subs[element] = variables[int(position) - 1]
+    return expr.subs(subs) if subs else expr
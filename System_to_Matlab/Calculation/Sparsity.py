@@ -0,0 +1,117 @@
+from __future__ import annotations
+import symengine as se
+from typing import Iterable, Union
+
+
+class SparsityPattern:
+    def __init__(self, shape: tuple[int, int], entries: Iterable[tuple[int, int]]) -> None:
+        """ Index structure of the (structurally) nonzero entries of a matrix. Indices start at 0.
+
+        Parameters
+        ----------
+        shape : tuple[int, int]
+            shape of the matrix
+        entries : Iterable[tuple[int, int]]
+            (row, column) of the nonzero entries
+        """
+        self._shape: tuple[int, int] = (int(shape[0]), int(shape[1]))
+        self._entries: list[tuple[int, int]] = sorted(set((int(i), int(j)) for i, j in entries))
+        for i, j in self._entries:
+            if not (0 <= i < self._shape[0] and 0 <= j < self._shape[1]):
+                raise ValueError(f"entry ({i}, {j}) is outside of a matrix with the shape {self._shape}")
+        self._row_entries: dict[int, list[int]] = {}
+        for i, j in self._entries:
+            self._row_entries.setdefault(i, []).append(j)
+
+    @classmethod
+    def from_expressions(cls, exprs: Union[se.Matrix, list], variables: Union[se.Matrix, list]) -> SparsityPattern:
+        """ Structural pattern of the jacobian d(exprs)/d(variables): entry (i, j) is nonzero if variable j is one of
+        the atoms (Symbols or functions of time) of expression i. No derivatives are calculated.
+        """
+        exprs = list(exprs)
+        variables = list(variables)
+        index = {v: j for j, v in enumerate(variables)}
+        entries = []
+        for i, expr in enumerate(exprs):
+            for atom in se.sympify(expr).atoms(se.Symbol, se.AppliedUndef):
+                if atom in index:
+                    entries.append((i, index[atom]))
+        return cls((len(exprs), len(variables)), entries)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self._shape
+
+    @property
+    def nnz(self) -> int:
+        """ number of nonzero entries """
+        return len(self._entries)
+
+    @property
+    def density(self) -> float:
+        size = self._shape[0] * self._shape[1]
+        return self.nnz / size if size else 0.0
+
+    @property
+    def rows(self) -> list[int]:
+        """ row indices of the nonzero entries (sorted by row, then column) """
+        return [e[0] for e in self._entries]
+
+    @property
+    def cols(self) -> list[int]:
+        """ column indices of the nonzero entries (sorted by row, then column) """
+        return [e[1] for e in self._entries]
+
+    def row(self, i: int) -> list[int]:
+        """ columns of the nonzero entries in row i """
+        return list(self._row_entries.get(i, []))
+
+    def to_dense(self) -> list[list[bool]]:
+        dense = [[False] * self._shape[1] for _ in range(self._shape[0])]
+        for i, j in self._entries:
+            dense[i][j] = True
+        return dense
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, entry: tuple[int, int]) -> bool:
+        return entry[1] in self._row_entries.get(entry[0], ())
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SparsityPattern):
+            return NotImplemented
+        return self._shape == other._shape and self._entries == other._entries
+
+    def __repr__(self) -> str:
+        return f"SparsityPattern(shape={self._shape}, nnz={self.nnz})"
+
+
+def sparse_jacobian(exprs: Union[se.Matrix, list], variables: Union[se.Matrix, list], pattern: SparsityPattern = None) -> se.Matrix:
+    """ Jacobian which only differentiates the structurally nonzero entries.
+    ----------
+    exprs : Union[se.Matrix, list]
+        column vector of expressions
+    variables : Union[se.Matrix, list]
+        variables
+    pattern : SparsityPattern, optional
+        the sparsity pattern, calculated if it is not given, by default None
+
+    Returns
+    -------
+    se.Matrix
+        the (dense) jacobian
+    """
+    exprs = list(exprs)
+    variables = list(variables)
+    if pattern is None:
+        pattern = SparsityPattern.from_expressions(exprs, variables)
+    if pattern.shape != (len(exprs), len(variables)):
+        raise ValueError(f"the pattern has the shape {pattern.shape} but the jacobian has the shape {(len(exprs), len(variables))}")
+    jacobian = se.zeros(len(exprs), len(variables))
+    for i, j in pattern:
+        jacobian[i, j] = se.diff(exprs[i], variables[j])
+    return jacobian
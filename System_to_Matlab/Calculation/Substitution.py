@@ -0,0 +1,112 @@
+from __future__ import annotations
+import symengine as se
+from ..Symbols import DynamicSymbol
+from typing import Union
+
+
+def batched_subs(expr: Union[se.Basic, se.Matrix], subs: dict) -> Union[se.Basic, se.Matrix]:
+    """ Applies all substitutions of the given dictionary in a single traversal of the expression.
+    If all keys are Symbols or Functions of t (and no derivative could be affected) xreplace is used,
+    which only does structural matching, otherwise the (also simultaneous) subs is used.
+    ----------
+    expr : Union[se.Basic, se.Matrix]
+        The expression or Matrix in which the substitutions should be made.
+    subs : dict
+        A dictionary with all substitutions.
+
+    Returns
+    -------
+    Union[se.Basic, se.Matrix]
+        The expression with the substitutions applied
+    """
+    if not subs:
+        return expr
+    if _xreplace_is_valid(expr, subs):
+        return expr.xreplace(subs)
+    return expr.subs(subs)
+
+
+def combine_subs(keys: Union[list, se.Matrix], values: Union[list, se.Matrix], subs: dict = None) -> dict:
+    """ Combines element wise substitutions (keys[i] -> values[i]) into one dictionary.
+    ----------
+    keys : Union[list, se.Matrix]
+        The expressions which should be replaced.
+    values : Union[list, se.Matrix]
+        The replacements.
+    subs : dict, optional
+        An existing dictionary which should be extended, by default None
+
+    Returns
+    -------
+    dict
+        The combined substitution dictionary
+    """
+    if subs is None:
+        subs = {}
+    if len(keys) != len(values):
+        raise ValueError(f"keys and values have to have the same length but {len(keys)} and {len(values)} were given")
+    subs.update(zip(keys, values))
+    return subs
+
+
+def batched_subs_all(exprs: list[Union[se.Basic, se.Matrix]], subs: dict) -> list[Union[se.Basic, se.Matrix]]:
+    """ batched_subs of several expressions with the same substitutions, the keys are only checked once.
+    ----------
+    exprs : list[Union[se.Basic, se.Matrix]]
+        The expressions or Matrices in which the substitutions should be made.
+    subs : dict
+        A dictionary with all substitutions.
+
+    Returns
+    -------
+    list[Union[se.Basic, se.Matrix]]
+        The expressions with the substitutions applied
+    """
+    if not subs:
+        return list(exprs)
+    atoms_only, has_functions = _classify_keys(subs)
+    result = list(exprs)
+    # the expressions which can use xreplace are stacked into one column, the dictionary is only converted once
+    stacked: list[int] = []
+    elements: list[se.Basic] = []
+    for i, expr in enumerate(result):
+        if atoms_only and not (has_functions and expr.atoms(se.Derivative)):
+            stacked.append(i)
+            elements.extend(expr if isinstance(expr, se.MatrixBase) else [expr])
+        else:
+            result[i] = expr.subs(subs)
+    if elements:
+        replaced = list(se.Matrix(len(elements), 1, elements).xreplace(subs))
+        start = 0
+        for i in stacked:
+            expr = result[i]
+            if isinstance(expr, se.MatrixBase):
+                result[i] = se.Matrix(expr.rows, expr.cols, replaced[start:start + len(expr)])
+                start += len(expr)
+            else:
+                result[i] = replaced[start]
+                start += 1
+    return result
+
+
+def _xreplace_is_valid(expr: Union[se.Basic, se.Matrix], subs: dict) -> bool:
+    """ xreplace gives the same result as subs as long as the keys are atoms and no derivative of a key is replaced.
+    """
+    atoms_only, has_functions = _classify_keys(subs)
+    if not atoms_only:
+        return False
+    if has_functions:
+        return not expr.atoms(se.Derivative)
+    return True
+
+
+def _classify_keys(subs: dict) -> tuple[bool, bool]:
+    """ (all keys are Symbols (but not t) or Functions, some keys are Functions)
+    """
+    has_functions = False
+    for key in subs:
+        if isinstance(key, se.AppliedUndef):
+            has_functions = True
+        elif not isinstance(key, se.Symbol) or key == DynamicSymbol._derivation_variable:
+            return False, has_functions
+    return True, has_functions
@@ -1,3 +1,7 @@
 from .Calculation import Calculation
+from .Substitution import batched_subs, combine_subs
+from .PartitionedCSE import partitioned_cse
+from .Sparsity import SparsityPattern, sparse_jacobian
+from .RangeEquations import RangeEquations
 
-__all__ = ["Calculation"]
+__all__ = ["Calculation", "batched_subs", "combine_subs", "partitioned_cse", "SparsityPattern", "sparse_jacobian", "RangeEquations"]
\ No newline at end of file
@@ -0,0 +1,109 @@
+from __future__ import annotations
+from ..MatlabElements import CodeElement
+from ...Calculation.Calculation import Calculation
+from ...Printers import CPrinter
+from ...Instrumentation import stage
+
+import symengine as se
+
+
+class CCodeElement(CodeElement):
+    _indentation_string: str = "    "
+
+    def __init__(self, code: Calculation, indent: int = 0, use_cse: bool = True,
+                 cse_result: tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr]] = None,
+                 cse_mode: str = "single", n_workers: int = None, ctype: str = "double", single_precision: bool = False,
+                 column_major: bool = False, arrays: set[str] = None):
+        """ Code Element for the C File Generators. Temporaries and scalar variables are declared as local constants,
+        vector and matrix results are written into arrays with the name of the variable, which are declared as local arrays
+        unless they are given in arrays (e.g. the outputs of a function).
+        With override_lhs all results are written one after another into the array lhs.
+
+        Parameters
+        ----------
+        code : Calculation
+            code which should be generated
+        indent : int, optional
+            how much indents should be added at the front of every line, by default 0
+        use_cse : bool, optional
+            Sets if cse should be used on the code, by default True
+        cse_result : tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr]], optional
+            already calculated cse (temporaries, reduced code vector) of the code, e.g. from a SharedCSE, by default None
+        cse_mode : str, optional
+            "single" or "partitioned", see CodeElement, by default "single"
+        n_workers : int, optional
+            number of processes used for the partitioned cse, by default None
+        ctype : str, optional
+            type of the local variables, by default "double"
+        single_precision : bool, optional
+            if True float functions and literals are used, see CPrinter, by default False
+        column_major : bool, optional
+            if True matrix results are stored column by column (like Matlab/Simulink), otherwise row by row, by default False
+        arrays : set[str], optional
+            names of variables which are always written into arrays (also if they are scalars), these arrays have to be
+            declared outside, by default None
+        """
+        CodeElement.__init__(self, code, indent, use_cse, False, cse_result=cse_result, cse_mode=cse_mode, n_workers=n_workers)
+        self._printer: CPrinter = CPrinter(single_precision)
+        self._ctype: str = ctype
+        self._column_major: bool = column_major
+        self._arrays: set[str] = arrays or set()
+
+    def generateCode(self) -> str:
+        indizes_shapes, code_vector = self._code._generate_shape_index_list()
+        if code_vector is None and self._cse_result is None:
+            return ""
+        if self._use_cse:
+            f1, f2 = self._cse(code_vector)
+        else:
+            f1, f2 = [], list(code_vector)
+        with stage("CodeElement.print"):
+            return self._print_cse(indizes_shapes, f1, f2)
+
+    def _print_cse(self, indizes_shapes: list[tuple[tuple[int, int], tuple[int, int]]], f1: list[tuple[se.Symbol, se.Expr]],
+                   f2: list[se.Expr]) -> str:
+        indent = self._Indentation * self._indentation_string
+        s = ""
+        for temp in f1:
+            s += indent + f"const {self._ctype} " + self._print(temp[0]) + " = " + self._print(temp[1]) + ";\n"
+        if f1 != []:
+            s += "\n"
+
+        names = [self._print(name) for (index, shape), var in zip(indizes_shapes, self._code._vars) if var.shape == shape for name in var]
+        names = [name for name in names if name not in self._arrays]
+        repeated = {name for name in names if names.count(name) > 1}
+        declared = set()
+        offset = 0
+        for (index, shape), var in zip(indizes_shapes, self._code._vars):
+            code = f2[index[0]:index[1]]
+            if self._override:
+                # all results are written one after another into the array lhs
+                name = self._print(self._lhs[0])
+                for k, element in enumerate(code):
+                    s += indent + f"{name}[{offset + k}] = " + self._print(element) + ";\n"
+                offset += len(code)
+            elif var.shape == shape and self._print(var[0]) not in self._arrays:
+                for name, element in zip(var, code):
+                    name = self._print(name)
+                    value = self._print(element)
+                    if name == value:
+                        # e.g. states which are also outputs, they are already declared
+                        continue
+                    if name in declared:
+                        s += indent + name + " = " + value + ";\n"
+                    else:
+                        # variables which are assigned more than once can not be constants
+                        qualifier = "" if name in repeated else "const "
+                        s += indent + f"{qualifier}{self._ctype} " + name + " = " + value + ";\n"
+                        declared.add(name)
+            else:
+                name = self._print(var[0])
+                rows, cols = shape
+                if name not in self._arrays and name not in declared:
+                    # local vector (matrix) variables, the arrays (e.g. the outputs) are declared outside
+                    s += indent + f"{self._ctype} {name}[{rows*cols}];\n"
+                    declared.add(name)
+                for k, element in enumerate(code):
+                    position = (k % cols) * rows + k // cols if self._column_major else k
+                    s += indent + f"{name}[{position}] = " + self._print(element) + ";\n"
+        return s
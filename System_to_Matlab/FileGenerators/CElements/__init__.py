@@ -0,0 +1,3 @@
+from .CCodeElement import CCodeElement
+
+__all__ = ["CCodeElement"]
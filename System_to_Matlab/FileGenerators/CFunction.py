@@ -0,0 +1,191 @@
+from __future__ import annotations
+import os
+from .FileGenerators import FileGenerator
+from .MatlabElements import StringElement
+from .CElements import CCodeElement
+from ..Calculation.Calculation import Calculation
+from ..Symbols.SymbolRegistry import current_registry
+from ..Printers import CPrinter
+from ..Instrumentation import instrumented
+
+import symengine as se
+
+
+class CFunction(FileGenerator):
+    """
+    A portable C99 function (a .c file with the function and a .h file with its prototype).
+    All inputs and outputs are passed as arrays: void name(const double *in_1, ..., double *out_1, ...).
+    Vector inputs and outputs are stored element by element, matrices row by row, scalars as arrays with one element.
+    """
+
+    def __init__(self, filename: str, path: str = "", inline: bool = True, cse_mode: str = "single", n_workers: int = None,
+                 single_precision: bool = False, batch: bool = False) -> None:
+        """Generates an instance of the CFunction class.
+
+        Parameters
+        ----------
+        filename : str
+            The name of the function (also of the files <filename>.c and <filename>.h)
+        path : str, optional
+            Path in which the files should be saved , by default ""
+        inline : bool, optional
+            If False the intermediate variables of the calculations are kept in the generated code instead of being inlined, by default True
+        cse_mode : str, optional
+            cse mode of the calculations ("single" or "partitioned"), see CodeElement, by default "single"
+        n_workers : int, optional
+            number of processes for the partitioned cse, by default None
+        single_precision : bool, optional
+            if True float is used instead of double (and the float functions of math.h), by default False
+        batch : bool, optional
+            if True the function <filename>_batch(n, in_1, stride_1, ..., out_1, ...) is generated as well, which evaluates n points.
+            The inputs of point i start at in_k + i*stride_k (stride 0 uses the same values for all points), the outputs are
+            stored one point after another, by default False
+        """
+        filename = filename.removesuffix(".c")
+        super().__init__(filename + ".c", path)
+
+        self._name: str = filename
+        self._Outputs: list[tuple[str, int]] = []
+        self._Outputs_Calcs: Calculation = Calculation()
+        self._Inputs: list[tuple[str, list[se.Basic]]] = []
+        self._Calculations: Calculation = Calculation(inline)
+        self._cse_mode: str = cse_mode
+        self._n_workers: int = n_workers
+        self._single_precision: bool = single_precision
+        self._ctype: str = "float" if single_precision else "double"
+        self._batch: bool = batch
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def addInput(self, input: se.Symbol | se.Function | se.Matrix, name: str = "") -> None:
+        """Adds an input to the function.
+        ----------
+        input : se.Symbol | se.Function | se.Matrix
+            The input to be added.
+        name : str, optional
+            The name of the input array. If non is given the name of the Symbol itself is used (Matrix inputs have to have a name). Defaults to "".
+        """
+        if isinstance(input, se.Matrix):
+            if name == "":
+                raise ValueError("Matrix inputs have to have a name")
+            elements = list(input)
+        else:
+            elements = [input]
+            if name == "":
+                name = CPrinter().doprint(current_registry().to_printable(input))
+        self._Inputs.append((str(name), elements))
+
+    def addOutput(self, output: se.Basic | se.Matrix, name: str) -> None:
+        """Adds an output to the function.
+        ----------
+        output : se.Basic | se.Matrix
+            The output (expression or Matrix) to be added.
+        name : str
+            The name of the output array.
+        """
+        if not isinstance(output, se.Matrix):
+            output = se.Matrix([output])
+        self._Outputs.append((str(name), len(output)))
+        self._Outputs_Calcs.addCalculation(se.Symbol(str(name)), se.Matrix(list(output)))
+
+    def addCalculation(self, calc: Calculation) -> None:
+        """Adds a calculation to the function.
+
+        Parameters
+        ----------
+        calc : Calculation
+            The calculation to be added.
+        """
+        if not isinstance(calc, Calculation):
+            raise TypeError(f"The calculation has to be a Calculation but {type(calc)} was given")
+        self._Calculations.append_Calculation(calc)
+
+    @property
+    def input_sizes(self) -> list[int]:
+        return [len(elements) for _, elements in self._Inputs]
+
+    @property
+    def output_sizes(self) -> list[int]:
+        return [size for _, size in self._Outputs]
+
+    def _signature(self) -> str:
+        """PRIVATE Generates the signature of the function
+        """
+        arguments = [f"const {self._ctype} *{name}" for name, _ in self._Inputs]
+        arguments += [f"{self._ctype} *{name}" for name, _ in self._Outputs]
+        return f"void {self._name}(" + ", ".join(arguments) + ")"
+
+    def _batch_signature(self) -> str:
+        """PRIVATE Generates the signature of the batch function
+        """
+        arguments = ["long n"]
+        arguments += [f"const {self._ctype} *{name}, long {name}_stride" for name, _ in self._Inputs]
+        arguments += [f"{self._ctype} *{name}" for name, _ in self._Outputs]
+        return f"void {self._name}_batch(" + ", ".join(arguments) + ")"
+
+    def _batch_function(self) -> str:
+        """PRIVATE Generates the batch function, which calls the function once per point
+        """
+        arguments = [f"{name} + i*{name}_stride" for name, _ in self._Inputs]
+        arguments += [f"{name} + i*{size}" for name, size in self._Outputs]
+        return (self._batch_signature() + "\n{\n"
+                "    long i;\n"
+                "    for (i = 0; i < n; i++) {\n"
+                f"        {self._name}(" + ", ".join(arguments) + ");\n"
+                "    }\n"
+                "}\n")
+
+    def _header(self) -> str:
+        """PRIVATE Generates the content of the header file
+        """
+        guard = self._name.upper() + "_H"
+        s = f"#ifndef {guard}\n#define {guard}\n\n"
+        s += self._signature() + ";\n"
+        if self._batch:
+            s += self._batch_signature() + ";\n"
+        return s + "\n#endif\n"
+
+    @instrumented()
+    def generateFile(self, overwrite: bool = True) -> None:
+        """Generates the files with the given name and path. If the files already exist, they will be overwritten (if you don't want this to happen set the overwrite to false).
+
+        Parameters
+        ----------
+        overwrite : bool, optional
+            Defines if the files should be overwritten , by default True
+        """
+        if self._Path is None or self._Path == "":
+            path = self._Filename
+        else:
+            path = os.path.join(self._Path, self._Filename)
+        if not overwrite and os.path.exists(path):
+            print("File already exists")
+            return
+
+        calc = Calculation.append_Calculations([self._Calculations, self._Outputs_Calcs])
+        element = CCodeElement(calc, 1, True, cse_mode=self._cse_mode, n_workers=self._n_workers, ctype=self._ctype,
+                               single_precision=self._single_precision, arrays={name for name, _ in self._Outputs})
+        code_vector = calc._generate_shape_index_list()[1]
+        used = set() if code_vector is None else set().union(*(se.sympify(e).free_symbols for e in code_vector))
+
+        printer = CPrinter()
+        unpack = ""
+        for name, elements in self._Inputs:
+            for i, e in enumerate(elements):
+                e = current_registry().to_printable(e)
+                if e in used:
+                    unpack += f"    const {self._ctype} {printer.doprint(e)} = {name}[{i}];\n"
+
+        self._Elements.append(StringElement(f"#include <math.h>\n#include \"{self._name}.h\"\n\n"))
+        self._Elements.append(StringElement(self._signature() + "\n{\n"))
+        self._Elements.append(StringElement(unpack + "\n" if unpack else ""))
+        self._Elements.append(element)
+        self._Elements.append(StringElement("}\n"))
+        if self._batch:
+            self._Elements.append(StringElement("\n" + self._batch_function()))
+
+        self._write_file(path)
+        with open(path[:-2] + ".h", "w") as f:
+            f.write(self._header())
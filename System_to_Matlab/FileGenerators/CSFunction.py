@@ -0,0 +1,216 @@
+from __future__ import annotations
+from .SFunction import SFunction
+from .MatlabElements import StringElement
+from .CElements import CCodeElement
+from ..Calculation.Calculation import Calculation
+from ..Symbols.SymbolRegistry import current_registry
+from ..Printers import CPrinter
+from ..Instrumentation import instrumented
+import os
+import symengine as se
+
+
+class CSFunction(SFunction):
+    """
+    A C-MEX S-Function (level 2) of a dynamic system. The block has the parameters (params, x_ic) like the level 1
+    SFunction, one input port with all inputs and one output port with all outputs.
+    The parameters are read once in mdlStart and kept (together with the temporaries which only depend on the parameters)
+    in the real work vector, so they are not tunable.
+    """
+    _extension: str = ".c"
+
+    def __init__(self, Filename: str, Path: str = "", single_precision: bool = False) -> None:
+        """ Generates an instance of the CSFunction class.
+
+        Parameters
+        ----------
+        Filename : str
+            The name of the file to be generated (also the name of the S-Function). If the file does not end with .c, it will be added.
+        Path : str, optional
+            Path in which the file should me saved if non is given the current path is used , by default ""
+        single_precision : bool, optional
+            if True the calculations use the float functions of math.h (the signals are still real_T), by default False
+        """
+        super().__init__(Filename, Path)
+        self._single_precision: bool = single_precision
+
+    @property
+    def name(self) -> str:
+        return self._Filename[:-len(self._extension)]
+
+    def _state_list(self) -> list[se.Symbol]:
+        """PRIVATE Returns the (printable) symbols of the states
+        """
+        return [current_registry().to_printable(state) for state in self._States]
+
+    def _unpack(self, symbols: list[se.Symbol], source: str, used: set[se.Symbol], indent: str, offset: int = 0) -> str:
+        """PRIVATE Declares the used symbols as local constants, read from source (format string with the index i)
+        """
+        printer = CPrinter()
+        s = ""
+        for i, symbol in enumerate(symbols):
+            if symbol in used:
+                s += indent + f"const real_T {printer.doprint(symbol)} = {source.format(i=i + offset)};\n"
+        return s
+
+    def _section(self, shared, index: int, exclude: set[se.Symbol], hoisted: list[se.Symbol], lhs: str) -> list:
+        """PRIVATE Generates the body of mdlDerivatives (index 0) or mdlOutputs (index 1): the used states, inputs, parameters
+        and hoisted temporaries are read into local constants before the calculation, the results are written into lhs
+        """
+        temporaries, reduced = shared.cse_result(index, exclude)
+        used = set()
+        for expr in [t[1] for t in temporaries] + list(reduced):
+            used |= se.sympify(expr).free_symbols
+        parameters = [current_registry().to_printable(p) for p in self._parameter_list()]
+
+        states = self._unpack(self._state_list(), "ss_x[{i}]", used, "    ")
+        inputs = self._unpack(self._input_list(), "*ss_u[{i}]", used, "    ")
+        work = self._unpack(parameters, "ss_rwork[{i}]", used, "    ") + self._unpack(hoisted, "ss_rwork[{i}]", used, "    ", len(parameters))
+
+        s = ""
+        if states:
+            s += "    const real_T *ss_x = ssGetContStates(S);\n"
+        if inputs:
+            s += "    InputRealPtrsType ss_u = ssGetInputPortRealSignalPtrs(S, 0);\n"
+        if work:
+            s += "    const real_T *ss_rwork = ssGetRWork(S);\n"
+        s += f"    real_T *ss_{lhs} = " + ("ssGetdX(S)" if index == 0 else "ssGetOutputPortRealSignal(S, 0)") + ";\n\n"
+        s += states + inputs + work
+        element = CCodeElement(shared.codes[index], 1, True, cse_result=(temporaries, reduced), ctype="real_T",
+                               single_precision=self._single_precision, arrays={"ss_y"})
+        if index == 0:
+            element.override_lhs(se.Symbol("ss_dx"))
+        return [StringElement(s + "\n" if states + inputs + work else s), element]
+
+    @instrumented()
+    def generateFile(self, overwrite: bool = True, hoist_parameters: bool = True) -> None:
+        """Generates the file with the given name and path. If the file already exists, it will be overwritten. (If you don't want to overwrite the file, set overwrite to False)
+
+        Parameters
+        ----------
+        overwrite : bool, optional
+            Defines if the file should be overwritten, by default True
+        hoist_parameters : bool, optional
+            If True the cse temporaries which only depend on the parameters are calculated once in mdlStart, by default True
+        """
+        if self._Path is None or self._Path == "":
+            path = self._Filename
+        else:
+            path = os.path.join(self._Path, self._Filename)
+        if not overwrite and os.path.exists(path):
+            return
+
+        n_states = len(self._States)
+        n_inputs = len(self._input_list())
+        n_outputs = len(self._Outputs)
+        parameters = self._parameter_list()
+        feedthrough = self._direct_feedthrough()
+        shared, hoisted, hoisted_set = self._shared_cse("ss_y", hoist_parameters)
+        n_work = len(parameters) + len(hoisted)
+
+        self._Elements.append(StringElement(
+            f"#define S_FUNCTION_NAME {self.name}\n"
+            "#define S_FUNCTION_LEVEL 2\n\n"
+            "#include \"simstruc.h\"\n"
+            "#include <math.h>\n\n"
+            f"#define NUM_PARAMS {len(parameters)}\n"
+            f"#define NUM_STATES {n_states}\n\n"))
+
+        self._Elements.append(StringElement(
+            "static void mdlInitializeSizes(SimStruct *S)\n{\n"
+            "    ssSetNumSFcnParams(S, 2);  /* params, x_ic */\n"
+            "    if (ssGetNumSFcnParams(S) != ssGetSFcnParamsCount(S)) {\n"
+            "        return;\n"
+            "    }\n"
+            "    /* the parameters are only read in mdlStart */\n"
+            "    ssSetSFcnParamTunable(S, 0, 0);\n"
+            "    ssSetSFcnParamTunable(S, 1, 0);\n\n"
+            "    ssSetNumContStates(S, NUM_STATES);\n"
+            "    ssSetNumDiscStates(S, 0);\n\n"))
+        if n_inputs:
+            self._Elements.append(StringElement(
+                "    if (!ssSetNumInputPorts(S, 1)) return;\n"
+                f"    ssSetInputPortWidth(S, 0, {n_inputs});\n"
+                f"    ssSetInputPortDirectFeedThrough(S, 0, {int(feedthrough)});\n\n"))
+        else:
+            self._Elements.append(StringElement("    if (!ssSetNumInputPorts(S, 0)) return;\n\n"))
+        self._Elements.append(StringElement(
+            "    if (!ssSetNumOutputPorts(S, 1)) return;\n"
+            f"    ssSetOutputPortWidth(S, 0, {n_outputs});\n\n"
+            "    ssSetNumSampleTimes(S, 1);\n"
+            f"    ssSetNumRWork(S, {n_work});  /* parameters and parameter dependent temporaries */\n"
+            "    ssSetNumIWork(S, 0);\n"
+            "    ssSetNumPWork(S, 0);\n"
+            "    ssSetNumModes(S, 0);\n"
+            "    ssSetNumNonsampledZCs(S, 0);\n"
+            "    ssSetOptions(S, SS_OPTION_EXCEPTION_FREE_CODE);\n"
+            "}\n\n"))
+
+        self._Elements.append(StringElement(
+            "static void mdlInitializeSampleTimes(SimStruct *S)\n{\n"
+            "    ssSetSampleTime(S, 0, CONTINUOUS_SAMPLE_TIME);\n"
+            "    ssSetOffsetTime(S, 0, 0.0);\n"
+            "}\n\n"))
+
+        self._Elements.append(StringElement(
+            "#define MDL_INITIALIZE_CONDITIONS\n"
+            "static void mdlInitializeConditions(SimStruct *S)\n{\n"
+            "    real_T *ss_x = ssGetContStates(S);\n"
+            "    const real_T *x_ic = mxGetPr(ssGetSFcnParam(S, 1));\n"
+            "    int_T i;\n\n"
+            "    if (mxGetNumberOfElements(ssGetSFcnParam(S, 1)) != NUM_STATES) {\n"
+            f"        ssSetErrorStatus(S, \"x_ic has to have {n_states} elements\");\n"
+            "        return;\n"
+            "    }\n"
+            "    for (i = 0; i < NUM_STATES; i++) {\n"
+            "        ss_x[i] = x_ic[i];\n"
+            "    }\n"
+            "}\n\n"))
+
+        s = ("#define MDL_START\n"
+             "static void mdlStart(SimStruct *S)\n{\n"
+             "    real_T *ss_rwork = ssGetRWork(S);\n")
+        if parameters:
+            s += ("    const real_T *params = mxGetPr(ssGetSFcnParam(S, 0));\n"
+                  "    int_T i;\n\n"
+                  "    if (mxGetNumberOfElements(ssGetSFcnParam(S, 0)) != NUM_PARAMS) {\n"
+                  f"        ssSetErrorStatus(S, \"params has to have {len(parameters)} elements\");\n"
+                  "        return;\n"
+                  "    }\n"
+                  "    for (i = 0; i < NUM_PARAMS; i++) {\n"
+                  "        ss_rwork[i] = params[i];\n"
+                  "    }\n")
+        else:
+            s += "    UNUSED_ARG(ss_rwork);\n"
+        self._Elements.append(StringElement(s))
+        if hoisted:
+            printer = CPrinter()
+            s_params = [current_registry().to_printable(p) for p in parameters]
+            used = set().union(*(se.sympify(r[1]).free_symbols for r in shared.replacements if r[0] in hoisted_set))
+            self._Elements.append(StringElement("\n    /* parameter dependent temporaries */\n"
+                                                + self._unpack(s_params, "params[{i}]", used, "    ")))
+            self._Elements.append(CCodeElement(Calculation(), 1, True, ctype="real_T", cse_result=(shared.temporaries(hoisted_set), []),
+                                               single_precision=self._single_precision))
+            self._Elements.append(StringElement("".join(
+                f"    ss_rwork[{len(parameters) + k}] = {printer.doprint(h)};\n" for k, h in enumerate(hoisted))))
+        self._Elements.append(StringElement("}\n\n"))
+
+        self._Elements.append(StringElement("static void mdlOutputs(SimStruct *S, int_T tid)\n{\n"))
+        self._Elements.extend(self._section(shared, 1, hoisted_set, hoisted, "y"))
+        self._Elements.append(StringElement("    UNUSED_ARG(tid);\n}\n\n"))
+
+        self._Elements.append(StringElement("#define MDL_DERIVATIVES\nstatic void mdlDerivatives(SimStruct *S)\n{\n"))
+        self._Elements.extend(self._section(shared, 0, hoisted_set, hoisted, "dx"))
+        self._Elements.append(StringElement("}\n\n"))
+
+        self._Elements.append(StringElement(
+            "static void mdlTerminate(SimStruct *S)\n{\n"
+            "    UNUSED_ARG(S);\n"
+            "}\n\n"
+            "#ifdef MATLAB_MEX_FILE\n"
+            "#include \"simulink.c\"\n"
+            "#else\n"
+            "#include \"cg_sfun.h\"\n"
+            "#endif\n"))
+
+        self._write_file(path)
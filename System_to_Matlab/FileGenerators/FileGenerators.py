@@ -1,7 +1,8 @@
 from abc import ABC, abstractmethod
 from typing import Union, Any, Tuple
-from ..Symbols.Symbol import Symbol
+from ..Symbols.SymbolRegistry import current_registry
 from .MatlabElements import CodeElement
+from ..Instrumentation import stage
 import symengine as se
 import sympy as sp
 
@@ -17,6 +18,18 @@ class FileGenerator(ABC):
     def generateFile(self) -> None:
         pass
 
+    def _write_file(self, path: str, elements: list = None) -> None:
+        """PRIVATE Generates the code of the elements (by default all elements of the file) and writes it to path.
+        The code is generated completely before the file is opened, so the generation and the disk write are instrumented separately.
+        """
+        name = type(self).__name__
+        with stage(f"{name}.generateCode"):
+            code = "".join(element.generateCode() for element in (self._Elements if elements is None else elements))
+        with stage(f"{name}.write") as s:
+            with open(path, "w") as f:
+                f.write(code)
+            s.record(bytes=len(code))
+
     def _matlab_input_string_generator(self, inputs:list, name:str = "input", indents:int = 0)-> Tuple[str, str]:
         s_body:str = ""
         s_header:str = ""
@@ -32,10 +45,10 @@ class FileGenerator(ABC):
                 s_header += name + s_count + ", "
                 
                 for ii in range(len(i)):
-                    s_body += str(i[ii].subs(Symbol._Symbol_to_printable_dict)) + " = " + name + s_count + f"({ii+1});\n" # type: ignore
+                    s_body += str(current_registry().to_printable(i[ii])) + " = " + name + s_count + f"({ii+1});\n" # type: ignore
                     
             else:
-                s_header += str(i.subs(Symbol._Symbol_to_printable_dict)) + ", "
+                s_header += str(current_registry().to_printable(i)) + ", "
 
         return (s_header[:-2], s_body.replace("\n", "\n" + "\t" * indents))
             
@@ -73,6 +86,6 @@ class FileGenerator(ABC):
                 s_body_bot += s_temp
                 
             else:
-                s_header += str(i.subs(Symbol._Symbol_to_printable_dict)) + ", "
+                s_header += str(current_registry().to_printable(i)) + ", "
 
         return (s_header[:-2], s_body_top.replace("\n", "\n" + "\t" * indents), s_body_bot.replace("\n", "\n" + "\t" * indents))
\ No newline at end of file
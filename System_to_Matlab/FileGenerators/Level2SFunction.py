@@ -0,0 +1,119 @@
+from __future__ import annotations
+from .SFunction import SFunction
+from .MatlabElements import CodeElement, StringElement
+from ..Symbols.SymbolRegistry import current_registry
+from ..Instrumentation import instrumented
+import os
+import symengine as se
+
+
+class Level2SFunction(SFunction):
+    """
+    A level 2 Matlab S-Function of a dynamic system. The block has the dialog parameters (params, x_ic) like the level 1
+    SFunction, one input port with all inputs and one output port with all outputs.
+    The parameters are read once in Start and kept (together with the temporaries which only depend on the parameters)
+    in a DWork vector, so they are not tunable.
+    """
+
+    def _work_string(self, hoisted: list[se.Symbol], indents: int = 1) -> str:
+        """PRIVATE Generates the reading of the parameters and the hoisted temporaries from the DWork vector
+        """
+        symbols = [current_registry().to_printable(p) for p in self._parameter_list()] + hoisted
+        if not symbols:
+            return ""
+        s = "\t" * indents + "work = block.Dwork(1).Data; \n"
+        for i, symbol in enumerate(symbols):
+            s += "\t" * indents + f"{symbol} = work({i+1}); \n"
+        return s
+
+    @instrumented()
+    def generateFile(self, overwrite: bool = True, hoist_parameters: bool = True) -> None:
+        """Generates the file with the given name and path. If the file already exists, it will be overwritten. (If you don't want to overwrite the file, set overwrite to False)
+
+        Parameters
+        ----------
+        overwrite : bool, optional
+            Defines if the file should be overwritten, by default True
+        hoist_parameters : bool, optional
+            If True the cse temporaries which only depend on the parameters are calculated once in Start, by default True
+        """
+        if self._Path is None or self._Path == "":
+            path = self._Filename
+        else:
+            path = os.path.join(self._Path, self._Filename)
+        if not overwrite and os.path.exists(path):
+            return
+
+        name = self._Filename[:-2]
+        n_inputs = len(self._input_list())
+        n_work = len(self._parameter_list())
+        feedthrough = self._direct_feedthrough()
+        self._substitute_states(lambda i: f"x({i+1})")
+        shared, hoisted, hoisted_set = self._shared_cse("sys", hoist_parameters)
+        n_work += len(hoisted)
+
+        self._Elements.append(StringElement(f"function {name}(block) \n\tsetup(block); \nend \n\n"))
+
+        s = "function setup(block) \n"
+        s += "\tblock.NumDialogPrms = 2; \t% params, x_ic \n"
+        s += "\tblock.DialogPrmsTunable = {'Nontunable', 'Nontunable'}; \t% the parameters are only read in Start \n"
+        s += f"\tblock.NumInputPorts = {1 if n_inputs else 0}; \n"
+        s += "\tblock.NumOutputPorts = 1; \n"
+        if n_inputs:
+            s += f"\tblock.InputPort(1).Dimensions = {n_inputs}; \n"
+            s += f"\tblock.InputPort(1).DirectFeedthrough = {'true' if feedthrough else 'false'}; \n"
+            s += "\tblock.InputPort(1).SamplingMode = 'Sample'; \n"
+        s += f"\tblock.OutputPort(1).Dimensions = {len(self._Outputs)}; \n"
+        s += "\tblock.OutputPort(1).SamplingMode = 'Sample'; \n"
+        s += f"\tblock.NumContStates = {len(self._States)}; \n"
+        s += "\tblock.SampleTimes = [0 0]; \n"
+        s += "\tblock.SimStateCompliance = 'DefaultSimState'; \n\n"
+        if n_work:
+            s += "\tblock.RegBlockMethod('PostPropagationSetup', @PostPropagationSetup); \n"
+        s += "\tblock.RegBlockMethod('InitializeConditions', @InitializeConditions); \n"
+        if n_work:
+            s += "\tblock.RegBlockMethod('Start', @Start); \n"
+        s += "\tblock.RegBlockMethod('Outputs', @Outputs); \n"
+        s += "\tblock.RegBlockMethod('Derivatives', @Derivatives); \n"
+        s += "end \n\n"
+        self._Elements.append(StringElement(s))
+
+        if n_work:
+            self._Elements.append(StringElement(
+                "function PostPropagationSetup(block) \n"
+                "\tblock.NumDworks = 1; \n"
+                "\tblock.Dwork(1).Name = 'work'; \t% parameters and parameter dependent temporaries \n"
+                f"\tblock.Dwork(1).Dimensions = {n_work}; \n"
+                "\tblock.Dwork(1).DatatypeID = 0; \n"
+                "\tblock.Dwork(1).Complexity = 'Real'; \n"
+                "\tblock.Dwork(1).UsedAsDiscState = false; \n"
+                "end \n\n"))
+
+        self._Elements.append(StringElement(
+            "function InitializeConditions(block) \n"
+            "\tblock.ContStates.Data = block.DialogPrm(2).Data(:); \n"
+            "end \n\n"))
+
+        if n_work:
+            self._Elements.append(StringElement("function Start(block) \n\tparams = block.DialogPrm(1).Data; \n"))
+            if hoisted:
+                self._Elements.append(StringElement("\t" + self._matlab_input_string_generator([self._parameter_list()], "params", 1)[1] + "\n"))
+                self._Elements.append(shared.temporaries_element(hoisted_set, 1))
+            hoisted_values = "".join(f"; {h}" for h in hoisted)
+            self._Elements.append(StringElement(f"\tblock.Dwork(1).Data = [params(:){hoisted_values}]; \nend \n\n"))
+
+        for index, (method, target) in enumerate([("Derivatives", "block.Derivatives.Data"), ("Outputs", "block.OutputPort(1).Data")]):
+            s = f"function {method}(block) \n"
+            s += "\tx = block.ContStates.Data; \n"
+            if n_inputs:
+                s += "\tu = block.InputPort(1).Data; \n"
+            s += self._work_string(hoisted)
+            self._Elements.append(StringElement(s))
+            self._Elements.append(CodeElement(self._Input_Calcs, 1, True, False))
+            element = shared.element(index, 1, hoisted_set)
+            if index == 0:
+                element.override_lhs(se.Symbol("sys"))
+            self._Elements.append(element)
+            self._Elements.append(StringElement(f"\t{target} = sys; \nend \n\n"))
+
+        self._write_file(path)
@@ -1,6 +1,7 @@
 from .FileGenerators import FileGenerator
 from .MatlabElements import CodeElement, StringElement
 from ..Calculation.Calculation import Calculation
+from ..Instrumentation import instrumented
 import os
 
 
@@ -31,7 +32,7 @@ class MFile(FileGenerator):
         """
         self._Elements.append(StringElement(text))
         
-    def addCalculation(self, calculation: Calculation, use_cse: bool = True) -> None:
+    def addCalculation(self, calculation: Calculation, use_cse: bool = True, sparse: bool = False) -> None:
         """Adds a math expression to the file.
 
         Parameters
@@ -40,9 +41,12 @@ class MFile(FileGenerator):
             calculation to be added
         use_cse : bool, optional
             Whether to use common subexpression elimination, by default True
+        sparse : bool, optional
+            Whether matrices should be generated as sparse matrices, by default False
         """
-        self._Elements.append(CodeElement(calculation, use_cse))
+        self._Elements.append(CodeElement(calculation, use_cse, sparse=sparse))
     
+    @instrumented()
     def generateFile(self, overwrite: bool = True) -> None:
         """Generates the file with the given name and path. If the file already exists, it will be overwritten.
 
@@ -60,7 +64,5 @@ class MFile(FileGenerator):
                 path = self._Path + self._Filename
             else:
                 path = self._Path + "\\" + self._Filename
-        with open(path, "w") as f:
-            for element in self._Elements:
-                f.write(element.generateCode())
+        self._write_file(path)
                 
\ No newline at end of file
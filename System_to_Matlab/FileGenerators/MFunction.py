@@ -1,12 +1,14 @@
 import os
 from .FileGenerators import FileGenerator
-from .MatlabElements import CodeElement, StringElement
+from .MatlabElements import CodeElement, StringElement, SharedCSE, VectorizedCodeElement, RangeCodeElement, LocalFunctionsElement
 from ..Calculation.Calculation import Calculation
-from ..Symbols.Symbol import Symbol
+from ..Calculation.RangeEquations import RangeEquations
+from ..Symbols.SymbolRegistry import current_registry
 
 import symengine as se
 
 from typing import Any
+from ..Instrumentation import instrumented
 
 
 class MFunction(FileGenerator):
@@ -21,7 +23,9 @@ class MFunction(FileGenerator):
         _Equations (Tuple[se.Matrix, se.Matrix]): A tuple representing the equations of the function.
     """
 
-    def __init__(self, filename: str, path: str = "") -> None:
+    def __init__(self, filename: str, path: str = "", inline: bool = True, cse_mode: str = "single", n_workers: int = None,
+                 sparse: bool = False, vectorized: bool = False, reroll: str = None, max_ops: int = None,
+                 max_function_ops: int = None) -> None:
         """Generates an instance of the MFunction class.
 
         Parameters
@@ -30,16 +34,54 @@ class MFunction(FileGenerator):
             The name of the file to be generated. If the file does not end with .m, it will be added.
         path : str, optional
             Path in which the file should be saved , by default ""
+        inline : bool, optional
+            If False the intermediate variables of the calculations are kept in the generated code instead of being inlined, by default True
+        cse_mode : str, optional
+            cse mode of the calculations ("single" or "partitioned"), see CodeElement, by default "single"
+        n_workers : int, optional
+            number of processes for the partitioned cse, by default None
+        sparse : bool, optional
+            if True matrix results (more than one row and column) are generated as sparse(i,j,v,m,n), by default False
+        vectorized : bool, optional
+            if True the function evaluates N points at once: vector inputs are passed as n x N (matrix inputs as rows x cols x N,
+            scalar inputs as 1 x N), inputs with a single column are used for all points. Vector results are returned as n x N,
+            matrix results as rows x cols x N. Can not be combined with sparse, by default False
+        reroll : str, optional
+            loop rerolling of the cse temporaries and vector results: runs which only differ in the indices of the vector
+            inputs are generated as for loops ("for") or slice assignments ("slice"), see CodeElement. Not used for
+            vectorized functions, by default None
+        max_ops : int, optional
+            chunked emission: statements with more operations are split into partial sums and temporaries, see
+            CodeElement. Not used for vectorized functions, by default None
+        max_function_ops : int, optional
+            if the temporaries have more operations, they are calculated in local functions <name>_chunk1, ... with at
+            most max_function_ops operations, see CodeElement. Not used for vectorized functions, by default None
         """
+        if sparse and vectorized:
+            raise ValueError("vectorized functions can not have sparse results")
         if not filename.endswith(".m"):
             filename += ".m"
         super().__init__(filename, path)
 
         self._Outputs: list[se.Symbols | se.Function] = []
         self._Outputs_Calcs: Calculation = Calculation()
+        self._Optional_Outputs: list[se.Symbol] = []
+        self._Optional_Outputs_Calcs: Calculation = Calculation()
         self._Inputs: list[se.Symbols | se.Function] = []
+        self._Input_dims: list[int] = []
         self._Input_Calcs: Calculation = Calculation()
-        self._Calculations: Calculation = Calculation()
+        self._Indexed_Inputs: list[tuple[se.Matrix, str]] = []
+        self._Calculations: Calculation = Calculation(inline)
+        self._Range_Calculations: list[tuple[se.Symbol, RangeEquations, str]] = []
+        self._cse_mode: str = cse_mode
+        self._n_workers: int = n_workers
+        self._sparse: bool = sparse
+        self._vectorized: bool = vectorized
+        self._reroll: str = reroll
+        self._max_ops: int = max_ops
+        self._max_function_ops: int = max_function_ops
+        # printable symbol -> (input name, index) of the elements of the vector inputs, used for the loop rerolling
+        self._Input_Arrays: dict[se.Basic, tuple[str, int]] = {}
 
     def addInput(self, input: se.Symbol | se.Function | se.Matrix, name: str | se.Symbol = "") -> None:
         """Adds an input to the System.
@@ -60,11 +102,31 @@ class MFunction(FileGenerator):
         
         if name == "":
             self._Inputs.append(input)
+        elif self._vectorized and is_input_matrix:
+            self._Inputs.append(se.Symbol(name))
+            if input.shape[1] == 1:
+                for i, element in enumerate(input):
+                    self._Input_Calcs.addCalculation(element, se.Symbol(f"{name}({i+1},:)"))
+            else:
+                for row in range(input.rows):
+                    for col in range(input.cols):
+                        self._Input_Calcs.addCalculation(input[row, col], se.Symbol(f"reshape({name}({row+1},{col+1},:), 1, [])"))
+        elif is_input_matrix and input.shape[1] == 1 and any(current_registry().array_element(e) is not None for e in input):
+            # the variables of IndexedSymbols are unpacked as slices when generating the file (see _indexed_input_string)
+            self._Inputs.append(se.Symbol(name))
+            self._Indexed_Inputs.append((input, name))
+            for i, element in enumerate(input):
+                if current_registry().array_element(element) is None:
+                    self._Input_Calcs.addCalculation(element, se.Symbol(f"{name}({i+1})"))
         else:
             self._Inputs.append(se.Symbol(name))
             self._Input_Calcs.addCalculation(input, se.Symbol(name),is_matrix_input=is_input_matrix)
+        self._Input_dims.append((2 if input.shape[1] == 1 else 3) if is_input_matrix else 2)
+        if is_input_matrix and input.shape[1] == 1 and name != "" and not self._vectorized:
+            for i, element in enumerate(input):
+                self._Input_Arrays[current_registry().to_printable(element)] = (str(name), i + 1)
     
-    def addOutput(self, output: se.Symbol | se.Function, name: str = "") -> None:
+    def addOutput(self, output: se.Symbol | se.Function, name: str = "", optional: bool = False) -> None:
         """Adds an output to the System.
         When a name is given the given Symbol will be outputed with the given name.
         ----------
@@ -72,8 +134,16 @@ class MFunction(FileGenerator):
             The output to be added.
         name : str, optional
             The name of the output. Defaults to "".
+        optional : bool, optional
+            Optional outputs are placed after all other outputs and only calculated if they are requested (nargout).
+            They share the cse temporaries with the other outputs. Optional outputs have to have a name. Defaults to False.
         """
-        if name == "":
+        if optional:
+            if name == "":
+                raise ValueError("Optional outputs have to have a name")
+            self._Optional_Outputs.append(se.Symbol(name))
+            self._Optional_Outputs_Calcs.addCalculation(se.Symbol(name), output)
+        elif name == "":
             self._Outputs.append(output)
         else:
             self._Outputs.append(se.Symbol(name))
@@ -91,6 +161,71 @@ class MFunction(FileGenerator):
             raise TypeError(f"The calculation has to be a Calculation but {type(calc)} was given")
         self._Calculations.append_Calculation(calc)
 
+    def addRangeCalculation(self, name: str | se.Symbol, equations: RangeEquations, mode: str = "for") -> None:
+        """Adds a column vector which is calculated from RangeEquations, the ranges are generated as for loops
+        (mode "for") or slice expressions (mode "slice") instead of one line per element, see RangeCodeElement.
+        The range calculations are placed before the other calculations.
+
+        Parameters
+        ----------
+        name : str | se.Symbol
+            The name of the vector, e.g. "xdot"
+        equations : RangeEquations
+            The equations of the elements
+        mode : str, optional
+            "for" or "slice", by default "for"
+        """
+        if self._vectorized:
+            raise ValueError("range calculations can not be used in vectorized functions")
+        if not isinstance(equations, RangeEquations):
+            raise TypeError(f"equations have to be RangeEquations but {type(equations)} was given")
+        self._Range_Calculations.append((se.Symbol(str(name)), equations, mode))
+
+    def _indexed_input_string(self) -> str:
+        """PRIVATE Generates the unpacking of the inputs with variables of IndexedSymbols: the arrays used by the range
+        calculations as slices (T = x(1:n);), the single variables only if they are used outside of the ranges
+        """
+        registry = current_registry()
+        arrays = set()
+        used = set(self._Outputs)
+        for equations in [r[1] for r in self._Range_Calculations]:
+            arrays |= equations.arrays()
+            for expr in list(equations.scalars.values()) + [r[3] for r in equations.ranges]:
+                used |= expr.atoms(se.AppliedUndef)
+        for calc in [self._Calculations, self._Outputs_Calcs, self._Optional_Outputs_Calcs]:
+            for matrix in calc.calcs:
+                used |= matrix.atoms(se.AppliedUndef)
+
+        s = ""
+        for input, name in self._Indexed_Inputs:
+            run: list[tuple[int, int]] = []  # (position in the input, position in the array) of the current slice
+            run_name = None
+            for i, element in enumerate(list(input) + [None]):
+                info = registry.array_element(element) if element is not None else None
+                if run and (info is None or info[0] != run_name or info[1] != run[-1][1] + 1):
+                    if run_name in arrays:
+                        target = run_name if run[0][1] == 1 else f"{run_name}({run[0][1]}:{run[-1][1]})"
+                        s += f"\t{target} = {name}({run[0][0] + 1}:{run[-1][0] + 1});\n"
+                    run = []
+                if info is None:
+                    continue
+                run_name = info[0]
+                run.append((i, info[1]))
+            for i, element in enumerate(input):
+                if registry.array_element(element) is not None and element in used:
+                    s += f"\t{registry.to_printable(element)} = {name}({i + 1});\n"
+        return s
+
+    def _batch_size_string(self) -> str:
+        """PRIVATE Generates the calculation of the number of evaluation points N of a vectorized function (the largest
+        number of columns, or pages of matrix inputs, of all inputs)
+        """
+        sizes = [f"size({current_registry().to_printable(i)}, {dim})" for i, dim in zip(self._Inputs, self._Input_dims)]
+        if not sizes:
+            return "N = 1;"
+        return "N = max([" + ", ".join(sizes) + "]);"
+
+    @instrumented()
     def generateFile(self, overwrite: bool = True) -> None:
         """Generates the file with the given name and path. If the file already exists, it will be overwritten (if you don't want this to happen set the overwrite to false).
 
@@ -106,19 +241,55 @@ class MFunction(FileGenerator):
         
         sin = ""
         for i in self._Inputs:
-            sin += str(i.subs(Symbol._Symbol_to_printable_dict)) + ", "
+            sin += str(current_registry().to_printable(i)) + ", "
         sin = sin[:-2]
         sout  = ""
-        for o in self._Outputs:
-            sout += str(o.subs(Symbol._Symbol_to_printable_dict)) + ", "
+        for o in self._Outputs + self._Optional_Outputs:
+            sout += str(current_registry().to_printable(o)) + ", "
         sout = sout[:-2]
         
+        indexed_inputs = self._indexed_input_string() if self._Indexed_Inputs else ""
         self._Elements.append(StringElement(
             "function [" + sout + "] = " + self._Filename.removesuffix(".m") + "(" + sin + ") \n"))
 
+        if indexed_inputs:
+            self._Elements.append(StringElement(indexed_inputs))
         self._Elements.append(CodeElement(self._Input_Calcs, 1, True, False))
+        if self._vectorized:
+            self._Elements.append(StringElement("\t" + self._batch_size_string() + "\n"))
 
-        self._Elements.append(CodeElement(Calculation.append_Calculations([self._Calculations, self._Outputs_Calcs]), 1, True, False))
+        for name, equations, mode in self._Range_Calculations:
+            self._Elements.append(RangeCodeElement(name, equations, 1, mode))
+
+        calc = Calculation.append_Calculations([self._Calculations, self._Outputs_Calcs])
+        name = self._Filename.removesuffix(".m")
+        chunking = {"max_ops": self._max_ops, "max_function_ops": self._max_function_ops}
+        code_elements: list[CodeElement] = []
+        if self._Optional_Outputs:
+            shared = SharedCSE([calc, self._Optional_Outputs_Calcs])
+            if self._vectorized:
+                self._Elements.append(VectorizedCodeElement(calc, 1, cse_result=shared.cse_result(0)))
+            else:
+                code_elements.append(shared.element(0, 1, sparse=self._sparse, reroll=self._reroll, arrays=self._Input_Arrays,
+                                                    function_name=name + "_chunk", keep=shared.needed_temporaries(1),
+                                                    **chunking))
+                self._Elements.append(code_elements[-1])
+            self._Elements.append(StringElement(f"\tif nargout > {len(self._Outputs)}\n"))
+            if self._vectorized:
+                self._Elements.append(VectorizedCodeElement(self._Optional_Outputs_Calcs, 2,
+                                                            cse_result=shared.cse_result(1, shared.needed_temporaries(0))))
+            else:
+                code_elements.append(shared.element(1, 2, exclude=shared.needed_temporaries(0), sparse=self._sparse,
+                                                    function_name=name + "_optional_chunk", **chunking))
+                self._Elements.append(code_elements[-1])
+            self._Elements.append(StringElement("\tend\n"))
+        elif self._vectorized:
+            self._Elements.append(VectorizedCodeElement(calc, 1, cse_mode=self._cse_mode, n_workers=self._n_workers))
+        else:
+            code_elements.append(CodeElement(calc, 1, True, False, cse_mode=self._cse_mode, n_workers=self._n_workers,
+                                             sparse=self._sparse, reroll=self._reroll, arrays=self._Input_Arrays,
+                                             function_name=name + "_chunk", **chunking))
+            self._Elements.append(code_elements[-1])
         
 
         # sin = ""
@@ -156,6 +327,8 @@ class MFunction(FileGenerator):
 
         # self._Elements.append(StringElement(sbody_bot, 1))
         self._Elements.append(StringElement("end"))
+        if code_elements:
+            self._Elements.append(LocalFunctionsElement(code_elements))
 
         if self._Path is None or self._Path == "":
             path = self._Filename
@@ -164,6 +337,4 @@ class MFunction(FileGenerator):
                 path = self._Path + self._Filename
             else:
                 path = self._Path + "\\" + self._Filename
-        with open(path, "w") as f:
-            for element in self._Elements:
-                f.write(element.generateCode())
+        self._write_file(path)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+import re
+import symengine as se
+
+from typing import Callable, Iterable
+
+
+_array_element = re.compile(r"^([A-Za-z]\w*)\(.*\)$")
+
+
+class _Splitter:
+    def __init__(self, max_ops: int, new_symbol: Callable[[], se.Symbol]) -> None:
+        self._max_ops: int = max_ops
+        self._new_symbol: Callable[[], se.Symbol] = new_symbol
+        self.temporaries: list[tuple[se.Symbol, se.Expr]] = []
+        self._memo: dict[se.Basic, tuple[se.Basic, int]] = {}
+
+    def _temporary(self, expr: se.Expr) -> se.Symbol:
+        symbol = self._new_symbol()
+        self.temporaries.append((symbol, expr))
+        return symbol
+
+    def split(self, expr: se.Basic) -> tuple[se.Basic, int]:
+        """ the expression with the too large parts replaced by temporaries and its number of operations
+        """
+        if expr in self._memo:
+            return self._memo[expr]
+        if not expr.args:
+            return expr, 0
+        original = expr.args
+        args, ops = [], []
+        for arg in original:
+            a, o = self.split(arg)
+            args.append(a)
+            ops.append(o)
+        changed = any(a is not b for a, b in zip(args, original))
+        if isinstance(expr, (se.Add, se.Mul)):
+            result = self._split_associative(type(expr), args, ops) if sum(ops) + len(args) - 1 > self._max_ops else \
+                ((type(expr)(*args) if changed else expr), sum(ops) + len(args) - 1)
+        else:
+            # only numerical arguments are moved to temporaries (not e.g. the conditions of a Piecewise)
+            movable = sorted((i for i, a in enumerate(args) if ops[i] > 0 and isinstance(a, (se.Add, se.Mul, se.Pow, se.Function))),
+                             key=lambda i: ops[i], reverse=True)
+            while sum(ops) + 1 > self._max_ops and movable:
+                i = movable.pop(0)
+                args[i], ops[i] = self._temporary(args[i]), 0
+                changed = True
+            result = (expr.func(*args) if changed else expr), sum(ops) + 1
+        self._memo[expr] = result
+        return result
+
+    def _split_associative(self, func: type, args: list[se.Basic], ops: list[int]) -> tuple[se.Basic, int]:
+        """ splits a sum (product) into partial sums (products) with at most max_ops operations
+        """
+        while True:
+            chunks: list[list[int]] = []
+            size = 0
+            for i in range(len(args)):
+                if chunks and size + ops[i] + 1 <= self._max_ops:
+                    chunks[-1].append(i)
+                    size += ops[i] + 1
+                else:
+                    chunks.append([i])
+                    size = ops[i]
+            new_args, new_ops = [], []
+            for chunk in chunks:
+                if len(chunk) == 1 and ops[chunk[0]] == 0:
+                    new_args.append(args[chunk[0]])
+                else:
+                    new_args.append(self._temporary(func(*[args[i] for i in chunk]) if len(chunk) > 1 else args[chunk[0]]))
+                new_ops.append(0)
+            args, ops = new_args, new_ops
+            if len(args) - 1 <= self._max_ops:
+                return func(*args), len(args) - 1
+
+
+def split_large(temporaries: list[tuple[se.Symbol, se.Expr]], reduced: list[se.Expr], max_ops: int,
+                new_symbol: Callable[[], se.Symbol]) -> tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr], int]:
+    """ Chunked emission: splits the temporaries and reduced expressions of a cse which have more than max_ops operations,
+    sums and products into partial sums (products), the large arguments of other operations (e.g. sin) into own
+    temporaries, so that no generated statement has more than max_ops operations (approximately the count of
+    symengine's count_ops, arguments which can't be moved, like the conditions of a Piecewise, stay in place).
+
+    Parameters
+    ----------
+    temporaries : list[tuple[se.Symbol, se.Expr]]
+        the temporaries of the cse
+    reduced : list[se.Expr]
+        the reduced expressions
+    max_ops : int
+        maximal number of operations of a statement (at least 1)
+    new_symbol : Callable[[], se.Symbol]
+        returns the symbol of the next new temporary
+
+    Returns
+    -------
+    tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr], int]
+        the temporaries (the new ones directly before the temporary from which they were split, the ones of the
+        reduced expressions at the end), the reduced expressions and the number of new temporaries
+    """
+    if max_ops < 1:
+        raise ValueError(f"max_ops has to be at least 1 but {max_ops} was given")
+    splitter = _Splitter(max_ops, new_symbol)
+    result: list[tuple[se.Symbol, se.Expr]] = []
+    for symbol, expr in temporaries:
+        expr = splitter.split(expr)[0]
+        result += splitter.temporaries
+        result.append((symbol, expr))
+        splitter.temporaries = []
+    reduced = [splitter.split(e)[0] for e in reduced]
+    result += splitter.temporaries
+    return result, reduced, len(result) - len(temporaries)
+
+
+def function_blocks(temporaries: list[tuple[se.Symbol, se.Expr]], reduced: Iterable[se.Expr], max_function_ops: int,
+                    keep: set[se.Basic] = None) -> list[tuple[list[tuple[se.Symbol, se.Expr]], list[str], list[se.Symbol]]]:
+    """ Splits the temporaries into consecutive blocks with at most max_function_ops operations (a single temporary
+    can be larger), which are calculated in local functions. No blocks are returned if all temporaries fit into one.
+
+    Parameters
+    ----------
+    temporaries : list[tuple[se.Symbol, se.Expr]]
+        the temporaries in the order in which they are calculated
+    reduced : Iterable[se.Expr]
+        the expressions which use the temporaries after them
+    max_function_ops : int
+        maximal number of operations of a block
+    keep : set[se.Basic], optional
+        temporaries which are also used after the reduced expressions (e.g. by other code elements), by default None
+
+    Returns
+    -------
+    list[tuple[list[tuple[se.Symbol, se.Expr]], list[str], list[se.Symbol]]]
+        the blocks as (temporaries, arguments, results), the arguments are the names of the symbols which are used
+        but not calculated in the block (for array elements like x(3) the array x), the results are the temporaries
+        of the block which are used later. Blocks without results are dropped.
+    """
+    ops = [int(se.count_ops(e)) for _, e in temporaries]
+    if sum(ops) <= max_function_ops:
+        return []
+    blocks: list[list[int]] = []
+    size = 0
+    for i, o in enumerate(ops):
+        if blocks and size + o <= max_function_ops:
+            blocks[-1].append(i)
+            size += o
+        else:
+            blocks.append([i])
+            size = o
+    needed: set[se.Basic] = set(keep or ())
+    for e in reduced:
+        needed |= e.free_symbols
+    result = []
+    for block in reversed(blocks):
+        temps = [temporaries[i] for i in block]
+        defined = {t for t, _ in temps}
+        results = [t for t, _ in temps if t in needed]
+        if not results:
+            continue
+        used: set[se.Basic] = set()
+        for _, e in temps:
+            used |= e.free_symbols
+        used -= defined
+        needed |= used
+        result.append((temps, _arguments(used), results))
+    return result[::-1]
+
+
+def _arguments(symbols: set[se.Basic]) -> list[str]:
+    """ the sorted names of the arguments, array elements like x(3) are passed as the array
+    """
+    names = set()
+    for symbol in symbols:
+        name = str(symbol)
+        match = _array_element.match(name)
+        names.add(match.group(1) if match else name)
+    return sorted(names)
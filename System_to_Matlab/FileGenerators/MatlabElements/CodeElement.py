@@ -1,17 +1,29 @@
 from __future__ import annotations
 from .MatlabElement import MatlabElement
 from ...Symbols import DynamicSymbol
-from ...Symbols.Symbol import Symbol
 from ...Calculation.Calculation import Calculation
+from ...Calculation.PartitionedCSE import partitioned_cse
+from .Reroll import find_runs, sort_temporaries, Run
+from .Chunking import split_large, function_blocks
+from ...Printers import MatlabPrinter
+from ...Instrumentation import stage, count_ops
 
 import symengine as se
-import sympy as sp
 
 from typing import Union, Any
 
 
 class CodeElement(MatlabElement):
-    def __init__(self, code: Calculation, indent: int = 0,  use_cse: bool = True, clear: bool = True):
+    _cse_modes = ("single", "partitioned")
+    _reroll_modes = (None, "for", "slice")
+    _loop_indices = ("i", "j", "k", "ii", "jj", "kk")
+    _max_period = 8
+
+    def __init__(self, code: Calculation, indent: int = 0,  use_cse: bool = True, clear: bool = True,
+                 cse_result: tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr]] = None,
+                 cse_mode: str = "single", n_workers: int = None, sparse: bool = False, reroll: str = None,
+                 arrays: dict[se.Basic, tuple[str, int]] = None, min_run: int = 4, max_ops: int = None,
+                 max_function_ops: int = None, function_name: str = None, keep: set[se.Symbol] = None):
         """ Code Element for the Matlab File Generator. Represents a chunk of code. Can also use cse to make the code more efficient.
 
         Parameters
@@ -24,6 +36,35 @@ class CodeElement(MatlabElement):
             Sets if cse should be used on the code, by default True
         clear : bool, optional
             sets if the variables from cse should be cleared afterwards, by default True
+        cse_result : tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr]], optional
+            already calculated cse (temporaries, reduced code vector) of the code, e.g. from a SharedCSE, by default None
+        cse_mode : str, optional
+            "single" runs cse once on the whole code, "partitioned" splits the code into clusters which are
+            processed in parallel (faster for very large code, the result can be slightly longer), by default "single"
+        n_workers : int, optional
+            number of processes used for the partitioned cse, if None os.cpu_count() is used, by default None
+        sparse : bool, optional
+            if True matrices (more than one row and column) are generated as sparse(i,j,v,m,n) with only the nonzero entries, by default False
+        reroll : str, optional
+            loop rerolling after the cse (see find_runs): runs of temporaries and of elements of vector results which
+            only differ in the indices of array elements are generated as for loops ("for") or slice assignments ("slice"),
+            the rerolled code is only used if it is shorter, by default None (off)
+        arrays : dict[se.Basic, tuple[str, int]], optional
+            the (printable) symbols which are elements of arrays, e.g. {q2: ("x", 2)} for q2 = x(2), by default None
+        min_run : int, optional
+            minimal number of repetitions which are rerolled, by default 4
+        max_ops : int, optional
+            chunked emission after the cse (see split_large): statements with more operations are split into partial
+            sums (products) and temporaries of large arguments, by default None (off)
+        max_function_ops : int, optional
+            if the temporaries have more operations, they are calculated in blocks of at most max_function_ops operations
+            in local functions <function_name>1, <function_name>2, ... (see function_blocks and local_functions),
+            by default None (off)
+        function_name : str, optional
+            prefix of the names of the local functions, needed for max_function_ops, by default None
+        keep : set[se.Symbol], optional
+            temporaries which are used after this element (e.g. by the optional outputs), they are returned by the
+            local functions and kept under their names by the loop rerolling, by default None
         """
         MatlabElement.__init__(self)
 
@@ -40,8 +81,17 @@ class CodeElement(MatlabElement):
             
         if not isinstance(code, Calculation):
             raise TypeError(f"code has to be a Calculation but {type(code)} was given")
+        if cse_mode not in self._cse_modes:
+            raise ValueError(f"cse_mode has to be one of {self._cse_modes} but {cse_mode} was given")
+        if reroll not in self._reroll_modes:
+            raise ValueError(f"reroll has to be one of {self._reroll_modes} but {reroll} was given")
+        if max_ops is not None and max_ops < 1:
+            raise ValueError(f"max_ops has to be at least 1 but {max_ops} was given")
+        if max_function_ops is not None and function_name is None:
+            raise ValueError("local functions (max_function_ops) need a function_name")
         self._code: Calculation = code
-        self._code.subs(Symbol._Symbol_to_printable_dict)
+        with stage("CodeElement.subs"):
+            self._code.to_printable()
         # self._name = name.subs(
         #     Symbol._Symbol_to_printable_dict)  # type: ignore
         self._use_cse: bool = use_cse
@@ -49,6 +99,19 @@ class CodeElement(MatlabElement):
         self._Clear: bool = clear
         self._override: bool = False
         self._lhs: se.Matrix = None
+        self._printer: MatlabPrinter = MatlabPrinter()
+        self._cse_result = cse_result
+        self._cse_mode: str = cse_mode
+        self._n_workers: int = n_workers
+        self._sparse: bool = sparse
+        self._reroll: str = reroll
+        self._arrays: dict[se.Basic, tuple[str, int]] = arrays or {}
+        self._min_run: int = min_run
+        self._max_ops: int = max_ops
+        self._max_function_ops: int = max_function_ops
+        self._function_name: str = function_name
+        self._keep: set[se.Symbol] = keep or set()
+        self._local_functions: str = ""
 
     def override_lhs(self, lhs: se.Symbol) -> CodeElement:
         if not isinstance(lhs, se.Symbol):
@@ -59,33 +122,93 @@ class CodeElement(MatlabElement):
 
     def generateCode(self) -> str:
 
-        s = ""
         if self._use_cse:
-            s += self._generate_cse()
-        else:
+            return self._generate_cse()
+        with stage("CodeElement.print"):
+            s = ""
             for i in range(len(self._code._calcs)):
                 if self._override:
-                    s += self._Indentation * "\t" + self._remove_curlyBreakets(sp.octave_code(self._lhs)) + " = " + self._remove_curlyBreakets(sp.octave_code(self._code._calcs[i])) + ";\n"
+                    s += self._Indentation * "\t" + self._print(self._lhs) + " = " + self._print_matrix(self._code._calcs[i]) + ";\n"
                 else:
-                    s += self._Indentation * "\t" + self._remove_curlyBreakets(sp.octave_code(self._code._vars[i])) + " = " + self._remove_curlyBreakets(sp.octave_code(self._code._calcs[i])) + ";\n"
+                    s += self._Indentation * "\t" + self._print(self._code._vars[i]) + " = " + self._print_matrix(self._code._calcs[i]) + ";\n"
             # s += self._remove_curlyBreakets(sp.octave_code(self.vars)) + " = " + self._remove_curlyBreakets(sp.octave_code(self._code)) + ";\n"
         return s
 
     def _generate_cse(self) -> str:
-        s = ""
-
         indizes_shapes, code_vector = self._code._generate_shape_index_list()
-        
-        f1, f2 = se.cse(code_vector)
-        for temp in f1:
-            s += self._Indentation * "\t" + \
-                self._remove_curlyBreakets(sp.octave_code(temp[0])) + " = " + \
-                self._remove_curlyBreakets(sp.octave_code(temp[1])) + ";\n"  # type: ignore
+
+        f1, f2 = self._cse(code_vector)
+        if self._max_ops is not None:
+            f1, f2 = self._split(f1, f2)
+        with stage("CodeElement.print"):
+            return self._print_cse(indizes_shapes, f1, f2)
+
+    def local_functions(self) -> str:
+        """ the local functions which calculate the blocks of temporaries (see max_function_ops), available after
+        generateCode, they have to be placed after the end of the function
+        """
+        return self._local_functions
+
+    def _split(self, f1: list[tuple[se.Symbol, se.Expr]], f2: list[se.Expr]) -> tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr]]:
+        """ splits the statements with more than max_ops operations (see split_large)
+        """
+        with stage("CodeElement.chunk") as st:
+            used = self._used_names(f1, f2)
+            names = (f"part{k}" for k in range(2**62))
+            new_symbol = lambda: se.Symbol(next(name for name in names if name not in used))
+            result = split_large(f1, list(f2), self._max_ops, new_symbol)
+            if st.active:
+                largest = lambda exprs: max((int(se.count_ops(e)) for e in exprs), default=0)
+                st.record(partials=result[2], largest_ops_before=largest([t[1] for t in f1] + list(f2)),
+                          largest_ops_after=largest([t[1] for t in result[0]] + result[1]))
+        return result[0], result[1]
+
+    def _print_cse(self, indizes_shapes: list[tuple[tuple[int, int], tuple[int, int]]], f1: list[tuple[se.Symbol, se.Expr]],
+                   f2: list[se.Expr]) -> str:
+        if self._reroll is None:
+            s, _, self._local_functions = self._print_code(indizes_shapes, f1, f2, False)
+            return s
+        with stage("CodeElement.reroll") as st:
+            unrolled, _, local_functions = self._print_code(indizes_shapes, f1, f2, False)
+            rerolled, n_rerolled, _ = self._print_code(indizes_shapes, f1, f2, True)
+            # the rerolled code is only used if it is shorter
+            use_rerolled = len(rerolled) < len(unrolled) + len(local_functions)
+            s = rerolled if use_rerolled else unrolled
+            self._local_functions = "" if use_rerolled else local_functions
+            if st.active:
+                st.record(elements=len(f1) + len(f2), rerolled=n_rerolled if use_rerolled else 0,
+                          bytes_before=len(unrolled) + len(local_functions), bytes_after=len(s) + len(self._local_functions))
+        return s
+
+    def _print_code(self, indizes_shapes: list[tuple[tuple[int, int], tuple[int, int]]], f1: list[tuple[se.Symbol, se.Expr]],
+                    f2: list[se.Expr], reroll: bool) -> tuple[str, int, str]:
+        """ Prints the temporaries and the results, with reroll the runs of the temporaries and of the vector results
+        are generated as loops (or slices), else the temporaries can be calculated in local functions.
+        Returns the code, the number of rerolled elements and the local functions.
+        """
+        indent = self._Indentation * "\t"
+        arrays = self._arrays
+        # the temporaries which use kept intermediate variables are printed after them
+        late = self._late_temporaries(f1)
+        f1 = [temp for temp in f1 if temp[0] not in late]
+        f2 = list(f2) + [late[t][1] for t in late]
+        clear = [self._print(temp[0]) for temp in f1]
+        n_rerolled = 0
+        local_functions = ""
+        if reroll and f1 != []:
+            s, f2, arrays, clear, n_rerolled = self._reroll_temporaries(f1, f2)
+        elif self._max_function_ops is not None and f1 != []:
+            s, clear, local_functions = self._print_blocks(f1, f2)
+        else:
+            s = "".join(indent + self._print(temp[0]) + " = " + self._print(temp[1]) + ";\n" for temp in f1)
         if f1 != []:
             s += "\n"
+        late = [(t, position, e) for (t, (position, _)), e in zip(late.items(), f2[len(f2) - len(late):])]
+        clear += [self._print(t) for t, _, _ in late]
 
         ii = 0
         for i in indizes_shapes:
+            s += "".join(indent + self._print(t) + " = " + self._print(e) + ";\n" for t, position, e in late if position == ii)
             index = i[0]
             shape = i[1]
             code = f2[index[0]:index[1]]
@@ -96,28 +219,196 @@ class CodeElement(MatlabElement):
             ii += 1
 
             if shape == (1, 1):
-                s += self._Indentation * "\t" + \
-                    self._remove_curlyBreakets(sp.octave_code(name[0])) + " = " + \
-                    self._remove_curlyBreakets(sp.octave_code(code)) + ";\n"  # type: ignore
+                s += indent + self._print(name[0]) + " = " + self._print(code[0]) + ";\n"
             else:
-                s += self._Indentation * "\t" + self._remove_curlyBreakets(sp.octave_code(name)) + " = " + sp.octave_code(
-                    se.Matrix(code).reshape(shape[0], shape[1])) + ";\n"  # type: ignore
-            # s += "\n"
-            if self._Clear:
-                s += self._Indentation * "\t" + "clear "
-                for temp in f1:
-                    s += self._remove_curlyBreakets(sp.octave_code(temp[0])) + " "  # type: ignore
-                if s.endswith("clear "):
-                    s = s[:-6]
+                runs = []
+                if reroll and name.shape == (1, 1) and 1 in shape:
+                    runs = find_runs(code, arrays, self._min_run, self._max_period)
+                if runs:
+                    target = self._print(name[0])
+                    s += indent + f"{target} = zeros({shape[0]}, {shape[1]});\n"
+                    s += self._print_runs(target, code, runs)
+                    n_rerolled += sum(len(run) for run in runs)
                 else:
-                    s = s[:-1]
-                    s += ";"
-                s += "\n"
+                    s += indent + self._print(name) + " = " + self._print_matrix(
+                        se.Matrix(code).reshape(shape[0], shape[1])) + ";\n"
+            if self._Clear:
+                s += indent + ("clear " + " ".join(clear) + ";" if clear else "") + "\n"
             if s.endswith("\n\n\n"):
                 s = s[:-2]
+        s += "".join(indent + self._print(t) + " = " + self._print(e) + ";\n" for t, position, e in late if position == ii)
+        return s, n_rerolled, local_functions
+
+    def _late_temporaries(self, f1: list[tuple[se.Symbol, se.Expr]]) -> dict[se.Symbol, tuple[int, se.Expr]]:
+        """ the temporaries which use intermediate variables of the calculation (not inlined, see Calculation), directly
+        or through other temporaries, as temporary -> (position of the last result they need, expression)
+        """
+        if self._override or self._code.is_inline:
+            return {}
+        positions = {v: k + 1 for k, var in enumerate(self._code._vars) for v in var}
+        late: dict[se.Symbol, tuple[int, se.Expr]] = {}
+        for t, e in f1:
+            position = max((positions.get(a, late[a][0] if a in late else 0) for a in e.free_symbols), default=0)
+            if position:
+                late[t] = (position, e)
+        return late
+
+    def _print_blocks(self, f1: list[tuple[se.Symbol, se.Expr]], f2: list[se.Expr]) -> tuple[str, list[str], str]:
+        """ Prints the temporaries in blocks of at most max_function_ops operations as calls of local functions (if they
+        don't fit into one block). Returns the code, the names to clear and the local functions.
+        """
+        indent = self._Indentation * "\t"
+        blocks = function_blocks(f1, f2, self._max_function_ops, self._keep)
+        if not blocks:
+            return "".join(indent + self._print(temp[0]) + " = " + self._print(temp[1]) + ";\n" for temp in f1), \
+                [self._print(temp[0]) for temp in f1], ""
+        s = ""
+        local_functions = ""
+        clear = []
+        with stage("CodeElement.chunk") as st:
+            for k, (temporaries, arguments, results) in enumerate(blocks):
+                name = f"{self._function_name}{k + 1}"
+                outputs = ", ".join(self._print(r) for r in results)
+                s += indent + f"[{outputs}] = {name}({', '.join(arguments)});\n"
+                local_functions += f"\n\nfunction [{outputs}] = {name}({', '.join(arguments)}) \n"
+                local_functions += "".join("\t" + self._print(t) + " = " + self._print(e) + ";\n" for t, e in temporaries)
+                local_functions += "end"
+                clear += [self._print(r) for r in results]
+            if st.active:
+                st.record(functions=len(blocks))
+        return s, clear, local_functions
+
+    def _reroll_temporaries(self, f1: list[tuple[se.Symbol, se.Expr]], f2: list[se.Expr]
+                            ) -> tuple[str, list[se.Expr], dict[se.Basic, tuple[str, int]], list[str], int]:
+        """ Finds the runs of the temporaries (reordered by sort_temporaries). If there are runs all temporaries are
+        stored in the array tmp (tmp(k) instead of the k-th temporary) and the runs are generated as loops, the temporaries
+        in keep are copied back to their names afterwards.
+        Returns the code of the temporaries, the reduced code with the renamed temporaries, the arrays for the rerolling
+        of the results, the names to clear and the number of rerolled temporaries.
+        """
+        indent = self._Indentation * "\t"
+        name = self._free_name("tmp", f1, f2)
+        ordered, arrays = sort_temporaries(f1, self._arrays, name)
+        runs = find_runs([temp[1] for temp in ordered], arrays, self._min_run, self._max_period)
+        if not runs:
+            s = "".join(indent + self._print(temp[0]) + " = " + self._print(temp[1]) + ";\n" for temp in f1)
+            return s, f2, self._arrays, [self._print(temp[0]) for temp in f1], 0
+        rename = {temp[0]: se.Symbol(f"{name}({k + 1})") for k, temp in enumerate(ordered)}
+        arrays = {**self._arrays, **{rename[temp[0]]: (name, k + 1) for k, temp in enumerate(ordered)}}
+        s = indent + f"{name} = zeros({len(f1)}, 1);\n"
+        s += self._print_runs(name, [temp[1] for temp in ordered], runs, rename)
+        # the temporaries which are used by later code elements are also needed under their own names
+        s += "".join(indent + f"{self._print(temp[0])} = {self._print(rename[temp[0]])};\n"
+                     for temp in ordered if temp[0] in self._keep)
+        return s, [e.xreplace(rename) for e in f2], arrays, [name], sum(len(run) for run in runs)
+
+    def _print_runs(self, target: str, code: list[se.Expr], runs: list[Run], rename: dict[se.Basic, se.Basic] = None) -> str:
+        """ Prints the elements of a vector, the runs as for loops or slice assignments and the other (nonzero) elements
+        one by one, rename is applied to the elements which aren't part of a run.
+        """
+        indent = self._Indentation * "\t"
+        index = self._loop_index(runs)
+        s = ""
+        position = 1
+        for run in runs:
+            s += self._print_elements(target, code, position, run.start, rename)
+            position = run.stop + 1
+            if self._reroll == "slice" and self._sliceable(run, target):
+                for r in range(run.period):
+                    s += indent + f"{target}({run.slice_position(r)}) = {self._print(self._rename(run.slice_body(r), rename))};\n"
+            else:
+                first, last = run.loop_range()
+                s += indent + f"for {index} = {first}:{last}\n"
+                for r in range(run.period):
+                    s += indent + f"\t{target}({self._print(run.loop_position(index, r))}) = {self._print(self._rename(run.loop_body(index, r), rename))};\n"
+                s += indent + "end\n"
+        s += self._print_elements(target, code, position, len(code) + 1, rename)
         return s
 
-    def _remove_curlyBreakets(self, code: str) -> str:
-        if code.startswith("{") and code.endswith("}"):
-            code = code[1:-1]
-        return code
\ No newline at end of file
+    @staticmethod
+    def _rename(expr: se.Expr, rename: dict[se.Basic, se.Basic] = None) -> se.Expr:
+        # the array elements which are the same in all blocks are kept as symbols, they have to be renamed too
+        return expr.xreplace(rename) if rename else expr
+
+    @staticmethod
+    def _sliceable(run: Run, target: str) -> bool:
+        """ a run can only be generated as slices if its elements don't use elements of the run which are computed
+        by the same or a later slice (e.g. recurrences like tmp(k) = 2*tmp(k - 1))
+        """
+        for r in range(run.period):
+            for indices in run.array_indices(r, target):
+                if any(run.start <= k <= run.stop and (k - run.start) % run.period >= r for k in indices):
+                    return False
+        return True
+
+    def _print_elements(self, target: str, code: list[se.Expr], start: int, stop: int,
+                        rename: dict[se.Basic, se.Basic] = None) -> str:
+        """ assignments of the nonzero elements start..stop - 1 (1 based) of a vector
+        """
+        indent = self._Indentation * "\t"
+        return "".join(indent + f"{target}({j}) = {self._print(code[j - 1].xreplace(rename) if rename else code[j - 1])};\n"
+                       for j in range(start, stop) if code[j - 1] != 0)
+
+    def _loop_index(self, runs: list[Run]) -> se.Symbol:
+        """ the first loop index which is not used by the rerolled expressions
+        """
+        used = {str(a) for run in runs for template in run.templates for a in template.free_symbols}
+        used |= {array[0] for run in runs for arrays in run.arrays for array in arrays}
+        for name in self._loop_indices:
+            if name not in used:
+                return se.Symbol(name)
+        raise ValueError("no free name for the loop index")
+
+    def _free_name(self, name: str, f1: list[tuple[se.Symbol, se.Expr]], f2: list[se.Expr]) -> str:
+        """ name (with a number appended if necessary) which isn't used in the code
+        """
+        used = self._used_names(f1, f2)
+        k = 0
+        free = name
+        while free in used:
+            k += 1
+            free = f"{name}{k}"
+        return free
+
+    def _used_names(self, f1: list[tuple[se.Symbol, se.Expr]], f2: list[se.Expr]) -> set[str]:
+        """ names of the symbols, results and arrays of the code
+        """
+        used = {str(a) for e in f2 for a in e.free_symbols}
+        used |= {str(a) for temp in f1 for a in temp[1].free_symbols}
+        used |= {str(v) for var in self._code._vars for v in var}
+        if self._override:
+            used.add(str(self._lhs[0]))
+        used |= {array[0] for array in self._arrays.values()}
+        used |= {str(temp[0]) for temp in f1}
+        return used
+
+    def _cse(self, code_vector: se.Matrix) -> tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr]]:
+        """ Returns the temporaries and the reduced code vector (given cse result or cse in the selected mode).
+        """
+        if self._cse_result is not None:
+            return self._cse_result
+        if code_vector is None:
+            return [], []
+        with stage("CodeElement.cse") as s:
+            if self._cse_mode == "partitioned":
+                result = partitioned_cse(code_vector, self._n_workers)
+            else:
+                result = se.cse(code_vector)
+            if s.active:
+                s.record(ops_before=count_ops([code_vector]), ops_after=count_ops([r[1] for r in result[0]] + list(result[1])))
+        return result
+
+    def _print_matrix(self, matrix: se.Matrix) -> str:
+        """ Prints a matrix, as sparse(i,j,v,m,n) if sparse is set and the matrix has more than one row and column.
+        """
+        rows, cols = matrix.shape
+        if not self._sparse or rows < 2 or cols < 2:
+            return self._print(matrix)
+        entries = [(r, c, matrix[r, c]) for r in range(rows) for c in range(cols) if matrix[r, c] != 0]
+        i = " ".join(str(e[0] + 1) for e in entries)
+        j = " ".join(str(e[1] + 1) for e in entries)
+        v = ", ".join(self._print(e[2]) for e in entries)
+        return f"sparse([{i}], [{j}], [{v}], {rows}, {cols})"
+
+    def _print(self, expr: se.Basic | se.Matrix) -> str:
+        return self._printer.doprint(expr)
\ No newline at end of file
@@ -0,0 +1,19 @@
+from .MatlabElement import MatlabElement
+from .CodeElement import CodeElement
+
+
+class LocalFunctionsElement(MatlabElement):
+    def __init__(self, elements: list[CodeElement]):
+        """ The local functions of CodeElements (see CodeElement max_function_ops), placed after the end of the
+        function. The CodeElements have to be generated before this element.
+
+        Parameters
+        ----------
+        elements : list[CodeElement]
+            the CodeElements whose local functions are written
+        """
+        MatlabElement.__init__(self)
+        self._elements: list[CodeElement] = elements
+
+    def generateCode(self) -> str:
+        return "".join(element.local_functions() for element in self._elements)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+from .MatlabElement import MatlabElement
+from ...Calculation.RangeEquations import RangeEquations, indexed_elements
+from ...Symbols.SymbolRegistry import current_registry
+from ...Printers import MatlabPrinter
+from ...Instrumentation import stage
+
+import symengine as se
+
+
+class RangeCodeElement(MatlabElement):
+    _modes = ("for", "slice")
+
+    def __init__(self, name: se.Symbol, equations: RangeEquations, indent: int = 0, mode: str = "for") -> None:
+        """ Code Element for RangeEquations: the single equations are generated with cse, every range as for loop
+
+            xdot = zeros(n, 1);
+            xdot(1) = ...;
+            for i = 2:n-1
+                xdot(i) = c.*(T(i - 1) - 2*T(i) + T(i + 1));
+            end
+
+        or as slice expression (mode "slice", element wise operators)
+
+            xdot(2:n-1) = c.*(T(1:n-2) - 2*T(2:n-1) + T(3:n));
+
+        The arrays of the indexed symbols (e.g. T = x(1:n)) have to be defined before (see MFunction.addInput).
+
+        Parameters
+        ----------
+        name : se.Symbol
+            name of the (column vector) result
+        equations : RangeEquations
+            the equations
+        indent : int, optional
+            how much indents should be added at the front of every line, by default 0
+        mode : str, optional
+            "for" or "slice", by default "for"
+        """
+        MatlabElement.__init__(self)
+        if not isinstance(equations, RangeEquations):
+            raise TypeError(f"equations have to be RangeEquations but {type(equations)} was given")
+        if mode not in self._modes:
+            raise ValueError(f"mode has to be one of {self._modes} but {mode} was given")
+        self._name: str = str(name)
+        self._equations: RangeEquations = equations
+        self._Indentation: int = indent
+        self._mode: str = mode
+        self._printer: MatlabPrinter = MatlabPrinter()
+
+    def generateCode(self) -> str:
+        registry = current_registry()
+        with stage("CodeElement.subs"):
+            scalars = {p: registry.to_printable(e) for p, e in sorted(self._equations.scalars.items())}
+            ranges = [(index, start, stop, registry.to_printable(e)) for index, start, stop, e in self._equations.ranges]
+        with stage("CodeElement.print"):
+            s = self._line(f"{self._name} = zeros({self._equations.size}, 1);")
+            s += self._print_scalars(scalars)
+            for index, start, stop, expr in ranges:
+                if self._mode == "for":
+                    s += self._print_loop(index, start, stop, expr)
+                else:
+                    s += self._print_slice(index, start, stop, expr)
+        return s
+
+    def _line(self, code: str, indent: int = 0) -> str:
+        return (self._Indentation + indent)*"\t" + code + "\n"
+
+    def _print_scalars(self, scalars: dict[int, se.Expr]) -> str:
+        if not scalars:
+            return ""
+        temporaries, reduced = se.cse(list(scalars.values()))
+        s = "".join(self._line(f"{self._print(t)} = {self._print(e)};") for t, e in temporaries)
+        for position, expr in zip(scalars, reduced):
+            s += self._line(f"{self._name}({position}) = {self._print(expr)};")
+        return s
+
+    def _print_loop(self, index: se.Symbol, start: int, stop: int, expr: se.Expr) -> str:
+        temporaries, reduced = se.cse([expr])
+        # array elements like T(i) are read directly instead of being copied to temporaries
+        reads = {t: e for t, e in temporaries if isinstance(e, se.AppliedUndef)}
+        if reads:
+            temporaries = [(t, e.xreplace(reads)) for t, e in temporaries if t not in reads]
+            reduced = [r.xreplace(reads) for r in reduced]
+        s = self._line(f"for {index} = {start}:{stop}")
+        s += "".join(self._line(f"{self._print(t)} = {self._print(e)};", 1) for t, e in temporaries)
+        s += self._line(f"{self._name}({index}) = {self._print(reduced[0])};", 1)
+        s += self._line("end")
+        return s
+
+    def _print_slice(self, index: se.Symbol, start: int, stop: int, expr: se.Expr) -> str:
+        # every indexed element T(i + k) becomes the slice T(start + k:stop + k), the index itself a column vector
+        subs = {index: se.Symbol(f"({start}:{stop})'")}
+        for element in indexed_elements(expr):
+            if index not in element.args[0].free_symbols:
+                continue
+            offset = element.args[0] - index
+            if offset.free_symbols:
+                raise ValueError(f"slices need indices of the form {index} + constant but {element} was given")
+            subs[element] = se.Symbol(f"{element.get_name()}({start + int(offset)}:{stop + int(offset)})")
+        return self._line(f"{self._name}({start}:{stop}) = {self._print(expr.xreplace(subs))};")
+
+    def _print(self, expr: se.Basic) -> str:
+        return self._printer.doprint(expr)
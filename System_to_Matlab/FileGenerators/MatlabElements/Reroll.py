@@ -0,0 +1,211 @@
+from __future__ import annotations
+import symengine as se
+
+from ...Printers import MatlabPrinter
+from typing import Iterable
+
+
+class Run:
+    def __init__(self, start: int, period: int, count: int, templates: list[se.Expr], placeholders: list[tuple[se.Symbol, ...]],
+                 arrays: list[list[tuple[str, int, int]]], symbols: list[tuple[se.Basic, ...]]) -> None:
+        """ count repetitions (blocks) of period consecutive elements, starting at the (1 based) position start, which are
+        given by the same templates: element r of block m (m = 1..count) is templates[r] with
+        placeholders[r][p] -> name(step*m + offset) for arrays[r][p] = (name, step, offset), see find_runs.
+        Array elements which are the same in all blocks (step 0) are kept as the symbols[r][p] of the first block.
+        """
+        self.start: int = start
+        self.period: int = period
+        self.count: int = count
+        self.templates: list[se.Expr] = templates
+        self.placeholders: list[tuple[se.Symbol, ...]] = placeholders
+        self.arrays: list[list[tuple[str, int, int]]] = arrays
+        self.symbols: list[tuple[se.Basic, ...]] = symbols
+
+    @property
+    def stop(self) -> int:
+        """ position of the last element
+        """
+        return self.start + self.period*self.count - 1
+
+    def __len__(self) -> int:
+        return self.period*self.count
+
+    def __repr__(self) -> str:
+        return f"Run({self.start}, {self.period}, {self.count}, {self.templates}, {self.arrays})"
+
+    def loop_range(self) -> tuple[int, int]:
+        """ first and last value of the loop index, the positions for single elements (period 1), else the block numbers
+        """
+        return (self.start, self.stop) if self.period == 1 else (1, self.count)
+
+    def _shift(self) -> int:
+        # block number m = loop index - shift
+        return self.start - 1 if self.period == 1 else 0
+
+    def loop_position(self, index: se.Symbol, r: int = 0) -> se.Expr:
+        """ position of the element r of the block as function of the loop index
+        """
+        return self.period*index + self.start - self.period - self.period*self._shift() + r
+
+    def loop_body(self, index: se.Symbol, r: int = 0) -> se.Expr:
+        """ the template r with the array elements of the loop index, e.g. x(i + 1)
+        """
+        printer = MatlabPrinter()
+        shift = self._shift()
+        subs = {p: se.Symbol(f"{name}({printer.doprint(step*index + offset - step*shift)})") if step != 0 else symbol
+                for p, (name, step, offset), symbol in zip(self.placeholders[r], self.arrays[r], self.symbols[r])}
+        return self.templates[r].xreplace(subs)
+
+    def slice_position(self, r: int = 0) -> str:
+        """ the positions of the elements r of all blocks as Matlab range, e.g. 3:10 or 2:4:38
+        """
+        return _range(self.start + r, self.period, self.stop - self.period + 1 + r)
+
+    def slice_body(self, r: int = 0) -> se.Expr:
+        """ the template r with the slices of the arrays, e.g. x(3:10) or x(2:2:16)
+        """
+        subs = {p: se.Symbol(f"{name}({_range(step + offset, step, step*self.count + offset)})") if step != 0 else symbol
+                for p, (name, step, offset), symbol in zip(self.placeholders[r], self.arrays[r], self.symbols[r])}
+        return self.templates[r].xreplace(subs)
+
+    def array_indices(self, r: int, name: str) -> list[list[int]]:
+        """ the indices of the array with the given name used by the element r in every block
+        """
+        return [[step*m + offset for m in range(1, self.count + 1)] for n, step, offset in self.arrays[r] if n == name]
+
+
+def _range(first: int, step: int, last: int) -> str:
+    if step == 0 or first == last:
+        return str(first)
+    if step == 1:
+        return f"{first}:{last}"
+    return f"{first}:{step}:{last}"
+
+
+def find_runs(elements: Iterable[se.Expr], arrays: dict[se.Basic, tuple[str, int]], min_length: int = 4,
+              max_period: int = 1) -> list[Run]:
+    """ Loop rerolling: finds runs of consecutive elements (or blocks of up to max_period elements) which have the same
+    structure and only differ in the indices of array elements, which have to change affinely from element to element
+    (block to block), e.g. c*(x2 - 2*x3 + x4), c*(x3 - 2*x4 + x5), ... with x2 = x(2), x3 = x(3), ...
+    The elements are compared by their templates (the array elements replaced by placeholders in the order of the array
+    names and indices), the symbols which are no array elements have to be the same in all repetitions.
+
+    Parameters
+    ----------
+    elements : Iterable[se.Expr]
+        the elements (position 1, 2, ...)
+    arrays : dict[se.Basic, tuple[str, int]]
+        the symbols which are array elements, symbol -> (array name, 1 based index)
+    min_length : int, optional
+        minimal number of repetitions of a run, by default 4
+    max_period : int, optional
+        maximal number of elements of a repeated block, by default 1
+
+    Returns
+    -------
+    list[Run]
+        the runs ordered by their positions, zero elements are never part of a run
+    """
+    keys = [None if element == 0 else _template(element, arrays) for element in elements]
+    runs: list[Run] = []
+    j = 0
+    while j < len(keys):
+        best = None
+        for period in range(1, max_period + 1):
+            count, steps = _count_blocks(keys, j, period)
+            if count >= min_length and (best is None or count*period > best[0]*best[1]):
+                best = (count, period, steps)
+        if best is None:
+            j += 1
+            continue
+        count, period, steps = best
+        block = keys[j:j + period]
+        runs.append(Run(j + 1, period, count, [k[0] for k in block], [k[1] for k in block],
+                        [[(name, step, index - step) for (name, index), step in zip(k[2], s)] for k, s in zip(block, steps)],
+                        [k[3] for k in block]))
+        j += count*period
+    return runs
+
+
+def _count_blocks(keys: list, j: int, period: int) -> tuple[int, list[list[int]]]:
+    """ number of repetitions of the block of period elements starting at j and the index steps from block to block
+    """
+    first = keys[j:j + period]
+    second = keys[j + period:j + 2*period]
+    if len(second) < period or any(k is None for k in first + second):
+        return 1, []
+    for a, b in zip(first, second):
+        if a[0] != b[0] or [i[0] for i in a[2]] != [i[0] for i in b[2]]:
+            return 1, []
+    steps = [[y[1] - x[1] for x, y in zip(a[2], b[2])] for a, b in zip(first, second)]
+    count = 2
+    previous = second
+    while True:
+        following = keys[j + count*period:j + (count + 1)*period]
+        if len(following) < period or any(k is None for k in following):
+            break
+        if any(a[0] != b[0] or any(x[0] != y[0] or y[1] - x[1] != step for x, y, step in zip(a[2], b[2], s))
+               for a, b, s in zip(previous, following, steps)):
+            break
+        previous = following
+        count += 1
+    return count, steps
+
+
+_placeholders: list[se.Symbol] = []
+
+
+def _placeholder(i: int) -> se.Symbol:
+    while len(_placeholders) <= i:
+        _placeholders.append(se.Symbol(f"_reroll_{len(_placeholders)}"))
+    return _placeholders[i]
+
+
+def _template(element: se.Expr, arrays: dict[se.Basic, tuple[str, int]]) -> tuple[se.Expr, tuple, tuple, tuple]:
+    """ (template, placeholders, (array name, index) of the array elements, array elements) of an element
+    """
+    atoms = sorted(((arrays[a], a) for a in element.atoms(se.Symbol) if a in arrays), key=lambda atom: atom[0])
+    placeholders = tuple(_placeholder(i) for i in range(len(atoms)))
+    template = element.xreplace({a: p for (_, a), p in zip(atoms, placeholders)}) if atoms else element
+    return template, placeholders, tuple(info for info, _ in atoms), tuple(a for _, a in atoms)
+
+
+def sort_temporaries(temporaries: list[tuple[se.Symbol, se.Expr]], arrays: dict[se.Basic, tuple[str, int]], name: str
+                     ) -> tuple[list[tuple[se.Symbol, se.Expr]], dict[se.Basic, tuple[str, int]]]:
+    """ Reorders the temporaries of a cse so that find_runs can find their runs: the temporaries are ordered by their
+    dependency level (temporaries only use temporaries of lower levels), inside a level by their templates and the
+    indices of their array elements. The cse orders the temporaries of e.g. the cells of a chain differently from cell
+    to cell, so the repetitions wouldn't be consecutive.
+
+    Parameters
+    ----------
+    temporaries : list[tuple[se.Symbol, se.Expr]]
+        the temporaries (symbol, expression) in a valid order
+    arrays : dict[se.Basic, tuple[str, int]]
+        the symbols which are array elements, symbol -> (array name, 1 based index)
+    name : str
+        name of the array in which the temporaries are stored
+
+    Returns
+    -------
+    tuple[list[tuple[se.Symbol, se.Expr]], dict[se.Basic, tuple[str, int]]]
+        the reordered temporaries and the arrays with the temporaries as elements of the array name
+    """
+    levels: dict[se.Basic, int] = {}
+    for t, e in temporaries:
+        levels[t] = 1 + max((levels[a] for a in e.free_symbols if a in levels), default=-1)
+    by_level: dict[int, list[tuple[se.Symbol, se.Expr]]] = {}
+    for temp in temporaries:
+        by_level.setdefault(levels[temp[0]], []).append(temp)
+    arrays = dict(arrays)
+    ordered: list[tuple[se.Symbol, se.Expr]] = []
+    for level in sorted(by_level):
+        keys = []
+        for t, e in by_level[level]:
+            template, _, infos, _ = _template(e, arrays)
+            keys.append(((str(template), tuple(i[0] for i in infos), tuple(i[1] for i in infos)), (t, e)))
+        keys.sort(key=lambda key: key[0])
+        for _, temp in keys:
+            ordered.append(temp)
+            arrays[temp[0]] = (name, len(ordered))
+    return ordered, arrays
@@ -0,0 +1,206 @@
+from __future__ import annotations
+from .CodeElement import CodeElement
+from ...Calculation.Calculation import Calculation
+from ...Instrumentation import stage, count_ops
+
+import symengine as se
+
+
+class SharedCSE:
+    def __init__(self, codes: list[Calculation]):
+        """ Runs cse once over the union of several Calculations (e.g. the derivative and the output section of a SFunction)
+        and splits the temporaries into the ones needed by every Calculation.
+
+        Parameters
+        ----------
+        codes : list[Calculation]
+            Calculations which should share the cse temporaries
+        """
+        for code in codes:
+            if not isinstance(code, Calculation):
+                raise TypeError(f"codes have to be Calculations but {type(code)} was given")
+            with stage("SharedCSE.subs"):
+                code.to_printable()
+        self._codes: list[Calculation] = codes
+
+        elements: list[se.Expr] = []
+        bounds: list[tuple[int, int]] = []
+        for code in codes:
+            _, vector = code._generate_shape_index_list()
+            start = len(elements)
+            if vector is not None:
+                elements.extend(vector)
+            bounds.append((start, len(elements)))
+
+        with stage("SharedCSE.cse") as s:
+            self._replacements, reduced = se.cse(elements) if elements else ([], [])
+            if s.active:
+                s.record(ops_before=count_ops(elements), ops_after=count_ops([r[1] for r in self._replacements] + list(reduced)))
+        self._reduced: list[list[se.Expr]] = [list(reduced[b[0]:b[1]]) for b in bounds]
+        self._needed: list[set[se.Symbol]] = [self._needed_temporaries(r) for r in self._reduced]
+
+    @property
+    def codes(self) -> list[Calculation]:
+        return self._codes
+
+    @property
+    def replacements(self) -> list[tuple[se.Symbol, se.Expr]]:
+        return self._replacements
+
+    @property
+    def shared_temporaries(self) -> set[se.Symbol]:
+        """ temporaries which are needed by all Calculations
+        """
+        if not self._needed:
+            return set()
+        return set.intersection(*self._needed)
+
+    def needed_temporaries(self, index: int) -> set[se.Symbol]:
+        """ temporaries which are needed (directly or by other temporaries) by the Calculation with the given index
+        """
+        return self._needed[index]
+
+    def invariant_temporaries(self, symbols: set[se.Symbol]) -> set[se.Symbol]:
+        """ temporaries which only depend on the given symbols (e.g. the parameters), constants and other such temporaries,
+        they don't have to be recalculated as long as the symbols don't change
+        """
+        symbols = set(symbols)
+        invariant: set[se.Symbol] = set()
+        # replacements are ordered, so one forward pass finds all of them
+        for symbol, expr in self._replacements:
+            if expr.free_symbols <= symbols | invariant:
+                invariant.add(symbol)
+        return invariant
+
+    def hoist_invariants(self, symbols: set[se.Symbol]) -> set[se.Symbol]:
+        """ Loop invariant hoisting: every maximal subexpression which only depends on the given symbols (e.g. the parameters)
+        is replaced by a (new) temporary, also if it is only used once, e.g. g/l in F/(l**2*m) - g*sin(q)/l.
+        The replacements are reordered to [invariant temporaries, new temporaries, other temporaries], the invariant and
+        new temporaries are renamed to hoisted_0, hoisted_1, ...
+
+        Parameters
+        ----------
+        symbols : set[se.Symbol]
+            the symbols which don't change (e.g. the parameters)
+
+        Returns
+        -------
+        set[se.Symbol]
+            all invariant temporaries (they only depend on the symbols and on each other)
+        """
+        invariant = self.invariant_temporaries(symbols)
+        allowed = set(symbols) | invariant
+        new: dict[se.Expr, se.Symbol] = {}
+        new_replacements: list[tuple[se.Symbol, se.Expr]] = []
+        cache: dict[se.Expr, se.Expr] = {}
+
+        def temporary(expr: se.Expr) -> se.Symbol:
+            if expr not in new:
+                new[expr] = se.Symbol(f"x{len(self._replacements) + len(new_replacements)}")
+                new_replacements.append((new[expr], expr))
+            return new[expr]
+
+        def is_invariant(expr: se.Expr) -> bool:
+            free = expr.free_symbols
+            return len(free) > 0 and free <= allowed
+
+        def hoist(expr: se.Expr) -> se.Expr:
+            if not expr.args:
+                return expr
+            if expr in cache:
+                return cache[expr]
+            if is_invariant(expr):
+                result = temporary(expr)
+            elif isinstance(expr, (se.Add, se.Mul)):
+                fixed = [a for a in expr.args if is_invariant(a) or (not a.free_symbols and not a.args)]
+                rest = [hoist(a) for a in expr.args if not (is_invariant(a) or (not a.free_symbols and not a.args))]
+                if any(is_invariant(a) for a in fixed) and (len(fixed) > 1 or fixed[0].args):
+                    fixed = [temporary(expr.func(*fixed))]
+                else:
+                    fixed = [hoist(a) for a in fixed]
+                result = expr.func(*(fixed + rest))
+            else:
+                result = expr.func(*[hoist(a) for a in expr.args])
+            cache[expr] = result
+            return result
+
+        variant = [(t, hoist(e)) for t, e in self._replacements if t not in invariant]
+        reduced = [[hoist(e) for e in reduced] for reduced in self._reduced]
+        hoisted = [r for r in self._replacements if r[0] in invariant] + new_replacements
+        # reserved names, the cse names (x0, ...) can collide with e.g. the outputs of an S-function
+        rename = {t: se.Symbol(f"hoisted_{k}") for k, (t, _) in enumerate(hoisted)}
+        self._reduced = [[e.xreplace(rename) for e in r] for r in reduced]
+        self._replacements = [(rename.get(t, t), e.xreplace(rename)) for t, e in hoisted + variant]
+        self._needed = [self._needed_temporaries(r) for r in self._reduced]
+        return set(rename.values())
+
+    def _needed_temporaries(self, reduced: list[se.Expr]) -> set[se.Symbol]:
+        temporaries = {r[0] for r in self._replacements}
+        needed: set[se.Symbol] = set()
+        for expr in reduced:
+            needed |= expr.free_symbols & temporaries
+        # replacements are ordered, so one backwards pass finds all dependencies
+        for symbol, expr in reversed(self._replacements):
+            if symbol in needed:
+                needed |= expr.free_symbols & temporaries
+        return needed
+
+    def _select(self, temporaries: set[se.Symbol]) -> list[tuple[se.Symbol, se.Expr]]:
+        return [r for r in self._replacements if r[0] in temporaries]
+
+    def element(self, index: int, indent: int = 0, exclude: set[se.Symbol] = None, clear: bool = False, sparse: bool = False,
+                reroll: str = None, arrays: dict[se.Basic, tuple[str, int]] = None, max_ops: int = None,
+                max_function_ops: int = None, function_name: str = None, keep: set[se.Symbol] = None) -> CodeElement:
+        """ Creates the CodeElement for the Calculation with the given index.
+
+        Parameters
+        ----------
+        index : int
+            index of the Calculation (order in which they were given)
+        indent : int, optional
+            how much indents should be added at the front of every line, by default 0
+        exclude : set[se.Symbol], optional
+            temporaries which are calculated somewhere else (e.g. in a helper function) and should not be generated, by default None
+        clear : bool, optional
+            sets if the variables from cse should be cleared afterwards, by default False
+        sparse : bool, optional
+            if True matrices are generated as sparse(i,j,v,m,n), see CodeElement, by default False
+        reroll : str, optional
+            loop rerolling of vector results ("for" or "slice"), see CodeElement, by default None
+        arrays : dict[se.Basic, tuple[str, int]], optional
+            the symbols which are elements of arrays for the loop rerolling, see CodeElement, by default None
+        max_ops : int, optional
+            maximal number of operations of a statement (chunked emission), see CodeElement, by default None
+        max_function_ops : int, optional
+            maximal number of operations of the temporaries before they are calculated in local functions, see
+            CodeElement, by default None
+        function_name : str, optional
+            prefix of the names of the local functions, see CodeElement, by default None
+        keep : set[se.Symbol], optional
+            temporaries which are used by the following elements, see CodeElement, by default None
+        """
+        return CodeElement(self._codes[index], indent, True, clear, cse_result=self.cse_result(index, exclude), sparse=sparse,
+                           reroll=reroll, arrays=arrays, max_ops=max_ops, max_function_ops=max_function_ops,
+                           function_name=function_name, keep=keep)
+
+    def cse_result(self, index: int, exclude: set[se.Symbol] = None) -> tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr]]:
+        """ The temporaries needed by the Calculation with the given index (without the excluded ones) and its reduced
+        code vector, e.g. for the cse_result of a CodeElement.
+        """
+        temporaries = self._needed[index] - (exclude or set())
+        return self._select(temporaries), self._reduced[index]
+
+    def temporaries(self, temporaries: set[se.Symbol]) -> list[tuple[se.Symbol, se.Expr]]:
+        """ The replacements of the given temporaries (in the order in which they have to be calculated).
+        """
+        return self._select(temporaries)
+
+    def shared_element(self, indent: int = 0) -> CodeElement:
+        """ Creates a CodeElement which only calculates the temporaries needed by all Calculations.
+        """
+        return self.temporaries_element(self.shared_temporaries, indent)
+
+    def temporaries_element(self, temporaries: set[se.Symbol], indent: int = 0) -> CodeElement:
+        """ Creates a CodeElement which only calculates the given temporaries (in the order of the replacements).
+        """
+        return CodeElement(Calculation(), indent, True, False, cse_result=(self._select(temporaries), []))
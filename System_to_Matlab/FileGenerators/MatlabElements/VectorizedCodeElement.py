@@ -0,0 +1,84 @@
+from __future__ import annotations
+from .CodeElement import CodeElement
+from ...Calculation.Calculation import Calculation
+from ...Instrumentation import stage
+
+import symengine as se
+
+
+class VectorizedCodeElement(CodeElement):
+    def __init__(self, code: Calculation, indent: int = 0, use_cse: bool = True,
+                 cse_result: tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr]] = None,
+                 cse_mode: str = "single", n_workers: int = None, batch_size: str = "N"):
+        """ Code Element for vectorized Matlab functions, every variable is a row with one column per evaluation point.
+        Scalar results are 1xN rows, vector results nxN matrices and matrix results rows x cols x N arrays.
+
+        Parameters
+        ----------
+        code : Calculation
+            code which should be generated
+        indent : int, optional
+            how much indents should be added at the front of every line, by default 0
+        use_cse : bool, optional
+            Sets if cse should be used on the code, by default True
+        cse_result : tuple[list[tuple[se.Symbol, se.Expr]], list[se.Expr]], optional
+            already calculated cse (temporaries, reduced code vector) of the code, e.g. from a SharedCSE, by default None
+        cse_mode : str, optional
+            "single" or "partitioned", see CodeElement, by default "single"
+        n_workers : int, optional
+            number of processes used for the partitioned cse, by default None
+        batch_size : str, optional
+            name of the variable which holds the number of evaluation points, by default "N"
+        """
+        CodeElement.__init__(self, code, indent, use_cse, False, cse_result=cse_result, cse_mode=cse_mode, n_workers=n_workers)
+        self._batch_size: str = batch_size
+
+    def generateCode(self) -> str:
+        indizes_shapes, code_vector = self._code._generate_shape_index_list()
+        if code_vector is None:
+            return ""
+        if self._use_cse:
+            f1, f2 = self._cse(code_vector)
+        else:
+            f1, f2 = [], list(code_vector)
+        with stage("CodeElement.print"):
+            return self._print_cse(indizes_shapes, f1, f2)
+
+    def _print_cse(self, indizes_shapes: list[tuple[tuple[int, int], tuple[int, int]]], f1: list[tuple[se.Symbol, se.Expr]],
+                   f2: list[se.Expr]) -> str:
+        indent = self._Indentation * "\t"
+        s = ""
+        for temp in f1:
+            s += indent + self._print(temp[0]) + " = " + self._print(temp[1]) + ";\n"
+        if f1 != []:
+            s += "\n"
+
+        for (index, shape), var in zip(indizes_shapes, self._code._vars):
+            code = f2[index[0]:index[1]]
+            if var.shape == shape:
+                # scalars (or element wise variables) are broadcast, in case they don't depend on a batched input
+                for name, element in zip(var, code):
+                    s += indent + self._print(name) + " = " + self._print(element) + f" + zeros(1, {self._batch_size});\n"
+            else:
+                s += self._print_batched(self._print(var[0]), code, shape, indent)
+        return s
+
+    def _print_batched(self, name: str, code: list[se.Expr], shape: tuple[int, int], indent: str) -> str:
+        """ Preallocates a vector (n x N) or matrix (rows x cols x N) result and assigns the nonzero entries
+        """
+        rows, cols = shape
+        if cols == 1:
+            s = indent + f"{name} = zeros({rows}, {self._batch_size});\n"
+            for i, element in enumerate(code):
+                if element != 0:
+                    s += indent + f"{name}({i+1},:) = {self._print(element)};\n"
+            return s
+        s = indent + f"{name} = zeros({rows}, {cols}, {self._batch_size});\n"
+        for k, element in enumerate(code):
+            if element == 0:
+                continue
+            value = self._print(element)
+            if element.free_symbols:
+                value = f"reshape({value}, 1, 1, [])"
+            s += indent + f"{name}({k // cols + 1},{k % cols + 1},:) = {value};\n"
+        return s
@@ -1,4 +1,9 @@
 from .CodeElement import CodeElement
 from .StringElement import StringElement
+from .SharedCSE import SharedCSE
+from .VectorizedCodeElement import VectorizedCodeElement
+from .RangeCodeElement import RangeCodeElement
+from .LocalFunctionsElement import LocalFunctionsElement
 
-__all__ = ["CodeElement", "StringElement"]
\ No newline at end of file
+__all__ = ["CodeElement", "StringElement", "SharedCSE", "VectorizedCodeElement", "RangeCodeElement",
+           "LocalFunctionsElement"]
\ No newline at end of file
@@ -0,0 +1,182 @@
+import os
+from .FileGenerators import FileGenerator
+from .MatlabElements import StringElement
+from .PythonElements import PyCodeElement
+from ..Calculation.Calculation import Calculation
+from ..Symbols.SymbolRegistry import current_registry
+from ..Printers import NumPyPrinter
+from ..Instrumentation import instrumented
+
+import symengine as se
+
+
+class PyFunction(FileGenerator):
+    """
+    A class representing a vectorized NumPy function (a python module with one function).
+    Every input can have additional leading batch dimensions, e.g. x with shape (N, n) instead of (n,),
+    the outputs then also have these leading dimensions.
+    """
+
+    _header: str = '''import numpy as np
+
+
+def _stack(elements, shape):
+    return np.stack([np.broadcast_to(e, shape) for e in elements], axis=-1)
+
+
+'''
+
+    def __init__(self, filename: str, path: str = "", inline: bool = True, cse_mode: str = "single", n_workers: int = None) -> None:
+        """Generates an instance of the PyFunction class.
+
+        Parameters
+        ----------
+        filename : str
+            The name of the file to be generated (also the name of the function). If the file does not end with .py, it will be added.
+        path : str, optional
+            Path in which the file should be saved , by default ""
+        inline : bool, optional
+            If False the intermediate variables of the calculations are kept in the generated code instead of being inlined, by default True
+        cse_mode : str, optional
+            cse mode of the calculations ("single" or "partitioned"), see CodeElement, by default "single"
+        n_workers : int, optional
+            number of processes for the partitioned cse, by default None
+        """
+        if not filename.endswith(".py"):
+            filename += ".py"
+        super().__init__(filename, path)
+
+        self._Outputs: list[se.Symbol | se.Function] = []
+        # outputs which are given as Matrix, they are returned as arrays also if they have only one element
+        self._Vector_Outputs: set[se.Symbol] = set()
+        self._Outputs_Calcs: Calculation = Calculation()
+        self._Inputs: list[se.Symbol] = []
+        self._Input_dims: list[int] = []
+        self._Input_Calcs: Calculation = Calculation()
+        self._Calculations: Calculation = Calculation(inline)
+        self._cse_mode: str = cse_mode
+        self._n_workers: int = n_workers
+
+    def addInput(self, input: se.Symbol | se.Function | se.Matrix, name: str | se.Symbol = "") -> None:
+        """Adds an input to the function.
+        Matrix inputs are passed as arrays with the shape (..., n) for column vectors (also empty ones) or (..., rows, cols).
+        ----------
+        input : se.Symbol | se.Function | se.Matrix
+            The input to be added.
+        name : str, optional
+            The name of the input. If non is given the name of the Symbol itself is used. Defaults to "".
+        """
+        if isinstance(input, se.Matrix):
+            if name == "":
+                raise ValueError("Matrix inputs have to have a name")
+            name = str(name)
+            if input.shape[1] <= 1:
+                self._Input_dims.append(1)
+                for i, element in enumerate(input):
+                    self._Input_Calcs.addCalculation(element, se.Symbol(f"{name}[..., {i}]"))
+            else:
+                self._Input_dims.append(2)
+                for row in range(input.rows):
+                    for col in range(input.cols):
+                        self._Input_Calcs.addCalculation(input[row, col], se.Symbol(f"{name}[..., {row}, {col}]"))
+            self._Inputs.append(se.Symbol(name))
+        else:
+            self._Input_dims.append(0)
+            if name == "":
+                self._Inputs.append(input)
+            else:
+                self._Inputs.append(se.Symbol(name))
+                self._Input_Calcs.addCalculation(input, se.Symbol(name))
+
+    def addOutput(self, output: se.Symbol | se.Function | se.Matrix, name: str = "") -> None:
+        """Adds an output to the function.
+        When a name is given the given Symbol/Matrix will be outputed with the given name.
+        Matrix outputs are returned with the shape (..., n) (or (..., rows, cols)), also if they have only one element.
+        ----------
+        output : se.Symbol | se.Function | se.Matrix
+            The output to be added.
+        name : str, optional
+            The name of the output. Defaults to "".
+        """
+        if name == "":
+            self._Outputs.append(output)
+        else:
+            self._Outputs.append(se.Symbol(name))
+            self._Outputs_Calcs.addCalculation(se.Symbol(name), output)
+            if isinstance(output, se.Matrix):
+                self._Vector_Outputs.add(se.Symbol(name))
+
+    def addCalculation(self, calc: Calculation) -> None:
+        """Adds a calculation to the function.
+
+        Parameters
+        ----------
+        calc : Calculation
+            The calculation to be added.
+        """
+        if not isinstance(calc, Calculation):
+            raise TypeError(f"The calculation has to be a Calculation but {type(calc)} was given")
+        self._Calculations.append_Calculation(calc)
+
+    def _batch_shape_string(self, names: list[str]) -> str:
+        """PRIVATE Generates the broadcast of the leading (batch) dimensions of all inputs
+        """
+        shapes = []
+        for name, dims in zip(names, self._Input_dims):
+            shapes.append(f"np.shape({name})[:-{dims}]" if dims > 0 else f"np.shape({name})")
+        if not shapes:
+            return "()"
+        return "np.broadcast_shapes(" + ", ".join(shapes) + ")"
+
+    def _scalar_outputs(self, calc: Calculation) -> set:
+        """PRIVATE Returns the outputs which are scalars (have to be broadcast to the batch shape)
+        """
+        vectors = {var[0] for var, value in zip(calc._vars, calc._calcs) if var.shape != value.shape}
+        return {o for o in self._Outputs if current_registry().to_printable(o) not in vectors and o not in self._Vector_Outputs}
+
+    @instrumented()
+    def generateFile(self, overwrite: bool = True) -> None:
+        """Generates the file with the given name and path. If the file already exists, it will be overwritten (if you don't want this to happen set the overwrite to false).
+
+        Parameters
+        ----------
+        overwrite : bool, optional
+            Defines if the file should be overwritten , by default True
+        """
+        if self._Path is None or self._Path == "":
+            path = self._Filename
+        else:
+            path = os.path.join(self._Path, self._Filename)
+        if not overwrite and os.path.exists(path):
+            print("File already exists")
+            return
+
+        printer = NumPyPrinter()
+        names = [printer.doprint(current_registry().to_printable(i)) for i in self._Inputs]
+
+        self._Elements.append(StringElement(self._header))
+        self._Elements.append(StringElement("def " + self._Filename.removesuffix(".py") + "(" + ", ".join(names) + "):\n"))
+        for name in names:
+            self._Elements.append(StringElement(f"    {name} = np.asarray({name}, dtype=float)\n"))
+        self._Elements.append(StringElement(f"    _batch_shape = {self._batch_shape_string(names)}\n\n"))
+
+        self._Elements.append(PyCodeElement(self._Input_Calcs, 1, False))
+        self._Elements.append(StringElement("\n"))
+
+        calc = Calculation.append_Calculations([self._Calculations, self._Outputs_Calcs])
+        self._Elements.append(PyCodeElement(calc, 1, True, cse_mode=self._cse_mode, n_workers=self._n_workers))
+
+        scalars = self._scalar_outputs(calc)
+        sizes = {var[0]: len(value) for var, value in zip(calc._vars, calc._calcs)}
+        outputs = []
+        for o in self._Outputs:
+            s = printer.doprint(current_registry().to_printable(o))
+            if o in scalars:
+                s = f"_stack([{s}], _batch_shape)[..., 0]"
+            elif o in self._Vector_Outputs and sizes[o] == 1:
+                # vectors with one element are calculated as scalars
+                s = f"_stack([{s}], _batch_shape)"
+            outputs.append(s)
+        self._Elements.append(StringElement("\n    return " + ", ".join(outputs) + "\n"))
+
+        self._write_file(path)
@@ -0,0 +1,72 @@
+from __future__ import annotations
+from ..MatlabElements import CodeElement
+from ...Calculation.Calculation import Calculation
+from ...Printers import NumPyPrinter
+from ...Instrumentation import stage
+
+import symengine as se
+
+
+class PyCodeElement(CodeElement):
+    _indentation_string: str = "    "
+
+    def __init__(self, code: Calculation, indent: int = 0, use_cse: bool = True,
+                 cse_mode: str = "single", n_workers: int = None, batch_shape: str = "_batch_shape"):
+        """ Code Element for the Python File Generator. Represents a chunk of NumPy code which works on batches of values.
+
+        Parameters
+        ----------
+        code : Calculation
+            code which should be generated
+        indent : int, optional
+            how much indents should be added at the front of every line, by default 0
+        use_cse : bool, optional
+            Sets if cse should be used on the code, by default True
+        cse_mode : str, optional
+            "single" or "partitioned", see CodeElement, by default "single"
+        n_workers : int, optional
+            number of processes used for the partitioned cse, by default None
+        batch_shape : str, optional
+            name of the variable which holds the shape of the batch, vector and matrix results are broadcast to
+            this shape with the function _stack (has to be defined in the generated module), by default "_batch_shape"
+        """
+        CodeElement.__init__(self, code, indent, use_cse, False, cse_mode=cse_mode, n_workers=n_workers)
+        self._printer: NumPyPrinter = NumPyPrinter()
+        self._batch_shape: str = batch_shape
+
+    def generateCode(self) -> str:
+        indizes_shapes, code_vector = self._code._generate_shape_index_list()
+        if code_vector is None:
+            return ""
+        if self._use_cse:
+            f1, f2 = self._cse(code_vector)
+        else:
+            f1, f2 = [], list(code_vector)
+        with stage("CodeElement.print"):
+            return self._print_cse(indizes_shapes, f1, f2)
+
+    def _print_cse(self, indizes_shapes: list[tuple[tuple[int, int], tuple[int, int]]], f1: list[tuple[se.Symbol, se.Expr]],
+                   f2: list[se.Expr]) -> str:
+        indent = self._Indentation * self._indentation_string
+        s = ""
+        for temp in f1:
+            s += indent + self._print(temp[0]) + " = " + self._print(temp[1]) + "\n"
+        if f1 != []:
+            s += "\n"
+
+        for (index, shape), var in zip(indizes_shapes, self._code._vars):
+            code = f2[index[0]:index[1]]
+            if var.shape == shape:
+                for name, element in zip(var, code):
+                    s += indent + self._print(name) + " = " + self._print(element) + "\n"
+            else:
+                s += indent + self._print(var[0]) + " = " + self._print_stacked(code, shape) + "\n"
+        return s
+
+    def _print_stacked(self, code: list[se.Expr], shape: tuple[int, int]) -> str:
+        """ Prints a vector or matrix result, the batch dimensions are in front (..., n) or (..., rows, cols)
+        """
+        s = "_stack([" + ", ".join(self._print(c) for c in code) + "], " + self._batch_shape + ")"
+        if shape[0] == 1 or shape[1] == 1:
+            return s
+        return s + f".reshape({self._batch_shape} + {shape})"
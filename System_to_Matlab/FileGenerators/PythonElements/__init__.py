@@ -0,0 +1,3 @@
+from .PyCodeElement import PyCodeElement
+
+__all__ = ["PyCodeElement"]
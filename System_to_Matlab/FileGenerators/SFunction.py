@@ -1,13 +1,19 @@
 from .FileGenerators import FileGenerator
-from .MatlabElements import CodeElement, StringElement
+from .MatlabElements import CodeElement, StringElement, SharedCSE, LocalFunctionsElement
 from ..Calculation.Calculation import Calculation
+from ..Calculation.Substitution import batched_subs
+from ..Symbols.SymbolRegistry import current_registry
 import os
 import symengine as se
 
 from typing import Union
+from ..Instrumentation import instrumented
 
 class SFunction(FileGenerator):
-    def __init__(self, Filename: str, Path: str = "") -> None:
+    _extension: str = ".m"
+
+    def __init__(self, Filename: str, Path: str = "", cse_mode: str = "single", n_workers: int = None, max_ops: int = None,
+                 max_function_ops: int = None) -> None:
         """ Generates an instance of the SFunction class.
 
         Parameters
@@ -16,9 +22,19 @@ class SFunction(FileGenerator):
             The name of the file to be generated. If the file does not end with .m, it will be added.
         Path : str, optional
             Path in which the file should me saved if non is given the current path is used , by default ""
+        cse_mode : str, optional
+            cse mode of the state and output equations ("single" or "partitioned"), see CodeElement, by default "single"
+        n_workers : int, optional
+            number of processes for the partitioned cse, by default None
+        max_ops : int, optional
+            chunked emission: statements of the state and output equations with more operations are split into partial
+            sums and temporaries, see CodeElement, by default None
+        max_function_ops : int, optional
+            if the temporaries of the derivative (output) section have more operations, they are calculated in local
+            functions <name>_dyn_chunk1, ... (<name>_out_chunk1, ...), see CodeElement, by default None
         """
-        if not Filename.endswith(".m"):
-            Filename += ".m"
+        if not Filename.endswith(self._extension):
+            Filename += self._extension
         super().__init__(Filename, Path)
         
         self._Inputs: list[se.Symbol | se.Function] = []
@@ -30,6 +46,10 @@ class SFunction(FileGenerator):
         self._States: se.Matrix = None
         self._Parameters = []
         self._number_of_inputs = 0
+        self._cse_mode: str = cse_mode
+        self._n_workers: int = n_workers
+        self._max_ops: int = max_ops
+        self._max_function_ops: int = max_function_ops
 
     def addState(self, state: se.Matrix ,  equation: Calculation) -> None:
         """Adding the state and the state equations to the SFunction
@@ -132,44 +152,159 @@ class SFunction(FileGenerator):
         else:
             self._Parameters.append(parameter)
     
-    def _Parameter_Input_String(self) -> str:
+    def _Parameter_Input_String(self, indents: int = 2) -> str:
         """PRIVATE Generates the string for the parameters and inputs of the SFunction
 
+        Parameters
+        ----------
+        indents : int, optional
+            indentation of the generated lines, by default 2
+
         Returns
         -------
         str
             String for the parameters and inputs of the SFunction
         """
-        s = list(se.Matrix(self._Parameters)[:,0])
-        s = self._matlab_input_string_generator([s],"params", 2)[1]
-        s += self._matlab_input_string_generator(self._Inputs,"u", 2)[1]
+        s = ""
+        if self._Parameters:
+            s = self._matlab_input_string_generator([self._parameter_list()],"params", indents)[1]
+        s += self._matlab_input_string_generator(self._Inputs,"u", indents)[1]
         return s
     
-    def generateFile(self, overwrite = True) -> None:
+    def _shared_temporaries_string(self, shared: SharedCSE) -> str:
+        """PRIVATE Generates the comma separated list of the temporaries which are calculated in the helper function
+        """
+        return ", ".join(str(r[0]) for r in shared.replacements if r[0] in shared.shared_temporaries)
+
+    def _shared_helper_call(self, shared: SharedCSE) -> str:
+        """PRIVATE Generates the call of the helper function which calculates the shared cse temporaries
+        """
+        return "\t \t" + f"[{self._shared_temporaries_string(shared)}] = {self._Filename[:-2]}_shared(x, u, params); \n"
+
+    def _shared_helper_header(self, shared: SharedCSE) -> str:
+        """PRIVATE Generates the header of the helper function which calculates the shared cse temporaries
+        """
+        return f"function [{self._shared_temporaries_string(shared)}] = {self._Filename[:-2]}_shared(x, u, params) \n"
+
+    def _parameter_list(self) -> list[se.Symbol]:
+        """PRIVATE Returns the parameters (without their values)
+        """
+        if not self._Parameters:
+            return []
+        return list(se.Matrix(self._Parameters)[:, 0])
+
+    def _parameter_symbols(self) -> set[se.Symbol]:
+        """PRIVATE Returns the (printable) symbols of the parameters
+        """
+        return set(current_registry().to_printable(se.Matrix(self._parameter_list()))) if self._Parameters else set()
+
+    def _input_list(self) -> list[se.Symbol]:
+        """PRIVATE Returns the (printable) symbols of all inputs in the order of the input vector
+        """
+        return [current_registry().to_printable(v) for var in self._Input_Calcs.vars for v in var]
+
+    def _substitute_states(self, state_symbol) -> None:
+        """PRIVATE Replaces the states in the state and output equations by state_symbol(i) (index of the state)
+        """
+        state_subs = {state: se.Symbol(state_symbol(i)) for i, state in enumerate(self._States)}
+        self._StateEquations.subs(state_subs)
+        self._Output_Calculations.subs(state_subs)
+        self._Outputs = [batched_subs(out, state_subs) for out in self._Outputs]
+
+    def _shared_cse(self, output_name: str, hoist_parameters: bool) -> tuple[SharedCSE, list[se.Symbol], set[se.Symbol]]:
+        """PRIVATE Runs one cse over the state equations and the outputs (collected in the vector output_name) and hoists the
+        parameter only subexpressions if hoist_parameters is set
+
+        Returns
+        -------
+        tuple[SharedCSE, list[se.Symbol], set[se.Symbol]]
+            the shared cse, the hoisted temporaries in the order they have to be calculated and as set
+        """
+        outputs = Calculation(inline=False)
+        outputs.append_Calculation(self._Output_Calculations)
+        outputs.addCalculation(se.Symbol(output_name), se.Matrix(self._Outputs))
+        shared = SharedCSE([self._StateEquations, outputs])
+        hoisted_set = shared.hoist_invariants(self._parameter_symbols()) if hoist_parameters else set()
+        hoisted = [r[0] for r in shared.replacements if r[0] in hoisted_set]
+        return shared, hoisted, hoisted_set
+
+    def _direct_feedthrough(self) -> bool:
+        """PRIVATE True if an output depends directly on an input
+        """
+        inputs = set(self._input_list())
+        code = Calculation.append_Calculations([self._Output_Calculations])
+        code.to_printable()
+        vector = code._generate_shape_index_list()[1]
+        symbols = set() if vector is None else set().union(*(e.free_symbols for e in vector))
+        for output in self._Outputs:
+            symbols |= se.sympify(current_registry().to_printable(output)).free_symbols
+        return bool(symbols & inputs)
+
+    def _hoisted_string(self, hoisted: list[se.Symbol]) -> str:
+        """PRIVATE Generates the comma separated list of the hoisted parameter temporaries
+        """
+        return ", ".join(str(h) for h in hoisted)
+
+    def _hoisted_update(self, hoisted: list[se.Symbol], indents: int = 2) -> str:
+        """PRIVATE Generates the recalculation of the hoisted parameter temporaries, if the parameters changed
+        """
+        return ("\t" * indents + "if ~isequal(hoisted_params, params) \n"
+                + "\t" * (indents + 1) + f"[{self._hoisted_string(hoisted)}] = {self._Filename[:-2]}_parameters(params); \n"
+                + "\t" * (indents + 1) + "hoisted_params = params; \n"
+                + "\t" * indents + "end \n")
+
+    @instrumented()
+    def generateFile(self, overwrite = True, shared_cse: bool = False, cse_helper_function: bool = False,
+                     hoist_parameters: bool = False) -> None:
         """Generates the file with the given name and path. If the file already exists, it will be overwritten. (If you don't want to overwrite the file, set overwrite to False)
 
         Parameters
         ----------
         overwrite : bool, optional
             Defines if the file should be overwritten, by default True
+        shared_cse : bool, optional
+            If True cse is only run once over the derivative and the output section and every flag branch only
+            calculates the temporaries it needs, by default False
+        cse_helper_function : bool, optional
+            Only used with shared_cse. If True the temporaries needed by both sections are calculated in a local
+            helper function (<name>_shared) which is called in both branches, by default False
+        hoist_parameters : bool, optional
+            If True the cse temporaries which only depend on the parameters are calculated once in the initialization
+            (in the local function <name>_parameters) and kept in persistent variables. They are only recalculated if the
+            parameters change. Uses the shared cse (shared_cse is set), can not be combined with cse_helper_function, by default False
         """
+        if hoist_parameters:
+            if cse_helper_function:
+                raise ValueError("hoist_parameters can not be combined with cse_helper_function")
+            shared_cse = True
         
         if not overwrite and os.path.exists(self._Path + "\\" + self._Filename):
             return
         
-        for i, state in enumerate(self._States):
-            self._StateEquations.subs({state: se.Symbol(f"x({i+1})")})
-            self._Output_Calculations.subs({state: se.Symbol(f"x({i+1})")})
-            for ii, out in enumerate(self._Outputs):
-                self._Outputs[ii] = out.subs({state: se.Symbol(f"x({i+1})")})
+        self._substitute_states(lambda i: f"x({i+1})")
 
         # for i, input in enumerate(self._Inputs):
         #     self._StateEquations.subs({input: se.Symbol(f"u({i+1})")})
         #     self._Output_Calculations.subs({input: se.Symbol(f"u({i+1})")})
             
         
+        if shared_cse:
+            shared, hoisted, hoisted_set = self._shared_cse("sys", hoist_parameters)
+            if cse_helper_function:
+                exclude = shared.shared_temporaries
+                helper_call = self._shared_helper_call(shared) if exclude else ""
+            else:
+                exclude, helper_call = None, ""
+            if hoisted:
+                exclude = hoisted_set
+                helper_call = self._hoisted_update(hoisted)
+        else:
+            hoisted = []
+
         s_para_input = self._Parameter_Input_String()
         self._Elements.append(StringElement(f"function [sys,x0,str,ts] = {self._Filename[:-2]}(t,x,u,flag,params,x_ic) \n "))
+        if hoisted:
+            self._Elements.append(StringElement(f"persistent hoisted_params {' '.join(str(h) for h in hoisted)} \n"))
         self._Elements.append(StringElement("switch flag, \n"))
         self._Elements.append(StringElement("\t" + r"case 0, % initialization" + " \n"))
         self._Elements.append(StringElement("\t \t" + "sizes = simsizes; \n"))
@@ -184,23 +319,42 @@ class SFunction(FileGenerator):
         self._Elements.append(StringElement("\t \t" + "x0 = x_ic; \n \n"))
         self._Elements.append(StringElement("\t \t" + "str = []; "  + r"% str is always an empty matrix" + "\n \n"))
         self._Elements.append(StringElement("\t \t" + "ts = [0 0];"  + r"% initialize the array of sample times" + " \n \n"))
+        if hoisted:
+            self._Elements.append(StringElement("\t \t" + r"% parameter dependent temporaries" + " \n"))
+            self._Elements.append(StringElement("\t \t" + f"[{self._hoisted_string(hoisted)}] = {self._Filename[:-2]}_parameters(params); \n"))
+            self._Elements.append(StringElement("\t \t" + "hoisted_params = params; \n \n"))
 
         self._Elements.append(StringElement("\t" + r"case 1, % derivative" + " \n"))
         self._Elements.append(StringElement("\t \t" + s_para_input +"\n"))
         self._Elements.append(StringElement("\t \t" + f"sys = zeros({len(self._States)},1); \n"))
         
         self._Elements.append(CodeElement(self._Input_Calcs, 2, True, False))
-        self._Elements.append(CodeElement(self._StateEquations, 2, True, False).override_lhs(se.Symbol("sys")))
+        name = self._Filename[:-2]
+        chunking = {"max_ops": self._max_ops, "max_function_ops": self._max_function_ops}
+        if shared_cse:
+            self._Elements.append(StringElement(helper_call))
+            derivative = shared.element(0, 2, exclude, function_name=name + "_dyn_chunk", **chunking)
+        else:
+            derivative = CodeElement(self._StateEquations, 2, True, False, cse_mode=self._cse_mode, n_workers=self._n_workers,
+                                     function_name=name + "_dyn_chunk", **chunking)
+        self._Elements.append(derivative.override_lhs(se.Symbol("sys")))
         
         self._Elements.append(StringElement("\t" + r"case 3, % output" + " \n"))
         self._Elements.append(StringElement("\t \t" + s_para_input +"\n"))
         self._Elements.append(StringElement("\t \t" + f"sys = zeros({len(self._States)},1); \n"))
         
         self._Elements.append(CodeElement(self._Input_Calcs, 2, True, False))  
-        self._Elements.append(CodeElement(self._Output_Calculations, 2, True, False))
-        temp = Calculation()
-        temp.addCalculation(se.Symbol("sys"), se.Matrix(self._Outputs))
-        self._Elements.append(CodeElement(temp,2, True, False))
+        if shared_cse:
+            self._Elements.append(StringElement(helper_call))
+            output = shared.element(1, 2, exclude, function_name=name + "_out_chunk", **chunking)
+            self._Elements.append(output)
+        else:
+            output = CodeElement(self._Output_Calculations, 2, True, False, cse_mode=self._cse_mode, n_workers=self._n_workers,
+                                 function_name=name + "_out_chunk", **chunking)
+            self._Elements.append(output)
+            temp = Calculation()
+            temp.addCalculation(se.Symbol("sys"), se.Matrix(self._Outputs))
+            self._Elements.append(CodeElement(temp,2, True, False))
         
         self._Elements.append(StringElement("\t" + r"case {2,4,9}, % unused flags" + " \n"))
         self._Elements.append(StringElement("\t \t" + "sys = []; \n"))
@@ -209,6 +363,23 @@ class SFunction(FileGenerator):
         self._Elements.append(StringElement("\t \t" + "error(['Unhandled flag = ',num2str(flag)]); \n"))
         self._Elements.append(StringElement("end"))
 
+        if shared_cse and cse_helper_function and helper_call != "":
+            self._Elements.append(StringElement("\n\n"))
+            self._Elements.append(StringElement(self._shared_helper_header(shared)))
+            self._Elements.append(StringElement("\t" + self._Parameter_Input_String(1) +"\n"))
+            self._Elements.append(CodeElement(self._Input_Calcs, 1, True, False))
+            self._Elements.append(shared.shared_element(1))
+            self._Elements.append(StringElement("end"))
+
+        if hoisted:
+            self._Elements.append(StringElement("\n\n"))
+            self._Elements.append(StringElement(f"function [{self._hoisted_string(hoisted)}] = {self._Filename[:-2]}_parameters(params) \n"))
+            s_params = self._parameter_list()
+            self._Elements.append(StringElement("\t" + self._matlab_input_string_generator([s_params], "params", 1)[1] + "\n"))
+            self._Elements.append(shared.temporaries_element(hoisted_set, 1))
+            self._Elements.append(StringElement("end"))
+        self._Elements.append(LocalFunctionsElement([derivative, output]))
+
         if self._Path is None or self._Path == "":
             path = self._Filename
         else:
@@ -216,6 +387,4 @@ class SFunction(FileGenerator):
                 path = self._Path + self._Filename
             else:
                 path = self._Path + "\\" + self._Filename
-        with open(path, "w") as f:
-            for element in self._Elements:
-                f.write(element.generateCode())
\ No newline at end of file
+        self._write_file(path)
\ No newline at end of file
@@ -1,5 +1,9 @@
 from .MFile import MFile
 from .MFunction import MFunction
 from .SFunction import SFunction
+from .CSFunction import CSFunction
+from .Level2SFunction import Level2SFunction
+from .PyFunction import PyFunction
+from .CFunction import CFunction
 
-__all__ = ["MFile", "MFunction", "SFunction"]
\ No newline at end of file
+__all__ = ["MFile", "MFunction", "SFunction", "CSFunction", "Level2SFunction", "PyFunction", "CFunction"]
@@ -13,14 +13,8 @@ def SymbolicMatrix(symbol:str, rows:int, cols:int) -> se.Matrix:
         A symbolic matrix with the given symbol and the given dimensions.
     """
     
-    for i in range(rows):
-        for ii in range(cols):
-            if i == 0 and ii == 0:
-                m = se.Matrix([[se.Symbol(symbol + f"_{{{i}{ii}}}")]])
-            else:
-                m = m.row_join(se.Matrix([[se.Symbol(symbol + f"_{{{i}{ii}}}")]]))
-    
-    return m.reshape(rows,cols)
+    # all elements are created first and the matrix is built at once (row by row)
+    return se.Matrix(rows, cols, [se.Symbol(symbol + f"_{{{i}{ii}}}") for i in range(rows) for ii in range(cols)])
 
 def disp(*args):
     for exp in args:
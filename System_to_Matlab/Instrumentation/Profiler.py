@@ -0,0 +1,306 @@
+from __future__ import annotations
+import functools
+import time
+import tracemalloc
+
+import symengine as se
+
+from typing import Any, Callable, Iterable
+
+
+class StageEvent:
+    def __init__(self, name: str, duration: float, peak_kb: float = None, values: dict[str, float] = None) -> None:
+        """ A finished operation (stage) of the generation, passed to the listeners
+
+        Parameters
+        ----------
+        name : str
+            name of the operation, e.g. "CodeElement.cse"
+        duration : float
+            wall time [s], including nested operations
+        peak_kb : float, optional
+            peak of the python allocations (tracemalloc) above the allocations at the start [kB], None if memory is not traced, by default None
+        values : dict[str, float], optional
+            recorded values, e.g. ops_before and ops_after of a cse, by default None
+        """
+        self.name = name
+        self.duration = duration
+        self.peak_kb = peak_kb
+        self.values = values or {}
+
+    def __repr__(self) -> str:
+        return f"StageEvent({self.name!r}, {self.duration:.6f}s, peak_kb={self.peak_kb}, values={self.values})"
+
+
+class StageStats:
+    def __init__(self, name: str) -> None:
+        """ Accumulated statistics of all calls of an operation, see ProfileReport
+        """
+        self.name: str = name
+        self.calls: int = 0
+        self.time: float = 0.0
+        self.peak_kb: float = None
+        self.values: dict[str, float] = {}
+
+    def add(self, event: StageEvent) -> None:
+        self.calls += 1
+        self.time += event.duration
+        if event.peak_kb is not None:
+            self.peak_kb = max(self.peak_kb or 0.0, event.peak_kb)
+        for key, value in event.values.items():
+            self.values[key] = self.values.get(key, 0) + value
+
+    @property
+    def ratios(self) -> dict[str, float]:
+        """ after/before of the recorded pairs <name>_before and <name>_after, e.g. ops_ratio of the cse or bytes_ratio
+        of the loop rerolling
+        """
+        ratios = {}
+        for key, before in self.values.items():
+            if key.endswith("_before") and before:
+                after = self.values.get(key[:-len("_before")] + "_after")
+                if after is not None:
+                    ratios[key[:-len("_before")] + "_ratio"] = after/before
+        return ratios
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"calls": self.calls, "time": self.time, "peak_kb": self.peak_kb, **self.values, **self.ratios}
+
+
+class ProfileReport:
+    def __init__(self) -> None:
+        """ Statistics of the operations recorded by a Profiler (in the order in which they were first finished).
+        Times include nested operations (e.g. MFunction.generateFile contains CodeElement.cse).
+        """
+        self._stats: dict[str, StageStats] = {}
+
+    def add(self, event: StageEvent) -> None:
+        if event.name not in self._stats:
+            self._stats[event.name] = StageStats(event.name)
+        self._stats[event.name].add(event)
+
+    @property
+    def stats(self) -> list[StageStats]:
+        return list(self._stats.values())
+
+    def __getitem__(self, name: str) -> StageStats:
+        return self._stats[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._stats
+
+    def to_dict(self) -> dict[str, dict[str, Any]]:
+        """ the statistics as {name: {"calls": ..., "time": ..., "peak_kb": ..., <values>}}, e.g. for json.dump
+        """
+        return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+    def table(self, sort: str = None) -> str:
+        """ the statistics as human readable table
+
+        Parameters
+        ----------
+        sort : str, optional
+            "time" or "calls" to sort the operations (descending), by default the order in which they were first finished
+        """
+        stats = self.stats
+        if sort is not None:
+            stats = sorted(stats, key=lambda s: getattr(s, sort), reverse=True)
+        keys: list[str] = []
+        for s in stats:
+            keys += [k for k in {**s.values, **s.ratios} if k not in keys]
+        width = max([len("operation")] + [len(s.name) for s in stats])
+        lines = [f"{'operation':<{width}}{'calls':>8}{'time [s]':>12}{'peak [kB]':>12}" + "".join(f"{k:>14}" for k in keys)]
+        for s in stats:
+            peak = "-" if s.peak_kb is None else f"{s.peak_kb:.1f}"
+            values = {**s.values, **s.ratios}
+            values = "".join(f"{_format(values[k]) if k in values else '-':>14}" for k in keys)
+            lines.append(f"{s.name:<{width}}{s.calls:>8}{s.time:>12.4f}{peak:>12}" + values)
+        return "\n".join(lines)
+
+    def __str__(self) -> str:
+        return self.table()
+
+
+def _format(value: float) -> str:
+    return str(value) if isinstance(value, int) else f"{value:.4g}"
+
+
+# callbacks which get a StageEvent for every finished operation
+_listeners: list[Callable[[StageEvent], None]] = []
+# number of listeners which want the tracemalloc peaks
+_memory_listeners: int = 0
+# running stages, used to forward the memory peaks of nested stages
+_stack: list[Stage] = []
+
+
+def add_listener(callback: Callable[[StageEvent], None], memory: bool = False) -> None:
+    """ Registers a callback which is called with a StageEvent after every instrumented operation.
+
+    Parameters
+    ----------
+    callback : Callable[[StageEvent], None]
+        the callback
+    memory : bool, optional
+        if True the tracemalloc peaks are recorded as well (tracemalloc has to be started, slows down the generation), by default False
+    """
+    global _memory_listeners
+    _listeners.append(callback)
+    _memory_listeners += memory
+
+
+def remove_listener(callback: Callable[[StageEvent], None], memory: bool = False) -> None:
+    """ Removes a callback registered with add_listener (memory has to be the same as when it was added)
+    """
+    global _memory_listeners
+    _listeners.remove(callback)
+    _memory_listeners -= memory
+
+
+def is_active() -> bool:
+    """ True if an operation would be recorded, e.g. to skip the calculation of values only needed for the instrumentation
+    """
+    return bool(_listeners)
+
+
+class Stage:
+    def __init__(self, name: str) -> None:
+        """ Context manager which times an operation and sends a StageEvent to the listeners, see stage
+        """
+        self.name: str = name
+        self.values: dict[str, float] = {}
+        self._memory: bool = _memory_listeners > 0 and tracemalloc.is_tracing()
+        self._start_memory: int = 0
+        self._peak: int = 0
+        self._start: float = 0.0
+
+    @property
+    def active(self) -> bool:
+        return True
+
+    def record(self, **values: float) -> None:
+        """ records values of the operation (summed up over several calls), e.g. record(ops_before=..., ops_after=...)
+        """
+        for key, value in values.items():
+            self.values[key] = self.values.get(key, 0) + value
+
+    def __enter__(self) -> Stage:
+        if self._memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if _stack:
+                _stack[-1]._peak = max(_stack[-1]._peak, peak)
+            tracemalloc.reset_peak()
+            self._start_memory = self._peak = current
+        _stack.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        duration = time.perf_counter() - self._start
+        _stack.pop()
+        peak_kb = None
+        if self._memory and tracemalloc.is_tracing():
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            peak_kb = (self._peak - self._start_memory)/1024
+            if _stack:
+                _stack[-1]._peak = max(_stack[-1]._peak, self._peak)
+        event = StageEvent(self.name, duration, peak_kb, self.values)
+        for listener in list(_listeners):
+            listener(event)
+
+
+class _InactiveStage:
+    """ Stage used when nothing is recorded, does nothing
+    """
+    active = False
+
+    def record(self, **values: float) -> None:
+        pass
+
+    def __enter__(self) -> _InactiveStage:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_inactive_stage = _InactiveStage()
+
+
+def stage(name: str) -> Stage | _InactiveStage:
+    """ Context manager for an instrumented operation. Without listeners (no running Profiler) it does nothing.
+    Values which are expensive to calculate should only be recorded if the stage is active:
+
+        with stage("CodeElement.cse") as s:
+            ...
+            if s.active:
+                s.record(ops_before=count_ops(code))
+    """
+    if not _listeners:
+        return _inactive_stage
+    return Stage(name)
+
+
+def instrumented(name: str = None) -> Callable[[Callable], Callable]:
+    """ Decorator which records every call of the function as an operation, by default named after its qualified name
+    (e.g. "Calculation.addCalculation")
+    """
+    def decorator(function: Callable) -> Callable:
+        stage_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _listeners:
+                return function(*args, **kwargs)
+            with Stage(stage_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count_ops(exprs: Iterable[se.Basic]) -> int:
+    """ number of operations of all expressions (elements of matrices are counted one by one)
+    """
+    elements: list[se.Basic] = []
+    for expr in exprs:
+        if isinstance(expr, se.MatrixBase):
+            elements.extend(expr)
+        elif expr is not None:
+            elements.append(expr)
+    return int(se.count_ops(*elements)) if elements else 0
+
+
+class Profiler:
+    def __init__(self, memory: bool = False) -> None:
+        """ Records wall time, number of calls, expression sizes (ops before and after the cse) and optionally the
+        tracemalloc peaks of the operations of the generation (Calculation, CodeElement, FileGenerator and system methods)
+        while it is active:
+
+            with Profiler(memory=True) as profiler:
+                system.write_SFunction("model")
+            print(profiler.report.table())
+
+        Parameters
+        ----------
+        memory : bool, optional
+            if True the peaks of the python allocations are traced with tracemalloc (slows down the generation), by default False
+        """
+        self._memory: bool = memory
+        self._report: ProfileReport = ProfileReport()
+        self._started_tracing: bool = False
+
+    @property
+    def report(self) -> ProfileReport:
+        return self._report
+
+    def __enter__(self) -> Profiler:
+        if self._memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        add_listener(self._report.add, self._memory)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        remove_listener(self._report.add, self._memory)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
@@ -0,0 +1,4 @@
+from .Profiler import Profiler, ProfileReport, StageStats, StageEvent, stage, instrumented, add_listener, remove_listener, is_active, count_ops
+
+__all__ = ["Profiler", "ProfileReport", "StageStats", "StageEvent", "stage", "instrumented", "add_listener", "remove_listener",
+           "is_active", "count_ops"]
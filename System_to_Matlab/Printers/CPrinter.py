@@ -0,0 +1,204 @@
+from __future__ import annotations
+from .MatlabPrinter import MatlabPrinter, PRECEDENCE_ATOM, PRECEDENCE_ADD, PRECEDENCE_MUL, PRECEDENCE_AND, PRECEDENCE_OR, PRECEDENCE_NOT
+import symengine as se
+import math
+from typing import Union
+
+
+class CPrinter(MatlabPrinter):
+    """ Prints symengine expressions as C99 code (math.h). Numbers which could be evaluated as integer divisions in C
+    (rationals) are printed as floating point literals. With single_precision the float versions of the functions
+    (sinf, ...) and float literals (1.5f) are used.
+    """
+
+    _function_names: dict = {
+        "sin": "sin",
+        "cos": "cos",
+        "tan": "tan",
+        "asin": "asin",
+        "acos": "acos",
+        "atan": "atan",
+        "atan2": "atan2",
+        "sinh": "sinh",
+        "cosh": "cosh",
+        "tanh": "tanh",
+        "asinh": "asinh",
+        "acosh": "acosh",
+        "atanh": "atanh",
+        "log": "log",
+        "Abs": "fabs",
+        "floor": "floor",
+        "ceiling": "ceil",
+        "Max": "fmax",
+        "Min": "fmin",
+    }
+    _constants: dict = {
+        "Pi": "3.141592653589793",
+        "Exp1": "2.718281828459045",
+        "Infinity": "INFINITY",
+        "NegativeInfinity": "-INFINITY",
+        "ComplexInfinity": "INFINITY",
+        "NaN": "NAN",
+        "BooleanTrue": "1",
+        "BooleanFalse": "0",
+        "EulerGamma": "0.5772156649015329",
+    }
+    _relational_operators: dict = {
+        "StrictLessThan": "<",
+        "LessThan": "<=",
+        "StrictGreaterThan": ">",
+        "GreaterThan": ">=",
+        "Equality": "==",
+        "Unequality": "!=",
+    }
+    _keywords: frozenset = frozenset([
+        "auto", "break", "case", "char", "const", "continue", "default", "do", "double", "else", "enum", "extern", "float",
+        "for", "goto", "if", "inline", "int", "long", "register", "restrict", "return", "short", "signed", "sizeof", "static",
+        "struct", "switch", "typedef", "union", "unsigned", "void", "volatile", "while", "_Bool", "_Complex", "_Imaginary",
+    ])
+    _mul_symbol: str = "*"
+    _div_symbol: str = "/"
+    _exp_function: str = "exp"
+    _sqrt_function: str = "sqrt"
+
+    def __init__(self, single_precision: bool = False) -> None:
+        """ Prints symengine expressions as C99 code.
+
+        Parameters
+        ----------
+        single_precision : bool, optional
+            if True float functions and literals are used, by default False
+        """
+        super().__init__()
+        self._single_precision: bool = single_precision
+        self._suffix: str = "f" if single_precision else ""
+
+    def _function(self, name: str) -> str:
+        return name + self._suffix
+
+    def _print_Symbol(self, expr: se.Symbol) -> tuple[str, int]:
+        name = expr.name
+        if name in self._keywords:
+            name += "_"
+        return name, PRECEDENCE_ATOM
+
+    def _print_Integer(self, expr: se.Integer) -> tuple[str, int]:
+        value = int(expr)
+        if abs(value) >= 2**31:
+            return self._print_RealDouble(se.RealDouble(float(value)))
+        return str(value), PRECEDENCE_ADD if value < 0 else PRECEDENCE_ATOM
+
+    def _print_Rational(self, expr: se.Rational) -> tuple[str, int]:
+        p, q = expr.get_num_den()
+        s = self._float_literal(float(p)) + "/" + self._float_literal(float(q))
+        return s, PRECEDENCE_ADD if p < 0 else PRECEDENCE_MUL
+
+    def _float_literal(self, value: float) -> str:
+        s = repr(value)
+        if "e" not in s and "." not in s:
+            s += ".0"
+        return s + self._suffix
+
+    def _format_float(self, value: float) -> str:
+        if math.isnan(value):
+            return "NAN"
+        if math.isinf(value):
+            return "INFINITY" if value > 0 else "-INFINITY"
+        return self._float_literal(value)
+
+    def _print_Constant(self, expr: se.Basic) -> tuple[str, int]:
+        s, precedence = super()._print_Constant(expr)
+        if "." in s:
+            s += self._suffix
+        return s, precedence
+
+    _print_Infinity = _print_Constant
+    _print_NegativeInfinity = _print_Constant
+    _print_ComplexInfinity = _print_Constant
+    _print_NaN = _print_Constant
+    _print_BooleanAtom = _print_Constant
+
+    def _print_ComplexBase(self, expr: se.Number) -> tuple[str, int]:
+        raise TypeError(f"{type(self).__name__} can not print the complex number {expr}")
+
+    def _print_ImaginaryUnit(self, expr: se.Basic) -> tuple[str, int]:
+        raise TypeError(f"{type(self).__name__} can not print the imaginary unit")
+
+    def _print_Pow(self, expr: se.Pow) -> tuple[str, int]:
+        base, exp = expr.args
+        if base == se.E:
+            return self._print_function_call(self._function(self._exp_function), [exp])
+        if exp == se.Rational(1, 2):
+            return self._print_function_call(self._function(self._sqrt_function), [base])
+        if exp == se.Rational(-1, 2):
+            return self._float_literal(1.0) + "/" + self._print_function_call(self._function(self._sqrt_function), [base])[0], PRECEDENCE_MUL
+        if exp == -1:
+            return self._float_literal(1.0) + "/" + self._parenthesize(base, PRECEDENCE_MUL), PRECEDENCE_MUL
+        if (exp == 2 or exp == 3) and isinstance(base, se.Symbol):
+            # small integer powers of symbols (e.g. cse temporaries) are cheaper as multiplications than pow
+            return "*".join([self._print(base)[0]] * int(exp)), PRECEDENCE_MUL
+        return self._print_function_call(self._function("pow"), [base, exp])
+
+    def _print_Function(self, expr: se.Function) -> tuple[str, int]:
+        name = type(expr).__name__
+        if name == "sign":
+            arg = self._print(expr.args[0])[0]
+            return f"(({arg} > 0) - ({arg} < 0))", PRECEDENCE_ATOM
+        if name not in self._function_names:
+            raise TypeError(f"{type(self).__name__} can not print the function {expr}")
+        return self._print_function_call(self._function(self._function_names[name]), expr.args)
+
+    def _print_MinMaxBase(self, expr: se.Function) -> tuple[str, int]:
+        name = self._function(self._function_names[type(expr).__name__])
+        args = sorted(expr.args, key=lambda a: self._print(a)[0])
+        s = self._print(args[-1])[0]
+        for a in reversed(args[:-1]):
+            s = f"{name}({self._print(a)[0]}, {s})"
+        return s, PRECEDENCE_ATOM
+
+    _print_Max = _print_MinMaxBase
+    _print_Min = _print_MinMaxBase
+
+    def _print_Piecewise(self, expr: se.Piecewise) -> tuple[str, int]:
+        args = expr.args
+        pairs = [(args[i], args[i + 1]) for i in range(0, len(args), 2)]
+        if pairs[-1][1] != se.true:
+            raise ValueError("Piecewise expressions need a default case (condition True) to be printed")
+        s = self._print(pairs[-1][0])[0]
+        for e, c in reversed(pairs[:-1]):
+            s = f"({self._print(c)[0]} ? {self._print(e)[0]} : {s})"
+        return s, PRECEDENCE_ATOM
+
+    def _print_And(self, expr: se.Basic) -> tuple[str, int]:
+        args = sorted(self._parenthesize(a, PRECEDENCE_AND) for a in expr.args)
+        return " && ".join(args), PRECEDENCE_AND
+
+    def _print_Or(self, expr: se.Basic) -> tuple[str, int]:
+        args = sorted(self._parenthesize(a, PRECEDENCE_OR) for a in expr.args)
+        return " || ".join(args), PRECEDENCE_OR
+
+    def _print_Not(self, expr: se.Basic) -> tuple[str, int]:
+        return "!" + self._parenthesize(expr.args[0], PRECEDENCE_NOT), PRECEDENCE_NOT
+
+    def _print_Matrix(self, expr: se.Matrix) -> str:
+        """ Prints the matrix as initializer list (row major)
+        """
+        return "{" + ", ".join(self._print(e)[0] for e in expr) + "}"
+
+
+def c_code(expr: Union[se.Basic, se.Matrix, int, float], printer: CPrinter = None) -> str:
+    """ Prints a symengine expression or Matrix as C99 code.
+    ----------
+    expr : Union[se.Basic, se.Matrix, int, float]
+        expression which should be printed
+    printer : CPrinter, optional
+        printer which should be used (to share the cache of already printed subexpressions), by default None
+
+    Returns
+    -------
+    str
+        the generated code
+    """
+    if printer is None:
+        printer = CPrinter()
+    return printer.doprint(expr)
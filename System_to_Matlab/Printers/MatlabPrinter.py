@@ -0,0 +1,345 @@
+from __future__ import annotations
+import symengine as se
+import math
+import re
+from typing import Union
+
+
+# precedence levels (same ordering as the sympy printers)
+PRECEDENCE_ATOM = 1000
+PRECEDENCE_POW = 60
+PRECEDENCE_MUL = 50
+PRECEDENCE_ADD = 40
+PRECEDENCE_RELATIONAL = 35
+PRECEDENCE_NOT = 30
+PRECEDENCE_AND = 20
+PRECEDENCE_OR = 10
+
+
+class MatlabPrinter:
+    """ Prints symengine expressions as Matlab code without converting them to sympy.
+    Element wise operators (.*, ./, .^) are used for everything that is not a number, like sp.octave_code does.
+    Already printed subtrees are memoized, so a printer instance should be reused for all expressions of one file.
+    """
+
+    _function_names: dict = {
+        "Abs": "abs",
+        "ceiling": "ceil",
+        "LambertW": "lambertw",
+        "Max": "max",
+        "Min": "min",
+    }
+    _constants: dict = {
+        "Pi": "pi",
+        "Exp1": "exp(1)",
+        "ImaginaryUnit": "1i",
+        "Infinity": "inf",
+        "NegativeInfinity": "-inf",
+        "ComplexInfinity": "inf",
+        "NaN": "NaN",
+        "BooleanTrue": "true",
+        "BooleanFalse": "false",
+        "EulerGamma": "0.5772156649015329",
+    }
+    _relational_operators: dict = {
+        "StrictLessThan": "<",
+        "LessThan": "<=",
+        "StrictGreaterThan": ">",
+        "GreaterThan": ">=",
+        "Equality": "==",
+        "Unequality": "~=",
+    }
+    _mul_symbol: str = ".*"
+    _div_symbol: str = "./"
+    _pow_symbol: str = ".^"
+    _number_pow_symbol: str = "^"
+    _and_symbol: str = " & "
+    _or_symbol: str = " | "
+    _not_symbol: str = "~"
+    _exp_function: str = "exp"
+    _sqrt_function: str = "sqrt"
+    _imaginary_suffix: str = "i"
+
+    _coefficient_pattern = re.compile(r"^-?[0-9.]+(e-?[0-9]+)?\*")
+
+    def __init__(self) -> None:
+        self._memo: dict = {}
+        self._is_number_memo: dict = {}
+
+    def doprint(self, expr: Union[se.Basic, se.Matrix, int, float]) -> str:
+        """ Returns the code for the given expression or Matrix.
+        ----------
+        expr : Union[se.Basic, se.Matrix, int, float]
+            expression which should be printed
+
+        Returns
+        -------
+        str
+            the generated code
+        """
+        if isinstance(expr, se.Matrix):
+            return self._print_Matrix(expr)
+        return self._print(se.sympify(expr))[0]
+
+    def clear_cache(self) -> None:
+        self._memo.clear()
+        self._is_number_memo.clear()
+
+    # ------------------------------------------------------------------ dispatch
+
+    def _print(self, expr: se.Basic) -> tuple[str, int]:
+        """ Returns the code and the precedence of the expression.
+        """
+        try:
+            return self._memo[expr]
+        except KeyError:
+            pass
+        except TypeError:  # not hashable
+            return self._dispatch(expr)
+        result = self._memo[expr] = self._dispatch(expr)
+        return result
+
+    def _dispatch(self, expr: se.Basic) -> tuple[str, int]:
+        for cls in type(expr).__mro__:
+            method = getattr(self, "_print_" + cls.__name__, None)
+            if method is not None:
+                return method(expr)
+        raise TypeError(f"{type(self).__name__} can not print {type(expr).__name__}: {expr}")
+
+    def _is_number(self, expr: se.Basic) -> bool:
+        """ True if the expression is a (constant) number, used to decide between the scalar and the element wise operators.
+        """
+        if expr.is_Number or expr.is_number:
+            return True
+        try:
+            return self._is_number_memo[expr]
+        except KeyError:
+            pass
+        result = self._is_number_memo[expr] = not expr.free_symbols and not expr.atoms(se.AppliedUndef)
+        return result
+
+    def _parenthesize(self, expr: se.Basic, level: int) -> str:
+        s, prec = self._print(expr)
+        if prec <= level:
+            return "(" + s + ")"
+        return s
+
+    # ------------------------------------------------------------------ atoms
+
+    def _print_Symbol(self, expr: se.Symbol) -> tuple[str, int]:
+        return expr.name, PRECEDENCE_ATOM
+
+    def _print_Integer(self, expr: se.Integer) -> tuple[str, int]:
+        value = int(expr)
+        return str(value), PRECEDENCE_ADD if value < 0 else PRECEDENCE_ATOM
+
+    def _print_Rational(self, expr: se.Rational) -> tuple[str, int]:
+        p, q = expr.get_num_den()
+        return f"{p}/{q}", PRECEDENCE_ADD if p < 0 else PRECEDENCE_MUL
+
+    def _print_RealDouble(self, expr: se.Number) -> tuple[str, int]:
+        s = self._format_float(float(expr))
+        return s, PRECEDENCE_ADD if s.startswith("-") else PRECEDENCE_ATOM
+
+    def _print_RealMPFR(self, expr: se.Number) -> tuple[str, int]:
+        return self._print_RealDouble(expr)
+
+    def _print_ComplexBase(self, expr: se.Number) -> tuple[str, int]:
+        real, imag = self._print(expr.real_part())[0], self._print(expr.imaginary_part())
+        s = imag[0] + self._imaginary_suffix if imag[1] == PRECEDENCE_ATOM else "(" + imag[0] + ")*1" + self._imaginary_suffix
+        if expr.real_part() != 0:
+            s = real + " + " + s if not s.startswith("-") else real + " - " + s[1:]
+            return s, PRECEDENCE_ADD
+        return s, PRECEDENCE_ADD if s.startswith("-") else PRECEDENCE_MUL
+
+    def _format_float(self, value: float) -> str:
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "Inf" if value > 0 else "-Inf"
+        return repr(value)
+
+    def _print_Constant(self, expr: se.Basic) -> tuple[str, int]:
+        name = type(expr).__name__
+        if name not in self._constants:
+            raise TypeError(f"{type(self).__name__} can not print the constant {expr}")
+        s = self._constants[name]
+        return s, PRECEDENCE_ADD if s.startswith("-") else PRECEDENCE_ATOM
+
+    _print_ImaginaryUnit = _print_Constant
+    _print_Infinity = _print_Constant
+    _print_NegativeInfinity = _print_Constant
+    _print_ComplexInfinity = _print_Constant
+    _print_NaN = _print_Constant
+    _print_BooleanAtom = _print_Constant
+
+    # ------------------------------------------------------------------ arithmetic
+
+    def _print_Add(self, expr: se.Add) -> tuple[str, int]:
+        number = None
+        terms = []
+        for term in expr.args:
+            if term.is_Number:
+                number = term
+            else:
+                s = self._print(term)[0]
+                terms.append((self._coefficient_pattern.sub("", s.removeprefix("-")), s))
+        terms.sort()
+        printed = [t[1] for t in terms]
+        if number is not None:
+            printed.append(self._print(number)[0])
+
+        s = ""
+        for i, t in enumerate(printed):
+            if t.startswith("-"):
+                s += ("-" if i == 0 else " - ") + t[1:]
+            else:
+                s += ("" if i == 0 else " + ") + t
+        return s, PRECEDENCE_ADD
+
+    def _print_Mul(self, expr: se.Mul) -> tuple[str, int]:
+        args = list(expr.args)
+        sign = ""
+        numerator: list[se.Basic] = []
+        denominator: list[se.Basic] = []
+
+        if args[0].is_Number:
+            coeff = args.pop(0)
+            if coeff.is_negative:
+                sign = "-"
+                coeff = -coeff
+            if isinstance(coeff, se.Rational):
+                p, q = coeff.get_num_den()
+                if p != 1:
+                    numerator.append(se.Integer(p))
+                if q != 1:
+                    denominator.append(se.Integer(q))
+            elif coeff != 1:
+                numerator.append(coeff)
+
+        factors = []
+        for item in args:
+            if isinstance(item, se.Pow) and item.args[1].is_Number and item.args[1].is_negative \
+                    and isinstance(item.args[1], se.Rational):
+                denominator.append(item.args[0] if item.args[1] == -1 else item.args[0]**(-item.args[1]))
+            else:
+                factors.append(item)
+        factors.sort(key=lambda f: (self._print(f)[1] <= PRECEDENCE_MUL, self._print(f)[0]))  # sums at the end
+        numerator.extend(factors)
+        if not numerator:
+            numerator = [se.Integer(1)]
+
+        s = sign + self._multjoin(numerator)
+        if len(denominator) == 1:
+            div = "/" if self._is_number(denominator[0]) else self._div_symbol
+            s += div + self._parenthesize(denominator[0], PRECEDENCE_MUL)
+        elif denominator:
+            div = "/" if all(self._is_number(d) for d in denominator) else self._div_symbol
+            s += div + "(" + self._multjoin(denominator) + ")"
+        return s, PRECEDENCE_ADD if sign else PRECEDENCE_MUL
+
+    def _multjoin(self, factors: list[se.Basic]) -> str:
+        s = self._parenthesize(factors[0], PRECEDENCE_MUL)
+        for previous, factor in zip(factors[:-1], factors[1:]):
+            s += ("*" if self._is_number(previous) else self._mul_symbol) + self._parenthesize(factor, PRECEDENCE_MUL)
+        return s
+
+    def _print_Pow(self, expr: se.Pow) -> tuple[str, int]:
+        base, exp = expr.args
+        if base == se.E:
+            return self._print_function_call(self._exp_function, [exp])
+        div = "/" if self._is_number(base) else self._div_symbol
+        if exp == se.Rational(1, 2):
+            return self._print_function_call(self._sqrt_function, [base])
+        if exp == se.Rational(-1, 2):
+            return "1" + div + self._print_function_call(self._sqrt_function, [base])[0], PRECEDENCE_MUL
+        if exp == -1:
+            return "1" + div + self._parenthesize(base, PRECEDENCE_POW), PRECEDENCE_MUL
+        pow_symbol = self._number_pow_symbol if self._is_number(base) and self._is_number(exp) else self._pow_symbol
+        return self._parenthesize(base, PRECEDENCE_POW) + pow_symbol + self._parenthesize(exp, PRECEDENCE_POW), PRECEDENCE_POW
+
+    # ------------------------------------------------------------------ functions
+
+    def _print_function_call(self, name: str, args: list) -> tuple[str, int]:
+        return name + "(" + ", ".join(self._print(a)[0] for a in args) + ")", PRECEDENCE_ATOM
+
+    def _print_Function(self, expr: se.Function) -> tuple[str, int]:
+        name = type(expr).__name__
+        return self._print_function_call(self._function_names.get(name, name), expr.args)
+
+    def _print_AppliedUndef(self, expr: se.Function) -> tuple[str, int]:
+        return self._print_function_call(expr.get_name(), expr.args)
+
+    # undefined functions are FunctionSymbols, e.g. the indexed elements T(i - 1) of an IndexedSymbol
+    _print_FunctionSymbol = _print_AppliedUndef
+
+    def _print_MinMaxBase(self, expr: se.Function) -> tuple[str, int]:
+        name = self._function_names[type(expr).__name__]
+        args = sorted(expr.args, key=lambda a: self._print(a)[0])
+        s = self._print(args[-1])[0]
+        for a in reversed(args[:-1]):
+            s = f"{name}({self._print(a)[0]}, {s})"
+        return s, PRECEDENCE_ATOM
+
+    _print_Max = _print_MinMaxBase
+    _print_Min = _print_MinMaxBase
+
+    def _print_Piecewise(self, expr: se.Piecewise) -> tuple[str, int]:
+        args = expr.args
+        pairs = [(args[i], args[i + 1]) for i in range(0, len(args), 2)]
+        if pairs[-1][1] != se.true:
+            raise ValueError("Piecewise expressions need a default case (condition True) to be printed")
+        s = self._print(pairs[-1][0])[0]
+        for e, c in reversed(pairs[:-1]):
+            c_str = self._print(c)[0]
+            s = f"({c_str}){self._mul_symbol}({self._print(e)[0]}) + ({self._not_symbol}({c_str})){self._mul_symbol}({s})"
+        return "(" + s + ")", PRECEDENCE_ATOM
+
+    # ------------------------------------------------------------------ logic
+
+    def _print_Relational(self, expr: se.Relational) -> tuple[str, int]:
+        op = self._relational_operators[type(expr).__name__]
+        lhs = self._parenthesize(expr.args[0], PRECEDENCE_RELATIONAL)
+        rhs = self._parenthesize(expr.args[1], PRECEDENCE_RELATIONAL)
+        return f"{lhs} {op} {rhs}", PRECEDENCE_RELATIONAL
+
+    def _print_And(self, expr: se.Basic) -> tuple[str, int]:
+        args = sorted(self._parenthesize(a, PRECEDENCE_AND) for a in expr.args)
+        return self._and_symbol.join(args), PRECEDENCE_AND
+
+    def _print_Or(self, expr: se.Basic) -> tuple[str, int]:
+        args = sorted(self._parenthesize(a, PRECEDENCE_OR) for a in expr.args)
+        return self._or_symbol.join(args), PRECEDENCE_OR
+
+    def _print_Not(self, expr: se.Basic) -> tuple[str, int]:
+        return self._not_symbol + self._parenthesize(expr.args[0], PRECEDENCE_NOT), PRECEDENCE_NOT
+
+    # ------------------------------------------------------------------ matrices
+
+    def _print_Matrix(self, expr: se.Matrix) -> str:
+        rows, cols = expr.shape
+        if rows == 0 and cols == 0:
+            return "[]"
+        if rows == 0 or cols == 0:
+            return f"zeros({rows}, {cols})"
+        if rows == 1 and cols == 1:
+            return self._print(expr[0, 0])[0]
+        return "[" + "; ".join(" ".join(self._print(expr[r, c])[0] for c in range(cols)) for r in range(rows)) + "]"
+
+
+def matlab_code(expr: Union[se.Basic, se.Matrix, int, float], printer: MatlabPrinter = None) -> str:
+    """ Prints a symengine expression or Matrix as Matlab code.
+    ----------
+    expr : Union[se.Basic, se.Matrix, int, float]
+        expression which should be printed
+    printer : MatlabPrinter, optional
+        printer which should be used (to share the cache of already printed subexpressions), by default None
+
+    Returns
+    -------
+    str
+        the generated code
+    """
+    if printer is None:
+        printer = MatlabPrinter()
+    return printer.doprint(expr)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+from .MatlabPrinter import MatlabPrinter, PRECEDENCE_ATOM
+import symengine as se
+import keyword
+import math
+from typing import Union
+
+
+class NumPyPrinter(MatlabPrinter):
+    """ Prints symengine expressions as NumPy code (with numpy imported as np).
+    All operators work element wise on arrays, so the generated code can evaluate batches of values at once.
+    """
+
+    _function_names: dict = {
+        "sin": "np.sin",
+        "cos": "np.cos",
+        "tan": "np.tan",
+        "asin": "np.arcsin",
+        "acos": "np.arccos",
+        "atan": "np.arctan",
+        "atan2": "np.arctan2",
+        "sinh": "np.sinh",
+        "cosh": "np.cosh",
+        "tanh": "np.tanh",
+        "asinh": "np.arcsinh",
+        "acosh": "np.arccosh",
+        "atanh": "np.arctanh",
+        "log": "np.log",
+        "Abs": "np.abs",
+        "sign": "np.sign",
+        "floor": "np.floor",
+        "ceiling": "np.ceil",
+        "Max": "np.maximum",
+        "Min": "np.minimum",
+    }
+    _constants: dict = {
+        "Pi": "np.pi",
+        "Exp1": "np.e",
+        "ImaginaryUnit": "1j",
+        "Infinity": "np.inf",
+        "NegativeInfinity": "-np.inf",
+        "ComplexInfinity": "np.inf",
+        "NaN": "np.nan",
+        "BooleanTrue": "True",
+        "BooleanFalse": "False",
+        "EulerGamma": "0.5772156649015329",
+    }
+    _relational_operators: dict = {
+        "StrictLessThan": "<",
+        "LessThan": "<=",
+        "StrictGreaterThan": ">",
+        "GreaterThan": ">=",
+        "Equality": "==",
+        "Unequality": "!=",
+    }
+    _mul_symbol: str = "*"
+    _div_symbol: str = "/"
+    _pow_symbol: str = "**"
+    _number_pow_symbol: str = "**"
+    _exp_function: str = "np.exp"
+    _sqrt_function: str = "np.sqrt"
+    _imaginary_suffix: str = "j"
+
+    def _print_Symbol(self, expr: se.Symbol) -> tuple[str, int]:
+        name = expr.name
+        if keyword.iskeyword(name):
+            name += "_"
+        return name, PRECEDENCE_ATOM
+
+    def _format_float(self, value: float) -> str:
+        if math.isnan(value):
+            return "np.nan"
+        if math.isinf(value):
+            return "np.inf" if value > 0 else "-np.inf"
+        return repr(value)
+
+    def _print_Function(self, expr: se.Function) -> tuple[str, int]:
+        name = type(expr).__name__
+        if name not in self._function_names:
+            raise TypeError(f"{type(self).__name__} can not print the function {expr}")
+        return self._print_function_call(self._function_names[name], expr.args)
+
+    def _print_Piecewise(self, expr: se.Piecewise) -> tuple[str, int]:
+        args = expr.args
+        pairs = [(args[i], args[i + 1]) for i in range(0, len(args), 2)]
+        if pairs[-1][1] != se.true:
+            raise ValueError("Piecewise expressions need a default case (condition True) to be printed")
+        s = self._print(pairs[-1][0])[0]
+        for e, c in reversed(pairs[:-1]):
+            s = f"np.where({self._print(c)[0]}, {self._print(e)[0]}, {s})"
+        return s, PRECEDENCE_ATOM
+
+    def _print_logical(self, name: str, args: list) -> tuple[str, int]:
+        args = sorted(self._print(a)[0] for a in args)
+        s = args[-1]
+        for a in reversed(args[:-1]):
+            s = f"{name}({a}, {s})"
+        return s, PRECEDENCE_ATOM
+
+    def _print_And(self, expr: se.Basic) -> tuple[str, int]:
+        return self._print_logical("np.logical_and", expr.args)
+
+    def _print_Or(self, expr: se.Basic) -> tuple[str, int]:
+        return self._print_logical("np.logical_or", expr.args)
+
+    def _print_Not(self, expr: se.Basic) -> tuple[str, int]:
+        return self._print_function_call("np.logical_not", expr.args)
+
+    def _print_Matrix(self, expr: se.Matrix) -> str:
+        rows, cols = expr.shape
+        if rows == 0 or cols == 0:
+            return f"np.zeros(({rows}, {cols}))"
+        return "np.array([" + ", ".join("[" + ", ".join(self._print(expr[r, c])[0] for c in range(cols)) + "]" for r in range(rows)) + "])"
+
+
+def numpy_code(expr: Union[se.Basic, se.Matrix, int, float], printer: NumPyPrinter = None) -> str:
+    """ Prints a symengine expression or Matrix as NumPy code.
+    ----------
+    expr : Union[se.Basic, se.Matrix, int, float]
+        expression which should be printed
+    printer : NumPyPrinter, optional
+        printer which should be used (to share the cache of already printed subexpressions), by default None
+
+    Returns
+    -------
+    str
+        the generated code
+    """
+    if printer is None:
+        printer = NumPyPrinter()
+    return printer.doprint(expr)
@@ -0,0 +1,5 @@
+from .MatlabPrinter import MatlabPrinter, matlab_code
+from .NumPyPrinter import NumPyPrinter, numpy_code
+from .CPrinter import CPrinter, c_code
+
+__all__ = ["MatlabPrinter", "matlab_code", "NumPyPrinter", "numpy_code", "CPrinter", "c_code"]
@@ -1,5 +1,7 @@
 from .Symbol import Symbol
+from .SymbolRegistry import current_registry, global_registry
 import symengine as se
+from ..Instrumentation import instrumented
 from typing import Union, Any
 
 
@@ -20,7 +22,8 @@ class DynamicSymbol(Symbol):
         ValueError
             general Error when the input is not valid
     """
-    _dict_of_derivation_for_substitutions: dict = {}
+    # derivative substitutions of the global registry, new code should use current_registry() (see SymbolRegistry)
+    _dict_of_derivation_for_substitutions: dict = global_registry()._derivatives
     _derivation_variable: se.Symbol = se.Symbol("t", real=True)
     _dict_of_steady_state_substitutions: dict = {}
 
@@ -64,88 +67,29 @@ class DynamicSymbol(Symbol):
         if self._number_of_derivatives == 0:
             return se.Matrix(self._Symbols)
         else:
-            v = []
-            for i in range(self._number_of_derivatives + 1):
-                v.append(se.Matrix(self._Symbols).reshape(
-                    self._number_of_variables, self._number_of_derivatives + 1)[:, i])
-
-            return v
+            # the symbols are stored variable by variable ([x1, x1dot, ..., x2, x2dot, ...])
+            step = self._number_of_derivatives + 1
+            return [se.Matrix(self._Symbols[i::step]) for i in range(step)]
 
     def _gen_numbered_state_variables(self):
-        if self._number_of_variables == 1:
-            
-            s, s_sub = self._generate_Latex_string(self._Notation, 0, 0)
-            self._Symbols.append(se.Function(s)(self._derivation_variable))
-            super()._Symbol_to_printable_dict.update(
-                {self._Symbols[-1]: se.Symbol(self._remove_unwanted_chars_for_Matlab(s))})
-            # self._Symbols.append(se.Function(self._Notation)(self._derivation_variable))
-            # super()._Symbol_to_printable_dict.update({self._Symbols[-1]: se.Symbol(self._remove_unwanted_chars_for_Matlab(self._Notation))})
-
-            for ii in range(1, self._number_of_derivatives + 1):
-                s1: str = self._Notation[0]
-                if len(self._Notation) > 1:
-                    s2: str = self._Notation[1:]
-                else:
-                    s2: str = ""
-
-                if ii == 1:
-                    s: str = "\dot{" + f"{s1}}}{s2}"
-                    s_sub: str = self._Notation + "dot"
-                elif ii == 2:
-                    s: str = "\ddot{" + f"{s1}}}{s2}"
-                    s_sub: str = self._Notation + "ddot"
-                else:
-                    s: str = self._Notation + f"^({ii})"
-                    s_sub: str = self._Notation + ii*"d" + "ot"
-
-                s, s_sub = self._generate_Latex_string(self._Notation, 0, ii)
-
-                self._Symbols.append(se.Function(s)(self._derivation_variable))
-
-                super()._Symbol_to_printable_dict.update(
-                    {self._Symbols[-1]: se.Symbol(self._remove_unwanted_chars_for_Matlab(s_sub))})
-
-        else:
-            for i in range(1, self._number_of_variables + 1):
-                s, s_sub = self._generate_Latex_string(self._Notation, i, 0)
-
-                self._Symbols.append(se.Function(s)(self._derivation_variable))
-                super()._Symbol_to_printable_dict.update(
-                    {self._Symbols[-1]: se.Symbol(self._remove_unwanted_chars_for_Matlab(s))})
-
-                # self._Symbols.append(se.Function(self._Notation + f"_{i}")(self._derivation_variable))
-                # self._Symbol_to_printable_dict.update({self._Symbols[-1]: se.Symbol(self._remove_unwanted_chars_for_Matlab(self._Notation + f"_{i}"))})
-
-                for ii in range(1, self._number_of_derivatives + 1):
-                    s1: str = self._Notation[0]
-                    if len(self._Notation) > 1:
-                        s2: str = self._Notation[1:]
-                    else:
-                        s2: str = ""
-
-                    if ii == 1:
-                        s: str = "\dot{" + f"{s1}}}{s2}_{i}"
-                        s_sub: str = self._Notation + f"{i}" + "dot"
-                    elif ii == 2:
-                        s: str = "\ddot{" + f"{s1}}}{s2}_{i}"
-                        s_sub: str = self._Notation + f"{i}" + "ddot"
-                    else:
-                        s: str = self._Notation + f"^{{({ii})}}" + f"_{i}"
-                        s_sub: str = self._Notation + f"{i}" + ii*"d" + "ot"
-
-                    s, s_sub = self._generate_Latex_string(
-                        self._Notation, i, ii)
-
-                    self._Symbols.append(se.Function(
-                        s)(self._derivation_variable))
-                    super()._Symbol_to_printable_dict.update(
-                        {self._Symbols[-1]: se.Symbol(self._remove_unwanted_chars_for_Matlab(s_sub))})
+        # the name is only parsed once (see _parse_name), the printable names are registered at once
+        numbers = [0] if self._number_of_variables == 1 else range(1, self._number_of_variables + 1)
+        printable = {}
+        for i in numbers:
+            for ii in range(self._number_of_derivatives + 1):
+                s, s_sub = self._generate_Latex_string(self._Notation, i, ii)
+                symbol = se.Function(s)(self._derivation_variable)
+                self._Symbols.append(symbol)
+                printable[symbol] = se.Symbol(self._remove_unwanted_chars_for_Matlab(s if ii == 0 else s_sub))
+        self._register(printable)
 
     def _gen_differentiation_dict(self):
-        for i in range(len(self.vars) - 1):
-            for ii in range(self._number_of_variables):
-                self._dict_of_derivation_for_substitutions.update(
-                    {se.diff(self.vars[i][ii], self._derivation_variable): self.vars[i+1][ii]})
+        vars = self.vars
+        derivatives = {}
+        for lower, higher in zip(vars[:-1], vars[1:]):
+            for symbol, derivative in zip(lower, higher):
+                derivatives[se.diff(symbol, self._derivation_variable)] = derivative
+        current_registry().register_derivatives(derivatives)
 
     # def _gen_steady_state_substitutions(self):
     #     for i in range(len(self.vars)):
@@ -175,23 +119,13 @@ def DynamicSymbols(names: list[str], number_of_variables: int = 1, number_of_der
     Any
         list of DynamicSymbols or Matrix of DynamicSymbols
     """
-    l = []
-    
-    if as_matrix_list:  
-        for s in names:
-            l.append(DynamicSymbol(s, number_of_variables,
-                    number_of_derivatives).var_as_vec())
-    
+    symbols = [DynamicSymbol(s, number_of_variables, number_of_derivatives) for s in names]
+    if as_matrix_list:
+        l = [symbol.var_as_vec() for symbol in symbols]
     else:
-        for s in names:
-            l.append(DynamicSymbol(s, number_of_variables,
-                    number_of_derivatives).var_as_vec())
-
-        m = se.Matrix(l).reshape(len(names)*number_of_variables,
-                                (number_of_derivatives + 1))
-        l = []
-        for i in range(number_of_derivatives + 1):
-            l.append(list(m[:, i]))
+        # one list per derivative with the variables of all names
+        step = number_of_derivatives + 1
+        l = [[v for symbol in symbols for v in symbol._Symbols[i::step]] for i in range(step)]
     if len(l) == 1:
         if type(l[0]) == list:
             return l[0]
@@ -199,6 +133,7 @@ def DynamicSymbols(names: list[str], number_of_variables: int = 1, number_of_der
     return l
 
 
+@instrumented("diff_t")
 def _diff_t(expression):
     """calculates the time derivativ of the expression an substitutes the correct symbols
 
@@ -208,4 +143,4 @@ def _diff_t(expression):
     Returns:
         Any: differentiated expression with correct symbols
     """
-    return se.diff(expression, DynamicSymbol._derivation_variable).subs(DynamicSymbol._dict_of_derivation_for_substitutions)
+    return current_registry().substitute_derivatives(se.diff(expression, DynamicSymbol._derivation_variable))
@@ -0,0 +1,93 @@
+from .DynamicSymbol import DynamicSymbol
+from .SymbolRegistry import current_registry
+import symengine as se
+from typing import Union
+
+
+class IndexedSymbol(DynamicSymbol):
+    """generates an instance of the IndexedSymbol class, a DynamicSymbol whose variables can also be accessed with a
+    symbolic index, e.g. for the cells of a spatially discretized model (see RangeEquations):
+
+        T = IndexedSymbol("T", 1000, 1)
+        [T_vec, T_dot_vec] = T.vars     # the variables as for a DynamicSymbol
+        i = se.Symbol("i")
+        T[i - 1]                        # T(i - 1) in the generated code
+        T.at(i, 1)                      # Tdot(i)
+        T[3]                            # T_{3}(t), the indices start at 1 like the numbers of the names and Matlab
+
+        Parameters
+        ----------
+        Notation : str
+            Name of the Symbol
+        number_of_variables : int
+            Number of variables to create
+        number_of_derivatives : int, optional
+            Number of derivatives to create, by default 0
+
+        Raises
+        ------
+        ValueError
+            general Error when the input is not valid
+    """
+
+    def __init__(self, Notation: str, number_of_variables: int, number_of_derivatives: int = 0) -> None:
+        """generates an instance of the IndexedSymbol class
+
+        Parameters
+        ----------
+        Notation : str
+            Name of the Symbol
+        number_of_variables : int
+            Number of variables to create
+        number_of_derivatives : int, optional
+            Number of derivatives to create, by default 0
+
+        Raises
+        ------
+        ValueError
+            general Error when the input is not valid
+        """
+        super().__init__(Notation, number_of_variables, number_of_derivatives)
+        vars = self.vars if number_of_derivatives > 0 else [self.vars]
+        # one array per derivative, named like the printable names without the number (T, Tdot, ...)
+        self._arrays: list[se.UndefFunction] = []
+        for ii in range(number_of_derivatives + 1):
+            name = self._generate_Latex_string(self._Notation, 0, ii)[1]
+            current_registry().register_array(name, vars[ii])
+            self._arrays.append(se.Function(name))
+
+    def __len__(self) -> int:
+        return self._number_of_variables
+
+    def __getitem__(self, index: Union[int, se.Expr]) -> se.Basic:
+        return self.at(index)
+
+    def at(self, index: Union[int, se.Expr], derivative: int = 0) -> se.Basic:
+        """returns the variable (or its derivative) with the given 1 based index
+
+        Parameters
+        ----------
+        index : Union[int, se.Expr]
+            index of the variable, an integer returns the variable itself, an expression (e.g. i - 1) the indexed
+            array element which is resolved by RangeEquations
+        derivative : int, optional
+            order of the derivative, by default 0
+
+        Returns
+        -------
+        se.Basic
+            the variable or the indexed array element
+        """
+        if derivative < 0 or derivative > self._number_of_derivatives:
+            raise ValueError(f"derivative has to be between 0 and {self._number_of_derivatives} but {derivative} was given")
+        index = se.sympify(index)
+        if index.is_Integer:
+            if not 1 <= int(index) <= self._number_of_variables:
+                raise IndexError(f"index {index} is out of range 1..{self._number_of_variables}")
+            return self._Symbols[(int(index) - 1)*(self._number_of_derivatives + 1) + derivative]
+        return self._arrays[derivative](index)
+
+    def array_name(self, derivative: int = 0) -> str:
+        """name of the array of the variables (or derivatives) in the generated code
+        """
+        return self._arrays[derivative].name
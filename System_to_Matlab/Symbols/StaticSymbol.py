@@ -42,20 +42,15 @@ class StaticSymbol(Symbol):
     
         
     def _gen_numbered_state_variables(self) -> None:
-        if self._number_of_variables == 1:
-            s, s_sub = self._generate_Latex_string(self._Notation, 0, 0)
-            self._Symbols.append(se.Symbol(s))
-            
-            super()._Symbol_to_printable_dict.update({self._Symbols[0]: se.Symbol(s_sub)})
-            #self._Symbols.append(se.Symbol(self._Notation))
-            #super()._Symbol_to_printable_dict.update({self._Symbols[0]: se.Symbol(self._remove_unwanted_chars_for_Matlab(self._Notation))})
-        else:
-            for i in range(1, self._number_of_variables + 1):
-                s, s_sub = self._generate_Latex_string(self._Notation, i, 0)
-                self._Symbols.append(se.Symbol(s))
-                
-                #self._Symbols.append(se.Symbol(self._Notation + f"_{i}"))
-                super()._Symbol_to_printable_dict.update({self._Symbols[i-1]: se.Symbol(s_sub)})
+        # the name is only parsed once (see _parse_name), the printable names are registered at once
+        numbers = [0] if self._number_of_variables == 1 else range(1, self._number_of_variables + 1)
+        printable = {}
+        for i in numbers:
+            s, s_sub = self._generate_Latex_string(self._Notation, i, 0)
+            symbol = se.Symbol(s)
+            self._Symbols.append(symbol)
+            printable[symbol] = se.Symbol(s_sub)
+        self._register(printable)
         
     def _repr_latex_(self) -> str:
         return self.vars._repr_latex_()
@@ -1,10 +1,19 @@
 from abc import ABC, abstractmethod
 import symengine as se
 import re
+from functools import lru_cache
 from typing import Union
+from .SymbolRegistry import current_registry, global_registry
+
+_LATEX_COMMAND = re.compile("^\\\\[a-zA-Z]+")
+_SUPERSCRIPT = re.compile("\\^[a-zA-Z1-9{}]+")
+_SUBSCRIPT = re.compile("_[a-zA-Z1-9{}]+")
+_SCRIPT_CHARS = re.compile('[{}^_]')
+_MATLAB_UNWANTED_CHARS = str.maketrans("", "", "_{}\\^")
 
 class Symbol(ABC):
-    _Symbol_to_printable_dict: dict = {}
+    # printable names of the global registry, new code should use current_registry() (see SymbolRegistry)
+    _Symbol_to_printable_dict: dict = global_registry()._printable
     
     
     def __init__(self, Notation) -> None:
@@ -28,36 +37,15 @@ class Symbol(ABC):
     def _repr_latex_(self) -> str:
         pass
     
+    def _register(self, printable: dict) -> None:
+        """registers the printable names of the generated symbols in the current registry (all at once)"""
+        current_registry().register_many(printable)
+
     def _remove_unwanted_chars_for_Matlab(self, input:str) -> str:
-        return input.replace("_", "").replace("{", "").replace("}", "").replace("\\", "").replace("^", "")
+        return input.translate(_MATLAB_UNWANTED_CHARS)
     
     def _generate_Latex_string(self, Name:str, number:int, derivativ:int) -> tuple[str,str]:
-        s = ""
-        
-        if Name[0] == "\\":
-            re_startChracter = re.search("^\\\\[a-zA-Z]+", Name)
-            if re_startChracter is not None:
-                s_startChracter: str = re_startChracter.group(0)
-            else:
-                raise Exception("The given string is not a valid latex string")
-            s_rest = Name.replace(s_startChracter, '')
-        else:
-            s_startChracter:str = Name[0]
-            s_rest = Name[1:]
-        
-        s_hochgestellt = re.search("\^[a-zA-Z1-9{}]+", Name)
-        if s_hochgestellt != None:
-            s_rest = s_rest.replace(s_hochgestellt.group(0), '')
-            s_hochgestellt = re.sub('[{}^_]', '', s_hochgestellt.group(0))
-        else:
-            s_hochgestellt = ""
-            
-        s_tiefgestellt = re.search("_[a-zA-Z1-9{}]+", Name)
-        if s_tiefgestellt != None:
-            s_rest = s_rest.replace(s_tiefgestellt.group(0), '')
-            s_tiefgestellt = re.sub('[{}^_]', '', s_tiefgestellt.group(0))
-        else:
-            s_tiefgestellt = ""
+        s_startChracter, s_rest, s_hochgestellt, s_tiefgestellt = _parse_name(Name)
         
         if derivativ == 0:
             s = s_startChracter  + s_rest
@@ -108,6 +96,37 @@ class Symbol(ABC):
         return s, self._remove_unwanted_chars_for_Matlab(s_sub)
     
 
+@lru_cache(maxsize=None)
+def _parse_name(Name: str) -> tuple[str, str, str, str]:
+    """splits a (latex) name into the start character, the rest, the superscript and the subscript,
+    cached because it is the same for all numbers and derivatives of a symbol"""
+    if Name[0] == "\\":
+        re_startChracter = _LATEX_COMMAND.search(Name)
+        if re_startChracter is not None:
+            s_startChracter: str = re_startChracter.group(0)
+        else:
+            raise Exception("The given string is not a valid latex string")
+        s_rest = Name.replace(s_startChracter, '')
+    else:
+        s_startChracter:str = Name[0]
+        s_rest = Name[1:]
+    
+    s_hochgestellt = _SUPERSCRIPT.search(Name)
+    if s_hochgestellt != None:
+        s_rest = s_rest.replace(s_hochgestellt.group(0), '')
+        s_hochgestellt = _SCRIPT_CHARS.sub('', s_hochgestellt.group(0))
+    else:
+        s_hochgestellt = ""
+        
+    s_tiefgestellt = _SUBSCRIPT.search(Name)
+    if s_tiefgestellt != None:
+        s_rest = s_rest.replace(s_tiefgestellt.group(0), '')
+        s_tiefgestellt = _SCRIPT_CHARS.sub('', s_tiefgestellt.group(0))
+    else:
+        s_tiefgestellt = ""
+    return s_startChracter, s_rest, s_hochgestellt, s_tiefgestellt
+
+
 # def _generate_Latex_string(self, Name: str, number: int, derivativ: int) -> tuple[str, str]:
 #     start_character, rest = self._parse_name(Name)
 #     hochgestellt = self._parse_subscript_or_superscript(Name, "^")
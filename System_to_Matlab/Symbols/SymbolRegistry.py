@@ -0,0 +1,213 @@
+from __future__ import annotations
+import symengine as se
+
+from typing import Iterable, Union
+
+
+class SymbolRegistry:
+    """ Registry of the printable names of the symbols (e.g. \\dot{q}_{1}(t) -> q1dot) and of the substitutions of the
+    time derivatives (d/dt q_{1}(t) -> \\dot{q}_{1}(t)).
+
+    New symbols are registered in the current registry (see current_registry). A registry can be used as scope:
+
+        with SymbolRegistry.scope():
+            q = DynamicSymbol("q", 3, 2).vars
+            ...
+            system.write_SFunction("model")
+
+    symbols created inside the scope are released at its end, the symbols of the enclosing registries stay visible inside.
+    The substitutions only look up the atoms of the given expressions, so their cost doesn't grow with the number of
+    registered symbols.
+    """
+
+    def __init__(self, parent: SymbolRegistry = None) -> None:
+        """ Creates an empty registry
+
+        Parameters
+        ----------
+        parent : SymbolRegistry, optional
+            registry whose symbols are visible in this one (lookups fall back to it), by default None
+        """
+        self._parent: SymbolRegistry = parent
+        self._printable: dict[se.Basic, se.Symbol] = {}
+        self._derivatives: dict[se.Basic, se.Basic] = {}
+        self._arrays: dict[str, se.Matrix] = {}
+        self._array_elements: dict[se.Basic, tuple[str, int]] = {}
+
+    @property
+    def parent(self) -> SymbolRegistry:
+        return self._parent
+
+    @staticmethod
+    def scope() -> SymbolRegistry:
+        """ a new registry on top of the current one, to be used with "with"
+        """
+        return SymbolRegistry(current_registry())
+
+    def __enter__(self) -> SymbolRegistry:
+        _registries.append(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if _registries[-1] is not self:
+            raise RuntimeError("registry scopes have to be closed in the reverse order in which they were opened")
+        _registries.pop()
+        self.release()
+
+    def register(self, symbol: se.Basic, printable: se.Symbol) -> None:
+        """ registers the printable name of a symbol (used in the generated code)
+        """
+        self._printable[symbol] = printable
+
+    def register_derivative(self, derivative: se.Basic, symbol: se.Basic) -> None:
+        """ registers the symbol which replaces a time derivative, e.g. d/dt q(t) -> \\dot{q}(t)
+        """
+        self._derivatives[derivative] = symbol
+
+    def register_many(self, printable: dict[se.Basic, se.Symbol]) -> None:
+        """ registers the printable names of several symbols at once
+        """
+        self._printable.update(printable)
+
+    def register_derivatives(self, derivatives: dict[se.Basic, se.Basic]) -> None:
+        """ registers the substitutions of several time derivatives at once
+        """
+        self._derivatives.update(derivatives)
+
+    def register_array(self, name: str, elements: se.Matrix) -> None:
+        """ registers the elements of an indexed symbol (see IndexedSymbol), name(k) stands for elements[k - 1]
+        """
+        self._arrays[name] = elements
+        self._array_elements.update((element, (name, k + 1)) for k, element in enumerate(elements))
+
+    def release(self, symbols: Iterable[se.Basic] = None) -> None:
+        """ removes the given symbols (their printable names and the derivatives of and to them) from this registry,
+        without symbols everything registered in this registry is removed (the parents are not changed)
+        """
+        if symbols is None:
+            self._printable.clear()
+            self._derivatives.clear()
+            self._arrays.clear()
+            self._array_elements.clear()
+            return
+        symbols = set(symbols)
+        for symbol in symbols:
+            self._printable.pop(symbol, None)
+            self._array_elements.pop(symbol, None)
+        # changed in place, the dictionaries of the global registry are also referenced by the Symbol classes
+        for d in [d for d, s in self._derivatives.items() if s in symbols or d.atoms(se.AppliedUndef) & symbols]:
+            del self._derivatives[d]
+
+    def printable(self, symbol: se.Basic) -> se.Symbol | None:
+        """ printable name of the symbol or None if it isn't registered
+        """
+        registry = self
+        while registry is not None:
+            if symbol in registry._printable:
+                return registry._printable[symbol]
+            registry = registry._parent
+        return None
+
+    def derivative(self, derivative: se.Basic) -> se.Basic | None:
+        """ symbol which replaces the time derivative or None if it isn't registered
+        """
+        registry = self
+        while registry is not None:
+            if derivative in registry._derivatives:
+                return registry._derivatives[derivative]
+            registry = registry._parent
+        return None
+
+    def array(self, name: str) -> se.Matrix | None:
+        """ elements of the indexed symbol with the given (printable) name or None if it isn't registered
+        """
+        registry = self
+        while registry is not None:
+            if name in registry._arrays:
+                return registry._arrays[name]
+            registry = registry._parent
+        return None
+
+    def array_element(self, symbol: se.Basic) -> tuple[str, int] | None:
+        """ (name, 1 based position) of the symbol in its indexed symbol or None if it isn't an element of one
+        """
+        registry = self
+        while registry is not None:
+            if symbol in registry._array_elements:
+                return registry._array_elements[symbol]
+            registry = registry._parent
+        return None
+
+    def printable_subs(self, *exprs: Union[se.Basic, se.Matrix]) -> dict[se.Basic, se.Symbol]:
+        """ the printable names of all registered symbols which appear in the expressions
+        """
+        subs = {}
+        for atom in _atoms(exprs, (se.Symbol, se.AppliedUndef)):
+            printable = self.printable(atom)
+            if printable is not None:
+                subs[atom] = printable
+        return subs
+
+    def derivative_subs(self, *exprs: Union[se.Basic, se.Matrix]) -> dict[se.Basic, se.Basic]:
+        """ the substitutions of all registered time derivatives which appear in the expressions
+        """
+        subs = {}
+        for atom in _atoms(exprs, (se.Derivative,)):
+            symbol = self.derivative(atom)
+            if symbol is not None:
+                subs[atom] = symbol
+        return subs
+
+    def to_printable(self, expr: Union[se.Basic, se.Matrix]) -> Union[se.Basic, se.Matrix]:
+        """ replaces the registered symbols of the expression by their printable names
+        """
+        from ..Calculation.Substitution import batched_subs
+        return batched_subs(expr, self.printable_subs(expr))
+
+    def substitute_derivatives(self, expr: Union[se.Basic, se.Matrix]) -> Union[se.Basic, se.Matrix]:
+        """ replaces the registered time derivatives of the expression, e.g. d/dt q(t) -> \\dot{q}(t)
+        """
+        subs = self.derivative_subs(expr)
+        return expr.subs(subs) if subs else expr
+
+    def printable_dict(self) -> dict[se.Basic, se.Symbol]:
+        """ all printable names visible in this registry (including the parents)
+        """
+        return {**(self._parent.printable_dict() if self._parent is not None else {}), **self._printable}
+
+    def derivative_dict(self) -> dict[se.Basic, se.Basic]:
+        """ all derivative substitutions visible in this registry (including the parents)
+        """
+        return {**(self._parent.derivative_dict() if self._parent is not None else {}), **self._derivatives}
+
+    def __contains__(self, symbol: se.Basic) -> bool:
+        return self.printable(symbol) is not None
+
+    def __len__(self) -> int:
+        """ number of symbols registered in this registry (without the parents)
+        """
+        return len(self._printable)
+
+
+def _atoms(exprs: Iterable, types: tuple) -> set[se.Basic]:
+    atoms = set()
+    for expr in exprs:
+        if isinstance(expr, (list, tuple)):
+            atoms |= _atoms(expr, types)
+        elif isinstance(expr, (se.Basic, se.MatrixBase)):
+            atoms |= expr.atoms(*types)
+    return atoms
+
+
+# stack of the active registries, the first one is the global registry which is never released
+_registries: list[SymbolRegistry] = [SymbolRegistry()]
+
+
+def current_registry() -> SymbolRegistry:
+    """ the registry in which new symbols are registered and in which the file generators look up the printable names
+    """
+    return _registries[-1]
+
+
+def global_registry() -> SymbolRegistry:
+    return _registries[0]
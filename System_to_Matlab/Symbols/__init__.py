@@ -2,6 +2,8 @@
 from .DynamicSymbol import DynamicSymbol, DynamicSymbols
 from .StaticSymbol import StaticSymbol , StaticSymbols
 from .DynamicSymbol import _diff_t as diff_t
+from .SymbolRegistry import SymbolRegistry, current_registry
+from .IndexedSymbol import IndexedSymbol
 
 
-__all__ = ['DynamicSymbol', 'DynamicSymbols', 'StaticSymbols',  'StaticSymbol', 'diff_t']
\ No newline at end of file
+__all__ = ['DynamicSymbol', 'DynamicSymbols', 'StaticSymbols',  'StaticSymbol', 'diff_t', 'SymbolRegistry', 'current_registry', 'IndexedSymbol']
\ No newline at end of file
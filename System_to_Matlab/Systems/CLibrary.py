@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import ctypes
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+
+class CLibrary:
+    def __init__(self, sources: list[str], name: str = "functions", path: str = None, compiler: str = None,
+                 flags: list[str] = None) -> None:
+        """ Compiles C files (e.g. generated by CFunction) to a shared library and loads it with ctypes.
+
+        Parameters
+        ----------
+        sources : list[str]
+            the C files
+        name : str, optional
+            name of the shared library, by default "functions"
+        path : str, optional
+            directory of the shared library, if None a temporary directory is used, by default None
+        compiler : str, optional
+            the C compiler, if None cc or gcc is used, by default None
+        flags : list[str], optional
+            compiler flags, by default ["-O2"]
+        """
+        compiler = compiler or shutil.which("cc") or shutil.which("gcc")
+        if compiler is None:
+            raise RuntimeError("no C compiler was found (cc or gcc)")
+        if path is None:
+            path = tempfile.mkdtemp(prefix="System_to_Matlab_")
+        flags = ["-O2"] if flags is None else list(flags)
+        self._filename: str = os.path.join(path, f"lib{name}.so")
+        includes = sorted({"-I" + (os.path.dirname(os.path.abspath(s)) or ".") for s in sources})
+        command = [compiler, "-std=c99", "-shared", "-fPIC", *flags, *includes, *sources, "-lm", "-o", self._filename]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError("compiling failed:\n" + result.stderr)
+        self._library = ctypes.CDLL(self._filename)
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    def function(self, name: str, input_sizes: list[int], output_sizes: list[int], single_precision: bool = False,
+                 defaults: list = None) -> CCallable:
+        """ Returns a callable for the function name(const double *in_1, ..., double *out_1, ...) of the library
+
+        Parameters
+        ----------
+        name : str
+            name of the function (uses name_batch for more than one point if it exists)
+        input_sizes : list[int]
+            number of elements of every input
+        output_sizes : list[int]
+            number of elements of every output
+        single_precision : bool, optional
+            True if the function uses float instead of double, by default False
+        defaults : list, optional
+            default values for every input (None if the input has to be given), by default None
+        """
+        return CCallable(self._library, name, input_sizes, output_sizes, single_precision, defaults)
+
+
+class CCallable:
+    def __init__(self, library: ctypes.CDLL, name: str, input_sizes: list[int], output_sizes: list[int],
+                 single_precision: bool = False, defaults: list = None) -> None:
+        """ Calls a compiled C function with numpy arrays, see CLibrary.function
+        """
+        self._dtype = np.float32 if single_precision else np.float64
+        pointer = np.ctypeslib.ndpointer(self._dtype, flags="C_CONTIGUOUS")
+        self._function = getattr(library, name)
+        self._function.restype = None
+        self._function.argtypes = [pointer] * (len(input_sizes) + len(output_sizes))
+        self._batch = getattr(library, name + "_batch", None)
+        if self._batch is not None:
+            self._batch.restype = None
+            self._batch.argtypes = [ctypes.c_long] + [pointer, ctypes.c_long] * len(input_sizes) + [pointer] * len(output_sizes)
+        self._input_sizes: list[int] = list(input_sizes)
+        self._output_sizes: list[int] = list(output_sizes)
+        self._defaults: list = defaults if defaults is not None else [None] * len(input_sizes)
+
+    def __call__(self, *args) -> np.ndarray | tuple[np.ndarray, ...]:
+        """ Evaluates the function. Every input can have one leading batch dimension, e.g. x with the shape (N, n),
+        inputs without it are used for all points. Inputs with default values can be omitted.
+        Returns one array per output with the shape (n_out,) or (N, n_out).
+        """
+        if len(args) > len(self._input_sizes):
+            raise TypeError(f"expected at most {len(self._input_sizes)} arguments but {len(args)} were given")
+        inputs = []
+        for i, size in enumerate(self._input_sizes):
+            value = args[i] if i < len(args) and args[i] is not None else self._defaults[i]
+            if value is None:
+                raise TypeError(f"argument {i} has no default value and has to be given")
+            value = np.ascontiguousarray(value, dtype=self._dtype)
+            if value.shape[-1:] != (size,) or value.ndim > 2:
+                raise ValueError(f"argument {i} has to have the shape ({size},) or (N, {size}) but {value.shape} was given")
+            inputs.append(value)
+
+        batch = {v.shape[0] for v in inputs if v.ndim == 2}
+        if len(batch) > 1:
+            raise ValueError(f"all batched arguments have to have the same number of points but {sorted(batch)} were given")
+        if not batch:
+            outputs = [np.empty(size, dtype=self._dtype) for size in self._output_sizes]
+            self._function(*inputs, *outputs)
+        else:
+            n = batch.pop()
+            outputs = [np.empty((n, size), dtype=self._dtype) for size in self._output_sizes]
+            if self._batch is not None:
+                arguments = []
+                for value, size in zip(inputs, self._input_sizes):
+                    arguments += [value, size if value.ndim == 2 else 0]
+                self._batch(n, *arguments, *outputs)
+            else:
+                for k in range(n):
+                    point = [v[k] if v.ndim == 2 else v for v in inputs]
+                    self._function(*point, *[o[k] for o in outputs])
+        return outputs[0] if len(outputs) == 1 else tuple(outputs)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+from ..Calculation.Substitution import batched_subs
+
+import numpy as np
+import symengine as se
+
+from typing import Callable
+
+
+class Evaluator:
+    def __init__(self, args: list[list], exprs: se.Matrix, defaults: list = None, backend: str = None) -> None:
+        """ Numerical evaluation of a symbolic vector or matrix, compiled with se.Lambdify (with cse).
+        Functions of time (e.g. q(t)) are replaced by symbols before compiling.
+
+        Parameters
+        ----------
+        args : list[list]
+            groups of arguments (e.g. [x, u, params]), every group is one argument of the call
+        exprs : se.Matrix
+            the expressions, column vectors are evaluated to arrays with the shape (..., n), matrices to (..., rows, cols)
+        defaults : list, optional
+            default values for every group (None if the group has to be given), by default None
+        backend : str, optional
+            backend of se.Lambdify ("llvm" or "lambda"), if None llvm is used if it is available, by default None
+        """
+        self._sizes: list[int] = [len(group) for group in args]
+        self._defaults: list = defaults if defaults is not None else [None] * len(args)
+        if len(self._defaults) != len(args):
+            raise ValueError(f"defaults has to have one entry per argument group but {len(self._defaults)} were given")
+
+        flat = [a for group in args for a in group]
+        symbols = [se.Symbol(f"_arg{i}") for i in range(len(flat))]
+        exprs = batched_subs(se.Matrix(exprs), dict(zip(flat, symbols)))
+        self._shape: tuple[int, int] = exprs.shape
+        if exprs.shape[1] == 1:
+            exprs = list(exprs)
+        self._function = se.Lambdify(symbols, exprs, cse=True, backend=backend)
+
+    @property
+    def n_args(self) -> int:
+        """ number of scalar arguments (length of the last dimension of the buffer for evaluate)
+        """
+        return sum(self._sizes)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self._shape
+
+    def evaluate(self, inp: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """ Evaluates the expressions for a buffer with all arguments concatenated, shape (..., n_args).
+        A C-contiguous float64 buffer is used without copying, the result is written into out if it is given.
+        """
+        return self._function(inp, out=out)
+
+    def __call__(self, *args, out: np.ndarray = None) -> np.ndarray:
+        """ Evaluates the expressions, every argument group can have additional leading batch dimensions, e.g. x with the
+        shape (N, n). Groups with default values can be omitted.
+        """
+        if len(args) > len(self._sizes):
+            raise TypeError(f"expected at most {len(self._sizes)} arguments but {len(args)} were given")
+        values = []
+        for i, size in enumerate(self._sizes):
+            value = args[i] if i < len(args) and args[i] is not None else self._defaults[i]
+            if value is None:
+                raise TypeError(f"argument {i} has no default value and has to be given")
+            value = np.asarray(value, dtype=np.float64)
+            if value.shape[-1:] != (size,):
+                raise ValueError(f"argument {i} has to have the shape (..., {size}) but {value.shape} was given")
+            values.append(value)
+        if len(values) == 1:
+            return self.evaluate(np.ascontiguousarray(values[0]), out)
+
+        batch = np.broadcast_shapes(*(v.shape[:-1] for v in values))
+        inp = np.empty(batch + (self.n_args,))
+        start = 0
+        for value, size in zip(values, self._sizes):
+            inp[..., start:start + size] = value
+            start += size
+        return self.evaluate(inp, out)
+
+
+class CompiledSystem:
+    def __init__(self, args: list[list], defaults: list, expressions: dict[str, Callable[[], se.Matrix]], backend: str = None) -> None:
+        """ Collection of compiled evaluators of a system. The evaluators are compiled when they are used the first time.
+
+        Parameters
+        ----------
+        args : list[list]
+            groups of arguments of all evaluators
+        defaults : list
+            default values for every group (None if the group has to be given)
+        expressions : dict[str, Callable[[], se.Matrix]]
+            functions which return the symbolic expressions of every evaluator
+        backend : str, optional
+            backend of se.Lambdify, by default None
+        """
+        self._args = args
+        self._defaults = defaults
+        self._expressions = expressions
+        self._backend = backend
+        self._evaluators: dict[str, Evaluator] = {}
+
+    def _get(self, name: str) -> Evaluator:
+        if name not in self._evaluators:
+            self._evaluators[name] = Evaluator(self._args, self._expressions[name](), self._defaults, self._backend)
+        return self._evaluators[name]
+
+
+class CompiledDynamicSystem(CompiledSystem):
+    """ Compiled evaluators of a DynamicSystem, all are called with (x, u, params) where params defaults to the parameter values
+    """
+
+    @property
+    def f(self) -> Evaluator:
+        """ state equations x_dot = f(x, u, params)
+        """
+        return self._get("f")
+
+    @property
+    def y(self) -> Evaluator:
+        """ outputs y(x, u, params)
+        """
+        return self._get("y")
+
+    @property
+    def dfdx(self) -> Evaluator:
+        return self._get("dfdx")
+
+    @property
+    def dfdu(self) -> Evaluator:
+        return self._get("dfdu")
+
+    @property
+    def dydx(self) -> Evaluator:
+        return self._get("dydx")
+
+    @property
+    def dydu(self) -> Evaluator:
+        return self._get("dydu")
+
+    @property
+    def abcd(self) -> Evaluator:
+        """ all jacobians in one block matrix [[dfdx, dfdu], [dydx, dydu]] (with one shared cse)
+        """
+        return self._get("abcd")
+
+
+class CompiledStaticSystem(CompiledSystem):
+    """ Compiled evaluators of a StaticSystem, called with one argument per input
+    """
+
+    @property
+    def y(self) -> Evaluator:
+        """ outputs y(inputs)
+        """
+        return self._get("y")
+
+    @property
+    def dydu(self) -> Evaluator:
+        """ jacobian of the outputs with respect to all (concatenated) inputs
+        """
+        return self._get("dydu")
@@ -1,9 +1,15 @@
 #from .System import System
 from ..Symbols import DynamicSymbol, StaticSymbol
-from ..Symbols.Symbol import Symbol
-from ..FileGenerators import MFile, MFunction, SFunction
+from ..Symbols.SymbolRegistry import current_registry
+from ..FileGenerators import MFile, MFunction, SFunction, CSFunction, Level2SFunction, PyFunction, CFunction
 from ..Calculation.Calculation import Calculation
+from ..Calculation.RangeEquations import RangeEquations
+from ..Calculation.Substitution import batched_subs, combine_subs
+from ..Calculation.Sparsity import SparsityPattern, sparse_jacobian
+from ..Printers import MatlabPrinter
+from ..Instrumentation import instrumented
 
+import os
 import symengine as se
 import sympy as sp
 
@@ -39,6 +45,7 @@ class DynamicSystem():
         self._x = se.sympify(x)
         self._u = se.sympify(u)
         self._State_Equations: Calculation = Calculation()
+        self._Range_Equations: RangeEquations = None
         # self._Calcs: Calculation = Calculation()
         self._Outputs: list[se.Symbols | se.Function] = []
         self._Outputs_Calcs: Calculation = Calculation()
@@ -48,6 +55,8 @@ class DynamicSystem():
         # self._Input_Calcs.addCalculation(self._u, se.Symbol('u'),is_matrix_input=True)
         
         self._Parameters: list[tuple[se.Symbol | se.Function, float]] = []
+        self._compiled = None
+        self._jacobians: dict[str, se.Matrix] = {}
     
     @property
     def A(self) -> se.Matrix:
@@ -100,6 +109,7 @@ class DynamicSystem():
         return self._u
     
     @property
+    @instrumented("DynamicSystem.x_dot")
     def x_dot(self) -> se.Matrix:
         """vector of the derivatives of the state variables
 
@@ -108,7 +118,7 @@ class DynamicSystem():
         se.Matrix
             vector of the derivatives of the state variables
         """
-        return se.Matrix([se.diff(x, DynamicSymbol._derivation_variable).subs(DynamicSymbol._dict_of_derivation_for_substitutions) for x in self.x])
+        return se.Matrix([current_registry().substitute_derivatives(se.diff(x, DynamicSymbol._derivation_variable)) for x in self.x])
     
     @property
     def y(self) -> se.Matrix:
@@ -122,7 +132,8 @@ class DynamicSystem():
         _ , vec = self._Outputs_Calcs._generate_shape_index_list()
         return vec
     
-    def linearize(self, steady_state_state_vec: se.Matrix = None, steady_state_input_vec: se.Matrix = None) -> list[se.Matrix]:
+    @instrumented()
+    def linearize(self, steady_state_state_vec: se.Matrix = None, steady_state_input_vec: se.Matrix = None, specialize: bool = False) -> list[se.Matrix]:
         """ linearizes the system around a given steady state
 
         Parameters
@@ -133,6 +144,8 @@ class DynamicSystem():
         steady_state_input_vec : se.Matrix, optional
             vector of input variables which should be used in the strady state , by default None
             Can be omitted if the steady state is 0
+        specialize : bool, optional
+            If true, the parameter values are substituted, so the matrices only contain numbers (and the steady state), by default False
 
         Returns
         -------
@@ -159,35 +172,259 @@ class DynamicSystem():
             raise ValueError(
                 "Size of steady_state hast to be equal to the size of the state vector x")
 
-        self._A: se.Matrix = self._State_Equations._generate_shape_index_list()[1].jacobian(self.x)
-        self._B: se.Matrix = self._State_Equations._generate_shape_index_list()[1].jacobian(self.u)
-        self._C: se.Matrix = self._Outputs_Calcs._generate_shape_index_list()[1].jacobian(self.x)
-        self._D: se.Matrix = self._Outputs_Calcs._generate_shape_index_list()[1].jacobian(self.u)
+        steady_state = combine_subs(self.x, steady_state_state_vec)
+        steady_state = combine_subs(self.u, steady_state_input_vec, steady_state)
+        if specialize:
+            steady_state.update(self._parameter_values())
 
-        for i in range(len(self.x)):
-            self._A = self._A.subs(self.x[i], steady_state_state_vec[i])
-            self._B = self._B.subs(self.x[i], steady_state_state_vec[i])
-            self._C = self._C.subs(self.x[i], steady_state_state_vec[i])
-            self._D = self._D.subs(self.x[i], steady_state_state_vec[i])
-        
-        for i in range(len(self.u)):
-            self._A = self._A.subs(self.u[i], steady_state_input_vec[i])
-            self._B = self._B.subs(self.u[i], steady_state_input_vec[i])
-            self._C = self._C.subs(self.u[i], steady_state_input_vec[i])
-            self._D = self._D.subs(self.u[i], steady_state_input_vec[i])
+        self._A: se.Matrix = batched_subs(self._jacobian("A"), steady_state)
+        self._B: se.Matrix = batched_subs(self._jacobian("B"), steady_state)
+        self._C: se.Matrix = batched_subs(self._jacobian("C"), steady_state)
+        self._D: se.Matrix = batched_subs(self._jacobian("D"), steady_state)
 
         self._is_linearized = True
 
         
         return [self._A, self._B, self._C, self._D]
 
-    def addStateEquations(self, equations: se.Matrix , add_as_Output = True) -> None:
+    def sparsity_patterns(self) -> dict[str, SparsityPattern]:
+        """ structural sparsity patterns of the jacobians of the state equations and outputs, calculated from the atoms of
+        every equation (without differentiating)
+
+        Returns
+        -------
+        dict[str, SparsityPattern]
+            patterns of "A" (df/dx), "B" (df/du), "C" (dh/dx) and "D" (dh/du)
+        """
+        f = self._State_Equations._generate_shape_index_list()[1]
+        h = self._Outputs_Calcs._generate_shape_index_list()[1]
+        f = list(f) if f is not None else []
+        h = list(h) if h is not None else []
+        return {
+            "A": SparsityPattern.from_expressions(f, self.x),
+            "B": SparsityPattern.from_expressions(f, self.u),
+            "C": SparsityPattern.from_expressions(h, self.x),
+            "D": SparsityPattern.from_expressions(h, self.u),
+        }
+
+    @instrumented()
+    def _jacobian(self, name: str) -> se.Matrix:
+        """ PRIVATE symbolic jacobian "A" (df/dx), "B" (df/du), "C" (dh/dx) or "D" (dh/du), only the structural nonzeros
+        are differentiated. The result is cached until equations or outputs are changed.
+        """
+        if name not in self._jacobians:
+            pattern = self.sparsity_patterns()[name]
+            if name in ("A", "B"):
+                exprs = self._State_Equations._generate_shape_index_list()[1]
+            else:
+                exprs = self._Outputs_Calcs._generate_shape_index_list()[1]
+            exprs = list(exprs) if exprs is not None else []
+            self._jacobians[name] = sparse_jacobian(exprs, self.x if name in ("A", "C") else self.u, pattern)
+        return self._jacobians[name]
+
+    def _parameter_values(self) -> dict:
+        """ PRIVATE substitutions of all parameters by their values
+        """
+        return {p[0]: se.sympify(p[1]) for p in self._Parameters}
+
+    def _specialized(self, calc: Calculation) -> Calculation:
+        """ PRIVATE copy of the calculation with the parameter values substituted, the numbers are folded by symengine
+        """
+        calc = Calculation.append_Calculations([calc])
+        calc.subs(self._parameter_values())
+        return calc
+
+    @instrumented()
+    def linearize_batch(self, steady_state_state_vec, steady_state_input_vec, params=None, file: str = None) -> list:
+        """ linearizes the system numerically at many operating points. The jacobians are calculated symbolically once,
+        compiled (see compile) and evaluated for all operating points at once. Needs numpy.
+
+        Parameters
+        ----------
+        steady_state_state_vec : array_like
+            states of the operating points, shape (N, n)
+        steady_state_input_vec : array_like
+            inputs of the operating points, shape (N, m)
+        params : array_like, optional
+            parameters, shape (N, number of parameters) or (number of parameters,), if None the parameter values are used, by default None
+        file : str, optional
+            if given the operating points and the matrices are written to this file, as .mat file (needs scipy) if the name
+            ends with .mat otherwise as .npz file, by default None
+
+        Returns
+        -------
+        list[np.ndarray]
+            returns the linearized Matrizes [A,B,C,D] with the shapes (N, n, n), (N, n, m), (N, p, n), (N, p, m)
+        """
+        import numpy as np
+
+        n, m = len(self.x), len(self.u)
+        abcd = self.compile().abcd(steady_state_state_vec, steady_state_input_vec, params)
+        A, B = abcd[..., :n, :n], abcd[..., :n, n:]
+        C, D = abcd[..., n:, :n], abcd[..., n:, n:]
+
+        if file is not None:
+            table = {
+                "x_ss": np.asarray(steady_state_state_vec, dtype=float),
+                "u_ss": np.asarray(steady_state_input_vec, dtype=float),
+                "params": np.asarray(params if params is not None else [float(p[1]) for p in self._Parameters], dtype=float),
+                "A": A, "B": B, "C": C, "D": D,
+            }
+            if file.endswith(".mat"):
+                from scipy.io import savemat
+                savemat(file, table)
+            else:
+                np.savez(file, **table)
+
+        return [A, B, C, D]
+
+    @instrumented()
+    def compile(self, backend: str = None):
+        """ compiles the state equations, the outputs and their jacobians (with cse) for fast numerical evaluation.
+        The result is cached until equations, outputs or parameters are changed. Needs numpy.
+
+        Parameters
+        ----------
+        backend : str, optional
+            backend of se.Lambdify ("llvm" or "lambda"), if None llvm is used if it is available, by default None
+
+        Returns
+        -------
+        CompiledDynamicSystem
+            evaluators f, y, dfdx, dfdu, dydx, dydu (and abcd with all jacobians in one block matrix) which are called with (x, u, params), params defaults to the parameter values.
+            x, u and params can have leading batch dimensions, e.g. x with the shape (N, n).
+        """
+        from .CompiledSystem import CompiledDynamicSystem
+
+        if len(self._State_Equations.calcs) == 0:
+            raise ValueError("State equations have to be set before compiling")
+        if self._compiled is not None and self._compiled._backend == backend:
+            return self._compiled
+
+        f = lambda: self._State_Equations._generate_shape_index_list()[1]
+        h = lambda: self.y if len(self._Outputs_Calcs) != 0 else se.zeros(0, 1)
+        params = [p[0] for p in self._Parameters]
+        self._compiled = CompiledDynamicSystem(
+            [list(self.x), list(self.u), params],
+            [None, None, [float(p[1]) for p in self._Parameters]],
+            {
+                "f": f,
+                "y": h,
+                "dfdx": lambda: self._jacobian("A"),
+                "dfdu": lambda: self._jacobian("B"),
+                "dydx": lambda: self._jacobian("C") if len(self._Outputs_Calcs) != 0 else se.zeros(0, len(self.x)),
+                "dydu": lambda: self._jacobian("D") if len(self._Outputs_Calcs) != 0 else se.zeros(0, len(self.u)),
+                "abcd": lambda: f().col_join(h()).jacobian(self.x.col_join(self.u)),
+            },
+            backend)
+        return self._compiled
+
+    @instrumented()
+    def simulate(self, t_span: tuple, x0, u = None, params = None, method: str = "rk45", dt: float = None, rtol: float = 1e-6,
+                 atol: float = 1e-9, t_eval = None, n_workers: int = None, max_steps: int = 100000, backend: str = None):
+        """ simulates the system with the compiled state equations (see compile). Needs numpy.
+        Several initial conditions, parameter sets or inputs (ensemble) are integrated at once as (N, ...) arrays,
+        all members use the same time steps.
+
+        Parameters
+        ----------
+        t_span : tuple
+            start and end time (t0, t1)
+        x0 : array_like
+            initial states with the shape (n,) or (N, n)
+        u : array_like | Callable, optional
+            inputs, constant with the shape (m,) or (N, m) or a function u(t) which returns them, if None the inputs are 0, by default None
+        params : array_like, optional
+            parameters with the shape (p,) or (N, p), if None the parameter values are used, by default None
+        method : str, optional
+            "rk4" (fixed steps of the size dt), "rk45" (Dormand-Prince 5(4) with step size control) or "rosenbrock"
+            (linearly implicit ROS2 with step size control for stiff systems, uses the analytic jacobian of the state equations), by default "rk45"
+        dt : float, optional
+            step size of rk4, initial step size of the adaptive methods (estimated if None), by default None
+        rtol : float, optional
+            relative tolerance of the adaptive methods, by default 1e-6
+        atol : float, optional
+            absolute tolerance of the adaptive methods, by default 1e-9
+        t_eval : array_like, optional
+            times at which the result is stored (the steps end exactly on them), the integration starts at t_span[0] and
+            ends at the last time, if None every step is stored, by default None
+        n_workers : int, optional
+            if larger than 1 the ensemble is split into chunks which are integrated on a process pool,
+            needs t_eval for the adaptive methods, by default None
+        max_steps : int, optional
+            maximal number of (accepted and rejected) steps of the adaptive methods, by default 100000
+        backend : str, optional
+            backend of se.Lambdify, see compile, by default None
+
+        Returns
+        -------
+        SimulationResult
+            time points t (K,), states x (K, n) or (K, N, n), outputs y (K, p) or (K, N, p) and statistics
+        """
+        import numpy as np
+        from .Simulation import integrate, integrate_parallel, SimulationResult
+
+        compiled = self.compile(backend)
+        n, m = len(self.x), len(self.u)
+        x0 = np.asarray(x0, dtype=float)
+        params = np.asarray([float(p[1]) for p in self._Parameters] if params is None else params, dtype=float)
+        if callable(u):
+            u_function = lambda t: np.asarray(u(t), dtype=float)
+        else:
+            u_value = np.zeros(m) if u is None else np.asarray(u, dtype=float)
+            u_function = lambda t: u_value
+        if t_eval is not None:
+            t_eval = np.asarray(t_eval, dtype=float)
+            if np.any(np.diff(t_eval) <= 0) or t_eval[0] < t_span[0] or t_eval[-1] > t_span[1]:
+                raise ValueError("t_eval has to be increasing and inside of t_span")
+            t_span = (t_span[0], t_eval[-1])
+
+        values = [x0, params, u_function(t_span[0])]
+        if any(v.ndim > 2 for v in values):
+            raise ValueError("x0, params and u can have at most one leading (ensemble) dimension")
+        ensemble = any(v.ndim == 2 for v in values)
+        N = np.broadcast_shapes(*(v.shape[:-1] for v in values), (1,))[0] if ensemble else 1
+        x0 = np.broadcast_to(x0, (N, n)).copy()
+
+        def run(indices):
+            u_chunk = lambda t: (lambda v: v[indices] if v.ndim == 2 else v)(u_function(t))
+            p_chunk = params[indices] if params.ndim == 2 else params
+            return integrate(compiled.f, t_span, x0[indices], u_chunk, p_chunk, method, dt, rtol, atol, t_eval,
+                             compiled.dfdx if method == "rosenbrock" else None, max_steps)
+
+        if n_workers is not None and n_workers > 1 and N > 1:
+            if method != "rk4" and t_eval is None:
+                raise ValueError("the adaptive methods need t_eval to be run on a process pool")
+            t, x, stats = integrate_parallel(run, N, n_workers)
+        else:
+            t, x, stats = run(np.arange(N))
+
+        y = None
+        if len(self._Outputs_Calcs) != 0:
+            inputs = np.stack([u_function(tk) for tk in t])
+            if inputs.ndim == 2:
+                inputs = inputs[:, None, :]
+            y = compiled.y(x, inputs, params)
+        if not ensemble:
+            x = x[:, 0]
+            y = y[:, 0] if y is not None else None
+        return SimulationResult(t, x, y, stats)
+
+    @instrumented()
+    def addStateEquations(self, equations: Union[se.Matrix, RangeEquations], add_as_Output = True) -> None:
         """adding the equations for the states of the system x_dot = f(x, u)
 
         Args:
-            equation (se.Matrix): Matrix of the expressions corresponding to the system states
+            equation (se.Matrix | RangeEquations): Matrix of the expressions corresponding to the system states, or
+                RangeEquations (e.g. for IndexedSymbol states) whose ranges are written as loops by write_MFunctions
             add_as_Output (bool, optional): If true the equations will be added as outputs. Defaults to True.
         """
+        range_equations = None
+        if isinstance(equations, RangeEquations):
+            if equations.size != self.x.shape[0]:
+                raise ValueError("Number of equations has to be equal to the number of states")
+            range_equations = equations
+            equations = equations.expand()
         if isinstance(equations, se.Matrix):
             if equations.shape[1] != 1:
                 raise ValueError("Equations have to be a column vector")
@@ -199,7 +436,10 @@ class DynamicSystem():
         if len(self._State_Equations.calcs) != 0:
             raise ValueError("State equations are already set")
         self._State_Equations.addCalculation(self.x_dot, equations)
+        self._Range_Equations = range_equations
         self._number_of_states = equations.shape[0]
+        self._compiled = None
+        self._jacobians = {}
         
         if add_as_Output:
             for state in self.x:
@@ -253,6 +493,8 @@ class DynamicSystem():
             calc = Calculation()
             calc.addCalculation(name, rhs)
             self._Outputs_Calcs.addCalculation(name, rhs)
+        self._compiled = None
+        self._jacobians = {}
 
     def addOutput(self, output: se.Symbol | se.Function, name: str = "") -> None:
         """Adds an output to the System.
@@ -271,6 +513,8 @@ class DynamicSystem():
         else:
             self._Outputs.append(se.Symbol(name))
             self._Outputs_Calcs.addCalculation(se.Symbol(name), output)
+        self._compiled = None
+        self._jacobians = {}
     
     def addParameter(self, parameter: Any, values:list|int = 0) -> None:
         """adds a parameter to the System. If values are provided then the init file will include them if not they will be set to 0.
@@ -288,8 +532,10 @@ class DynamicSystem():
             raise ValueError("Number of parameters and values does not match")
         
         self._Parameters.extend(list(zip(parameter, values)))
+        self._compiled = None
     
-    def write_ABCD_to_File(self, name:str, path:str = "", overwrite:bool = True):
+    @instrumented()
+    def write_ABCD_to_File(self, name:str, path:str = "", overwrite:bool = True, sparse:bool = False):
         """writes the ABCD Matrizes of the linearized system to a matlab file
 
         Parameters
@@ -300,6 +546,8 @@ class DynamicSystem():
             Path in which the file should be saved, by default ""
         overwrite : bool, optional
             If true, the file will be overwritten if it already exists, by default True
+        sparse : bool, optional
+            If true, the matrices are written as sparse(i,j,v,m,n) with only the nonzero entries, by default False
         """
         File = MFile(name, path)
         ABCD_calc = Calculation()
@@ -307,9 +555,10 @@ class DynamicSystem():
         ABCD_calc.addCalculation(se.Symbol("B"), self._B)
         ABCD_calc.addCalculation(se.Symbol("C"), self._C)
         ABCD_calc.addCalculation(se.Symbol("D"), self._D)
-        File.addCalculation(ABCD_calc)
+        File.addCalculation(ABCD_calc, sparse=sparse)
         File.generateFile(overwrite)
     
+    @instrumented()
     def write_init_File(self, name:str, path:str = "", overwrite:bool = True):
         """writes an init file for the Parameters and the initial conditions of the system
 
@@ -323,18 +572,23 @@ class DynamicSystem():
             If true, the file will be overwritten if it already exists, by default True
         """
         File = MFile(name, path)
+        printer = MatlabPrinter()
+        parameter_names = [printer.doprint(current_registry().to_printable(para[0])) for para in self._Parameters]
         File.addText(r"%% System parameters")
         File.addText("\n")
-        for para in self._Parameters:
-            File.addText(str(sp.octave_code(para[0].subs(Symbol._Symbol_to_printable_dict))) + " = " + str(para[1]) + ";\n")
+        for para, para_name in zip(self._Parameters, parameter_names):
+            File.addText(para_name + " = " + str(para[1]) + ";\n")
             
             
-        File.addText(r"params = [" + ", ".join([sp.octave_code(para[0].subs(Symbol._Symbol_to_printable_dict)) for para in self._Parameters]) + "]; \n \n") # type: ignore
+        File.addText(r"params = [" + ", ".join(parameter_names) + "]; \n \n")
         File.addText(r"%% Initial conditions" + "\n")
-        File.addText("x_ic = " + str(sp.octave_code(self._x * 0)) + ";\n")
+        File.addText("x_ic = " + printer.doprint(self._x * 0) + ";\n")
         File.generateFile(overwrite)
     
-    def write_SFunction(self, name:str, path:str = "", overwrite:bool = True):
+    @instrumented()
+    def write_SFunction(self, name:str, path:str = "", overwrite:bool = True, shared_cse:bool = False, cse_helper_function:bool = False,
+                        cse_mode:str = "single", n_workers:int = None, hoist_parameters:bool = False, specialize:bool = False,
+                        max_ops:int = None, max_function_ops:int = None):
         """writes the nonlinear system as a SFunction to a matlab file
 
         Parameters
@@ -345,10 +599,82 @@ class DynamicSystem():
             Path where the file should be stored, by default ""
         overwrite : bool, optional
             If true, the file will be overwritten if it already exists, by default True
+        shared_cse : bool, optional
+            If true, cse is run once for the derivative and the output section, by default False
+        cse_helper_function : bool, optional
+            If true (and shared_cse is used), the temporaries needed by both sections are calculated in a local helper function, by default False
+        cse_mode : str, optional
+            "single" or "partitioned" (parallel cse for very large systems, not used with shared_cse), by default "single"
+        n_workers : int, optional
+            number of processes for the partitioned cse, by default None
+        hoist_parameters : bool, optional
+            If true, the cse temporaries which only depend on the parameters are calculated once in the initialization
+            and kept in persistent variables instead of in every derivative and output call (uses the shared cse), by default False
+        specialize : bool, optional
+            If true, the parameter values are inserted as constants (for fixed configurations), params is still an argument
+            of the SFunction but it is not used, by default False
+        max_ops : int, optional
+            chunked emission: statements with more operations are split into partial sums and temporaries (keeps the
+            statements of very large models parseable), by default None
+        max_function_ops : int, optional
+            the temporaries of the derivative and output sections are calculated in local functions with at most
+            max_function_ops operations, by default None
+        """
+        File = self._fill_SFunction(SFunction(name, path, cse_mode, n_workers, max_ops, max_function_ops), specialize)
+        File.generateFile(overwrite, shared_cse, cse_helper_function, hoist_parameters)
+
+    @instrumented()
+    def write_CSFunction(self, name:str, path:str = "", overwrite:bool = True, hoist_parameters:bool = True, specialize:bool = False,
+                         single_precision:bool = False):
+        """writes the nonlinear system as a C-MEX SFunction (level 2) to a C file, which can be compiled with mex
+
+        Parameters
+        ----------
+        name : str
+            Name of the file (and of the SFunction)
+        path : str, optional
+            Path where the file should be stored, by default ""
+        overwrite : bool, optional
+            If true, the file will be overwritten if it already exists, by default True
+        hoist_parameters : bool, optional
+            If true, the cse temporaries which only depend on the parameters are calculated once in mdlStart, by default True
+        specialize : bool, optional
+            If true, the parameter values are inserted as constants, params is still a parameter of the block but it is not used, by default False
+        single_precision : bool, optional
+            If true, the float functions of math.h are used in the calculations, by default False
+        """
+        File = self._fill_SFunction(CSFunction(name, path, single_precision), specialize)
+        File.generateFile(overwrite, hoist_parameters)
+
+    @instrumented()
+    def write_Level2SFunction(self, name:str, path:str = "", overwrite:bool = True, hoist_parameters:bool = True, specialize:bool = False):
+        """writes the nonlinear system as a level 2 Matlab SFunction to a matlab file
+
+        Parameters
+        ----------
+        name : str
+            Name of the file
+        path : str, optional
+            Path where the file should be stored, by default ""
+        overwrite : bool, optional
+            If true, the file will be overwritten if it already exists, by default True
+        hoist_parameters : bool, optional
+            If true, the cse temporaries which only depend on the parameters are calculated once in Start and kept in a DWork vector, by default True
+        specialize : bool, optional
+            If true, the parameter values are inserted as constants, params is still a parameter of the block but it is not used, by default False
         """
-        File = SFunction(name, path)
-        File.addState(self._x, self._State_Equations)
-        File.addOutput_equations(self._Outputs_Calcs)
+        File = self._fill_SFunction(Level2SFunction(name, path), specialize)
+        File.generateFile(overwrite, hoist_parameters)
+
+    def _fill_SFunction(self, File: SFunction, specialize: bool) -> SFunction:
+        """PRIVATE Adds the states, outputs, inputs and parameters (if not specialized) of the system to a SFunction generator
+        """
+        if specialize:
+            File.addState(self._x, self._specialized(self._State_Equations))
+            File.addOutput_equations(self._specialized(self._Outputs_Calcs))
+        else:
+            File.addState(self._x, self._State_Equations)
+            File.addOutput_equations(self._Outputs_Calcs)
         for o in self._Outputs:
             File.addOutput(o)
         
@@ -356,11 +682,18 @@ class DynamicSystem():
         #    File.addInput(i)
         File.addInput(self._u, se.Symbol('u'))
             
-        File.addParameter(self._Parameters) 
-        File.generateFile(overwrite)
+        if not specialize:
+            File.addParameter(self._Parameters) 
+        return File
     
-    def write_MFunctions(self, name:str, path:str = "", overwrite:bool = True):
+    @instrumented()
+    def write_MFunctions(self, name:str, path:str = "", overwrite:bool = True, cse_mode:str = "single", n_workers:int = None,
+                         jacobian:bool = False, jacobian_sparse:bool = None, specialize:bool = False, vectorized:bool = False,
+                         loops:str = "for", reroll:str = None, max_ops:int = None, max_function_ops:int = None):
         """write the nonlinear system as two MFunctions to a matlab file
+        If jacobian is set, <name>_dyn gets the optional second output J = df/dx (only calculated if it is requested,
+        sharing the cse temporaries with xdot) and <name>_jac(x, u, params) and <name>_jpattern() are written, e.g. for
+        odeset('Jacobian', @(t, x) <name>_jac(x, u, params), 'JPattern', <name>_jpattern()) of the stiff solvers.
 
         Parameters
         ----------
@@ -370,24 +703,190 @@ class DynamicSystem():
             Path where the files should be saved, by default ""
         overwrite : bool, optional
             If true, the files will be overwritten if they already exist, by default True
+        cse_mode : str, optional
+            "single" or "partitioned" (parallel cse for very large systems), by default "single"
+        n_workers : int, optional
+            number of processes for the partitioned cse, by default None
+        jacobian : bool, optional
+            If true, the jacobian of the state equations is written as well, by default False
+        jacobian_sparse : bool, optional
+            If true, the jacobian is generated as sparse matrix, if None it is sparse when at most a quarter of the entries
+            are structurally nonzero, by default None
+        specialize : bool, optional
+            If true, the parameter values are inserted as constants (for fixed configurations), params is still an argument
+            of the functions but it is not used, by default False
+        vectorized : bool, optional
+            If true, the functions evaluate N points at once: x is passed as n x N, u as m x N and params as p x N or p x 1,
+            xdot is returned as n x N, y as number of outputs x N and J as n x n x N (never sparse), by default False
+        loops : str, optional
+            how the ranges of state equations given as RangeEquations are written: "for" (for loops), "slice" (vectorized
+            slice expressions) or None (one line per state), always None for vectorized functions, by default "for"
+        reroll : str, optional
+            loop rerolling of xdot and y: runs of equations which only differ in the indices of the states (or inputs,
+            parameters) are written as for loops ("for") or slice assignments ("slice"), not used for vectorized functions,
+            by default None
+        max_ops : int, optional
+            chunked emission: statements with more operations are split into partial sums and temporaries, not used for
+            vectorized functions, by default None
+        max_function_ops : int, optional
+            the temporaries are calculated in local functions (<name>_dyn_chunk1, ...) with at most max_function_ops
+            operations, not used for vectorized functions, by default None
         """
-        Fdyn = MFunction(name + "_dyn", path)
+        values = self._parameter_values() if specialize else {}
+        params = se.Symbol("params") if specialize else se.Matrix([i[0] for i in self._Parameters ])
+        if jacobian:
+            pattern = self.sparsity_patterns()["A"]
+            if jacobian_sparse is None:
+                jacobian_sparse = pattern.density <= 0.25 and not vectorized
+        Fdyn = MFunction(name + "_dyn", path, cse_mode=cse_mode, n_workers=n_workers, sparse=jacobian and jacobian_sparse,
+                         vectorized=vectorized, reroll=reroll, max_ops=max_ops, max_function_ops=max_function_ops)
         
         Fdyn.addInput(self.x, "x")
         Fdyn.addInput(self.u, "u")
         # pars = []
         # for i in self._Parameters:
         #     pars.append(i[0])
-        Fdyn.addInput(se.Matrix([i[0] for i in self._Parameters ]), "params")
+        Fdyn.addInput(params, "params" if not specialize else "")
         #Fdyn.addOutput(self.x_dot, "xdot")
-        temp = Calculation()
-        temp.addCalculation(se.Symbol("xdot"),self._State_Equations.calcs[0] )
-        Fdyn.addCalculation(Calculation.append_Calculations([temp]))
+        if self._Range_Equations is not None and loops is not None and not vectorized:
+            Fdyn.addRangeCalculation("xdot", self._Range_Equations.subs(values), loops)
+        else:
+            temp = Calculation()
+            temp.addCalculation(se.Symbol("xdot"), batched_subs(self._State_Equations.calcs[0], values))
+            Fdyn.addCalculation(Calculation.append_Calculations([temp]))
         Fdyn.addOutput(se.Symbol("xdot"))
+        if jacobian:
+            Fdyn.addOutput(batched_subs(self._jacobian("A"), values), "J", optional=True)
         
         Fdyn.generateFile(overwrite)
+        if jacobian:
+            self._write_jacobian_files(name, path, overwrite, pattern)
         
-        Fout = MFunction(name + "_out", path)
+        Fout = MFunction(name + "_out", path, cse_mode=cse_mode, n_workers=n_workers, vectorized=vectorized, reroll=reroll,
+                         max_ops=max_ops, max_function_ops=max_function_ops)
+        Fout.addInput(self.x, "x")
+        Fout.addInput(params, "params" if not specialize else "")
+        Fout.addOutput(batched_subs(self.y, values), "y")
+        Fout.addCalculation(self._specialized(self._Outputs_Calcs) if specialize else Calculation.append_Calculations([self._Outputs_Calcs]))
+        Fout.generateFile(overwrite)
+
+    @instrumented()
+    def write_CFunctions(self, name:str, path:str = "", overwrite:bool = True, cse_mode:str = "single", n_workers:int = None,
+                         single_precision:bool = False, batch:bool = False, specialize:bool = False):
+        """writes the nonlinear system as two C99 functions (each a .c and a .h file):
+        void <name>_dyn(const double *x, const double *u, const double *p, double *xdot) and
+        void <name>_out(const double *x, const double *u, const double *p, double *y)
+
+        Parameters
+        ----------
+        name : str
+            Name of the files
+        path : str, optional
+            Path where the files should be saved, by default ""
+        overwrite : bool, optional
+            If true, the files will be overwritten if they already exist, by default True
+        cse_mode : str, optional
+            "single" or "partitioned" (parallel cse for very large systems), by default "single"
+        n_workers : int, optional
+            number of processes for the partitioned cse, by default None
+        single_precision : bool, optional
+            If true, float is used instead of double, by default False
+        batch : bool, optional
+            If true, <name>_dyn_batch and <name>_out_batch are generated as well, which evaluate many points (see CFunction), by default False
+        specialize : bool, optional
+            If true, the parameter values are inserted as constants, p is still an argument of the functions but it is not used, by default False
+        """
+        values = self._parameter_values() if specialize else {}
+        params = se.Matrix([i[0] for i in self._Parameters]) if self._Parameters else se.zeros(0, 1)
+        expressions = [("_dyn", "xdot", self._State_Equations._generate_shape_index_list()[1])]
+        expressions.append(("_out", "y", self.y if len(self._Outputs_Calcs) != 0 else se.zeros(0, 1)))
+        for suffix, output, expr in expressions:
+            F = CFunction(name + suffix, path, cse_mode=cse_mode, n_workers=n_workers, single_precision=single_precision, batch=batch)
+            F.addInput(self.x, "x")
+            F.addInput(self.u, "u")
+            F.addInput(params, "p")
+            F.addOutput(batched_subs(expr, values), output)
+            F.generateFile(overwrite)
+
+    @instrumented()
+    def compile_C(self, path:str = None, single_precision:bool = False, compiler:str = None, flags:list = None):
+        """ writes the state equations and outputs as C functions (with batch functions, see write_CFunctions) and compiles them
+        to a shared library. Needs numpy and a C compiler.
+
+        Parameters
+        ----------
+        path : str, optional
+            directory for the C files and the library, if None a temporary directory is used, by default None
+        single_precision : bool, optional
+            If true, float is used instead of double, by default False
+        compiler : str, optional
+            the C compiler, if None cc or gcc is used, by default None
+        flags : list, optional
+            compiler flags, by default ["-O2"]
+
+        Returns
+        -------
+        tuple[CCallable, CCallable]
+            f(x, u, params) and y(x, u, params), params defaults to the parameter values. x, u and params can have one leading
+            batch dimension, e.g. x with the shape (N, n).
+        """
+        import tempfile
+        from .CLibrary import CLibrary
+
+        if len(self._State_Equations.calcs) == 0:
+            raise ValueError("State equations have to be set before compiling")
+        if path is None:
+            path = tempfile.mkdtemp(prefix="System_to_Matlab_")
+        self.write_CFunctions("system", path, single_precision=single_precision, batch=True)
+        library = CLibrary([os.path.join(path, "system_dyn.c"), os.path.join(path, "system_out.c")], "system", path, compiler, flags)
+        sizes = [len(self.x), len(self.u), len(self._Parameters)]
+        defaults = [None, None, [float(p[1]) for p in self._Parameters]]
+        n_outputs = len(self.y) if len(self._Outputs_Calcs) != 0 else 0
+        return (library.function("system_dyn", sizes, [len(self.x)], single_precision, defaults),
+                library.function("system_out", sizes, [n_outputs], single_precision, defaults))
+
+    def _write_jacobian_files(self, name:str, path:str, overwrite:bool, pattern: SparsityPattern):
+        """PRIVATE writes <name>_jac, which calls <name>_dyn for the jacobian, and <name>_jpattern with the sparsity pattern
+        """
+        Fjac = MFile(name + "_jac", path)
+        Fjac.addText("function J = " + name + "_jac(x, u, params)\n")
+        Fjac.addText("\t[~, J] = " + name + "_dyn(x, u, params);\n")
+        Fjac.addText("end")
+        Fjac.generateFile(overwrite)
+
+        Fpattern = MFunction(name + "_jpattern", path, sparse=True)
+        S = se.zeros(*pattern.shape)
+        for i, j in pattern:
+            S[i, j] = 1
+        Fpattern.addOutput(S, "S")
+        Fpattern.generateFile(overwrite)
+
+    @instrumented()
+    def write_PyFunctions(self, name:str, path:str = "", overwrite:bool = True, cse_mode:str = "single", n_workers:int = None):
+        """write the nonlinear system as two vectorized NumPy functions (<name>_dyn.py with <name>_dyn(x, u, params)
+        and <name>_out.py with <name>_out(x, params)). The functions also accept batches, e.g. x with the shape (N, n).
+
+        Parameters
+        ----------
+        name : str
+            Name of the files
+        path : str, optional
+            Path where the files should be saved, by default ""
+        overwrite : bool, optional
+            If true, the files will be overwritten if they already exist, by default True
+        cse_mode : str, optional
+            "single" or "partitioned" (parallel cse for very large systems), by default "single"
+        n_workers : int, optional
+            number of processes for the partitioned cse, by default None
+        """
+        Fdyn = PyFunction(name + "_dyn", path, cse_mode=cse_mode, n_workers=n_workers)
+        Fdyn.addInput(self.x, "x")
+        Fdyn.addInput(self.u, "u")
+        Fdyn.addInput(se.Matrix([i[0] for i in self._Parameters ]), "params")
+        Fdyn.addOutput(self._State_Equations.calcs[0], "xdot")
+        Fdyn.generateFile(overwrite)
+
+        Fout = PyFunction(name + "_out", path, cse_mode=cse_mode, n_workers=n_workers)
         Fout.addInput(self.x, "x")
         Fout.addInput(se.Matrix([i[0] for i in self._Parameters ]), "params")
         Fout.addOutput(self.y, "y")
@@ -0,0 +1,268 @@
+from __future__ import annotations
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from typing import Callable
+
+
+# Dormand-Prince 5(4) tableau
+_DOPRI_C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1])
+_DOPRI_A = [
+    [],
+    [1/5],
+    [3/40, 9/40],
+    [44/45, -56/15, 32/9],
+    [19372/6561, -25360/2187, 64448/6561, -212/729],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+    [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84],
+]
+_DOPRI_B = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0])
+_DOPRI_E = _DOPRI_B - np.array([5179/57600, 0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40])
+
+# ROS2 (Verwer et al.), L-stable linearly implicit method of order 2 with an embedded order 1 solution
+_ROS2_GAMMA = 1 + 1/math.sqrt(2)
+
+METHODS = ("rk4", "rk45", "rosenbrock")
+
+
+class SimulationResult:
+    def __init__(self, t: np.ndarray, x: np.ndarray, y: np.ndarray = None, stats: dict = None) -> None:
+        """ Result of DynamicSystem.simulate
+
+        Parameters
+        ----------
+        t : np.ndarray
+            time points, shape (K,)
+        x : np.ndarray
+            states at the time points, shape (K, n) or (K, N, n) for ensembles
+        y : np.ndarray, optional
+            outputs at the time points, shape (K, p) or (K, N, p) for ensembles, by default None
+        stats : dict, optional
+            number of steps, rejected steps, evaluations of the state equations and of the jacobian, by default None
+        """
+        self._t = t
+        self._x = x
+        self._y = y
+        self._stats = stats or {}
+
+    @property
+    def t(self) -> np.ndarray:
+        return self._t
+
+    @property
+    def x(self) -> np.ndarray:
+        return self._x
+
+    @property
+    def y(self) -> np.ndarray:
+        return self._y
+
+    @property
+    def stats(self) -> dict:
+        return self._stats
+
+    def __repr__(self) -> str:
+        return f"SimulationResult(t=[{self._t[0]}, {self._t[-1]}], points={len(self._t)}, x={self._x.shape})"
+
+
+class Integrator:
+    def __init__(self, f: Callable, u: Callable, params: np.ndarray, jacobian: Callable = None) -> None:
+        """ Integrates x_dot = f(x, u(t), params) for a batch of N systems, all arrays have the shape (N, ...).
+        All members of the batch use the same steps (the step size is controlled by the worst member).
+
+        Parameters
+        ----------
+        f : Callable
+            state equations f(x, u, params), x with the shape (N, n)
+        u : Callable
+            inputs u(t) with the shape (m,) or (N, m)
+        params : np.ndarray
+            parameters with the shape (p,) or (N, p)
+        jacobian : Callable, optional
+            jacobian df/dx(x, u, params) with the shape (N, n, n), needed for rosenbrock, by default None
+        """
+        self._f = f
+        self._u = u
+        self._params = params
+        self._jacobian = jacobian
+        self.stats = {"steps": 0, "rejected": 0, "rhs": 0, "jacobian": 0}
+
+    def _rhs(self, t: float, x: np.ndarray) -> np.ndarray:
+        self.stats["rhs"] += 1
+        return self._f(x, self._u(t), self._params)
+
+    def _rk4_step(self, t: float, x: np.ndarray, h: float) -> np.ndarray:
+        k1 = self._rhs(t, x)
+        k2 = self._rhs(t + h/2, x + h/2*k1)
+        k3 = self._rhs(t + h/2, x + h/2*k2)
+        k4 = self._rhs(t + h, x + h*k3)
+        return x + h/6*(k1 + 2*k2 + 2*k3 + k4)
+
+    def _dopri_step(self, t: float, x: np.ndarray, h: float, k1: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        k = [k1]
+        for i in range(1, 7):
+            xi = x + h*sum(a*ki for a, ki in zip(_DOPRI_A[i], k) if a != 0)
+            k.append(self._rhs(t + _DOPRI_C[i]*h, xi))
+        x_new = x + h*sum(b*ki for b, ki in zip(_DOPRI_B, k) if b != 0)
+        error = h*sum(e*ki for e, ki in zip(_DOPRI_E, k) if e != 0)
+        # the last stage is the derivative at the new point (first same as last)
+        return x_new, error, k[6]
+
+    def _rosenbrock_step(self, t: float, x: np.ndarray, h: float, k1: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        self.stats["jacobian"] += 1
+        J = self._jacobian(x, self._u(t), self._params)
+        M = np.eye(x.shape[-1]) - _ROS2_GAMMA*h*J
+        s1 = np.linalg.solve(M, k1[..., None])[..., 0]
+        s2 = np.linalg.solve(M, (self._rhs(t + h, x + h*s1) - 2*s1)[..., None])[..., 0]
+        x_new = x + 1.5*h*s1 + 0.5*h*s2
+        return x_new, 0.5*h*(s1 + s2), None
+
+    @staticmethod
+    def _error_norm(error: np.ndarray, x: np.ndarray, x_new: np.ndarray, rtol: float, atol: float) -> float:
+        scale = atol + rtol*np.maximum(np.abs(x), np.abs(x_new))
+        if error.shape[-1] == 0:
+            return 0.0
+        return float(np.max(np.sqrt(np.mean((error/scale)**2, axis=-1))))
+
+    def fixed_step(self, times: np.ndarray, x0: np.ndarray, dt: float, record_steps: bool) -> tuple[np.ndarray, np.ndarray]:
+        """ classic Runge-Kutta (order 4) with steps of at most dt, which end exactly on the given times
+        """
+        t_out, x_out = [times[0]], [x0]
+        x = x0
+        for a, b in zip(times[:-1], times[1:]):
+            n = max(1, math.ceil((b - a)/dt - 1e-9))
+            h = (b - a)/n
+            for i in range(n):
+                x = self._rk4_step(a + i*h, x, h)
+                self.stats["steps"] += 1
+                if record_steps and i < n - 1:
+                    t_out.append(a + (i + 1)*h)
+                    x_out.append(x)
+            t_out.append(b)
+            x_out.append(x)
+        return np.array(t_out), np.stack(x_out)
+
+    def adaptive(self, method: str, t_span: tuple[float, float], x0: np.ndarray, t_eval: np.ndarray, rtol: float, atol: float,
+                 h0: float = None, max_steps: int = 100000) -> tuple[np.ndarray, np.ndarray]:
+        """ embedded Dormand-Prince 5(4) ("rk45") or linearly implicit ROS2 ("rosenbrock") with step size control.
+        The steps end exactly on the times of t_eval, without t_eval every accepted step is recorded.
+        """
+        if method == "rk45":
+            step, order = self._dopri_step, 5
+        else:
+            step, order = self._rosenbrock_step, 2
+        t0, t1 = t_span
+        targets = list(t_eval[t_eval > t0]) if t_eval is not None else [t1]
+        record_steps = t_eval is None
+        # the initial state is only a result if t_eval starts at t0
+        t_out, x_out = ([t0], [x0]) if t_eval is None or t_eval[0] == t0 else ([], [])
+        t, x = t0, x0
+        k1 = self._rhs(t, x)
+        h = h0 if h0 is not None else self._initial_step(t, x, k1, t1 - t0, order, rtol, atol)
+
+        while targets:
+            if self.stats["steps"] + self.stats["rejected"] >= max_steps:
+                raise RuntimeError(f"the integration needed more than {max_steps} steps (t = {t})")
+            target = targets[0]
+            clipped = h >= target - t
+            h_step = target - t if clipped else h
+            x_new, error, k_last = step(t, x, h_step, k1)
+            norm = self._error_norm(error, x, x_new, rtol, atol)
+            factor = 5.0 if norm == 0 else min(5.0, max(0.2, 0.9*norm**(-1/order)))
+            if not np.isfinite(norm) or norm > 1:
+                self.stats["rejected"] += 1
+                h = h_step*(0.2 if not np.isfinite(norm) else min(1.0, factor))
+                if h < 1e-14*max(1.0, abs(t)):
+                    raise RuntimeError(f"the step size became too small at t = {t}")
+                continue
+            self.stats["steps"] += 1
+            t = target if clipped else t + h_step
+            x = x_new
+            k1 = k_last if k_last is not None else self._rhs(t, x)
+            h = max(h, h_step*factor) if clipped else h_step*factor
+            if clipped:
+                targets.pop(0)
+            if record_steps or clipped:
+                t_out.append(t)
+                x_out.append(x)
+        return np.array(t_out), np.stack(x_out)
+
+    def _initial_step(self, t: float, x: np.ndarray, k1: np.ndarray, span: float, order: int, rtol: float, atol: float) -> float:
+        """ estimation of the first step size (Hairer, Norsett, Wanner)
+        """
+        scale = atol + rtol*np.abs(x)
+        d0 = np.sqrt(np.mean((x/scale)**2)) if x.size else 0.0
+        d1 = np.sqrt(np.mean((k1/scale)**2)) if x.size else 0.0
+        h = 1e-6 if d0 < 1e-5 or d1 < 1e-5 else 0.01*d0/d1
+        h = min(h, abs(span))
+        k2 = self._rhs(t + h, x + h*k1)
+        d2 = np.sqrt(np.mean(((k2 - k1)/scale)**2))/h if x.size else 0.0
+        if max(d1, d2) <= 1e-15:
+            h1 = max(1e-6, h*1e-3)
+        else:
+            h1 = (0.01/max(d1, d2))**(1/order)
+        return min(100*h, h1, abs(span))
+
+
+def integrate(f: Callable, t_span: tuple[float, float], x0: np.ndarray, u: Callable, params: np.ndarray, method: str = "rk45",
+              dt: float = None, rtol: float = 1e-6, atol: float = 1e-9, t_eval: np.ndarray = None, jacobian: Callable = None,
+              max_steps: int = 100000) -> tuple[np.ndarray, np.ndarray, dict]:
+    """ Integrates a batch of systems x_dot = f(x, u(t), params), x0 with the shape (N, n), see DynamicSystem.simulate
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, dict]
+        the time points (K,), the states (K, N, n) and the statistics
+    """
+    if method not in METHODS:
+        raise ValueError(f"method has to be one of {METHODS} but {method} was given")
+    integrator = Integrator(f, u, params, jacobian)
+    if method == "rk4":
+        if dt is None:
+            raise ValueError("rk4 needs the step size dt")
+        if t_eval is None:
+            t, x = integrator.fixed_step(np.array(t_span, dtype=float), x0, dt, True)
+        elif t_eval[0] > t_span[0]:
+            # integrated from t_span[0], the initial state is no result
+            t, x = integrator.fixed_step(np.concatenate([[t_span[0]], t_eval]), x0, dt, False)
+            t, x = t[1:], x[1:]
+        else:
+            t, x = integrator.fixed_step(t_eval, x0, dt, False)
+    else:
+        if method == "rosenbrock" and jacobian is None:
+            raise ValueError("rosenbrock needs the jacobian of the state equations")
+        t, x = integrator.adaptive(method, t_span, x0, t_eval, rtol, atol, dt, max_steps)
+    return t, x, integrator.stats
+
+
+# integration of the running parallel simulation, inherited by forked worker processes so it doesn't have to be pickled
+_shared_run: Callable = None
+
+
+def integrate_parallel(run: Callable[[np.ndarray], tuple[np.ndarray, np.ndarray, dict]], n: int, n_workers: int) -> tuple[np.ndarray, np.ndarray, dict]:
+    """ Splits the batch of n systems into n_workers chunks and integrates them on a process pool.
+    run(indices) integrates the members with the given indices, all chunks have to return the same time points
+    (fixed steps or t_eval). Where fork is not available the chunks are integrated one after another.
+    """
+    global _shared_run
+    chunks = [c for c in np.array_split(np.arange(n), min(n_workers, n)) if len(c)]
+    if "fork" in multiprocessing.get_all_start_methods() and len(chunks) > 1:
+        _shared_run = run
+        try:
+            with ProcessPoolExecutor(len(chunks), mp_context=multiprocessing.get_context("fork")) as pool:
+                results = list(pool.map(_run_chunk, chunks))
+        finally:
+            _shared_run = None
+    else:
+        results = [run(c) for c in chunks]
+
+    t = results[0][0]
+    stats = {key: sum(r[2][key] for r in results) for key in results[0][2]}
+    return t, np.concatenate([r[1] for r in results], axis=1), stats
+
+
+def _run_chunk(indices: np.ndarray) -> tuple[np.ndarray, np.ndarray, dict]:
+    return _shared_run(indices)
@@ -3,6 +3,7 @@ from ..Symbols import StaticSymbol, StaticSymbols
 from ..Symbols.Symbol import Symbol
 from ..FileGenerators import MFile, MFunction
 from ..Calculation.Calculation import Calculation
+from ..Instrumentation import instrumented
 
 import symengine as se
 import sympy as sp
@@ -10,11 +11,19 @@ from typing import Any, Union
 
 
 class StaticSystem():
-    def __init__(self) -> None:
-        self._Equations: Calculation = Calculation()
+    def __init__(self, inline: bool = True) -> None:
+        """Generates a class for a static system y = f(u)
+
+        Parameters
+        ----------
+        inline : bool, optional
+            If False the intermediate variables of the calculations are kept in the generated code instead of being inlined, by default True
+        """
+        self._Equations: Calculation = Calculation(inline)
         self._Outputs: list[se.Symbols | se.Function] = []
-        self._Outputs_Calcs: Calculation = Calculation()
+        self._Outputs_Calcs: Calculation = Calculation(inline)
         self._Inputs: list[tuple[se.Symbols | se.Function, str | se.Symbol]] = []
+        self._compiled = None
     
     def addCalculation(self, name: Union[str, se.Symbol, list[str], Calculation], rhs: se.Expr = None) -> None:
         """Adding an Calculation to the System. Has to have the form name = rhs.
@@ -34,6 +43,7 @@ class StaticSystem():
             calc = Calculation()
             calc.addCalculation(name, rhs)
             self._Equations.addCalculation(name, rhs)
+        self._compiled = None
 
         #self._Equations.append((rhs, name))
     
@@ -55,6 +65,7 @@ class StaticSystem():
             is_input_matrix = False
         
         self._Inputs.append((input, name))
+        self._compiled = None
     
     def addOutput(self, output: se.Symbol | se.Function, name: str = "") -> None:
         """Adds an output to the System.
@@ -70,8 +81,49 @@ class StaticSystem():
         else:
             self._Outputs.append(se.Symbol(name))
             self._Outputs_Calcs.addCalculation(se.Symbol(name), output)
+        self._compiled = None
 
     
+    @instrumented()
+    def compile(self, backend: str = None):
+        """ compiles the outputs and their jacobian (with cse) for fast numerical evaluation.
+        The result is cached until calculations, inputs or outputs are changed. Needs numpy.
+
+        Parameters
+        ----------
+        backend : str, optional
+            backend of se.Lambdify ("llvm" or "lambda"), if None llvm is used if it is available, by default None
+
+        Returns
+        -------
+        CompiledStaticSystem
+            evaluators y and dydu which are called with one argument per input (in the order they were added),
+            every argument can have leading batch dimensions.
+        """
+        from .CompiledSystem import CompiledStaticSystem
+
+        if self._compiled is not None and self._compiled._backend == backend:
+            return self._compiled
+
+        inputs = [list(i[0]) if isinstance(i[0], se.Matrix) else [i[0]] for i in self._Inputs]
+
+        def outputs() -> se.Matrix:
+            calc = Calculation.append_Calculations([self._Equations, self._Outputs_Calcs]).inlined()
+            values = {}
+            for var, value in zip(calc._vars, calc._calcs):
+                values.update(zip(var, value))
+            return se.Matrix([values.get(o, o) for o in self._Outputs]) if self._Outputs else se.zeros(0, 1)
+
+        self._compiled = CompiledStaticSystem(
+            inputs,
+            [None] * len(inputs),
+            {
+                "y": outputs,
+                "dydu": lambda: outputs().jacobian(se.Matrix([i for group in inputs for i in group])),
+            },
+            backend)
+        return self._compiled
+
     # def addOutput(self, name: Union[str, se.Symbol, list[str], Calculation], rhs: se.Expr = None) -> None:
     #     """Adding an Output to the System. Has to have the form name = rhs.
     #     --------
@@ -88,7 +140,9 @@ class StaticSystem():
     #         calc.addCalculation(name, rhs)
     #         self._Outputs.addCalculation(name, rhs)
         
-    def write_MFunctions(self, name:str, path:str = "", overwrite:bool = True):
+    @instrumented()
+    def write_MFunctions(self, name:str, path:str = "", overwrite:bool = True, cse_mode:str = "single", n_workers:int = None,
+                         sparse:bool = False, reroll:str = None, max_ops:int = None, max_function_ops:int = None):
         """ Writes the MFunction 
 
         Parameters
@@ -99,9 +153,22 @@ class StaticSystem():
             Path where the File should be saved . Defaults to "".
         overwrite : bool, optional
             If the File should be overwritten if it already exists. Defaults to True.
+        cse_mode : str, optional
+            "single" or "partitioned" (parallel cse for very large systems). Defaults to "single".
+        n_workers : int, optional
+            Number of processes for the partitioned cse. Defaults to None.
+        sparse : bool, optional
+            If matrix results should be generated as sparse(i,j,v,m,n). Defaults to False.
+        reroll : str, optional
+            Loop rerolling of vector results, "for" (for loops) or "slice" (slice assignments), see CodeElement. Defaults to None.
+        max_ops : int, optional
+            Chunked emission, statements with more operations are split into partial sums and temporaries, see CodeElement. Defaults to None.
+        max_function_ops : int, optional
+            Temporaries with more operations are calculated in local functions, see CodeElement. Defaults to None.
         """
         
-        Fdyn = MFunction(name , path)
+        Fdyn = MFunction(name , path, inline=self._Equations.is_inline, cse_mode=cse_mode, n_workers=n_workers, sparse=sparse,
+                         reroll=reroll, max_ops=max_ops, max_function_ops=max_function_ops)
         for i in self._Inputs:
             Fdyn.addInput(i[0], i[1])
         Fdyn._Outputs = self._Outputs
@@ -1,5 +1,7 @@
-from .Symbols import DynamicSymbol, StaticSymbol, DynamicSymbols, StaticSymbols, diff_t
+from .Symbols import DynamicSymbol, StaticSymbol, DynamicSymbols, StaticSymbols, diff_t, SymbolRegistry, IndexedSymbol
 from .Systems import DynamicSystem, StaticSystem
 from .HelperFunctions import Drehmatrix, disp
+from .Instrumentation import Profiler
+from .Calculation import RangeEquations
 
-__all__ = ['DynamicSymbol', 'StaticSymbol', 'DynamicSymbols', 'StaticSymbols', 'Drehmatrix', 'diff_t', 'DynamicSystem', 'StaticSystem']
\ No newline at end of file
+__all__ = ['DynamicSymbol', 'StaticSymbol', 'DynamicSymbols', 'StaticSymbols', 'Drehmatrix', 'diff_t', 'DynamicSystem', 'StaticSystem', 'Profiler', 'SymbolRegistry', 'IndexedSymbol', 'RangeEquations']
\ No newline at end of file
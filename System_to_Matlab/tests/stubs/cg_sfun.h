@@ -0,0 +1 @@
+/* Stand-in for the Simulink cg_sfun.h, see simstruc.h */
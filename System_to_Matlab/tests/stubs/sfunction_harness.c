@@ -0,0 +1,78 @@
+/*
+ * Runs a generated C-MEX S-Function with the stub simstruc.h: compile with -DSFUNCTION_SOURCE='"<file>.c"'.
+ * Reads the parameters, the initial conditions, the states and the inputs (each as count followed by the values) from
+ * stdin and prints the initial states, the derivatives and the outputs (one line each).
+ */
+#include <stdio.h>
+#include <stdlib.h>
+#include SFUNCTION_SOURCE
+
+static real_T *read_vector(size_t *n)
+{
+    size_t i;
+    real_T *v;
+    if (scanf("%zu", n) != 1) exit(2);
+    v = calloc(*n + 1, sizeof(real_T));
+    for (i = 0; i < *n; i++) {
+        if (scanf("%lf", &v[i]) != 1) exit(2);
+    }
+    return v;
+}
+
+static void print_vector(const real_T *v, int_T n)
+{
+    int_T i;
+    for (i = 0; i < n; i++) {
+        printf("%.17g ", v[i]);
+    }
+    printf("\n");
+}
+
+int main(void)
+{
+    SimStruct S = {0};
+    mxArray params, x_ic;
+    size_t n_x, n_u;
+    real_T *x, *u;
+    const real_T **u_ptrs;
+    size_t i;
+
+    params.pr = read_vector(&params.n);
+    x_ic.pr = read_vector(&x_ic.n);
+    x = read_vector(&n_x);
+    u = read_vector(&n_u);
+
+    S.sFcnParamsCount = 2;
+    S.sFcnParams[0] = &params;
+    S.sFcnParams[1] = &x_ic;
+    mdlInitializeSizes(&S);
+    mdlInitializeSampleTimes(&S);
+
+    S.contStates = calloc(S.numContStates + 1, sizeof(real_T));
+    S.dX = calloc(S.numContStates + 1, sizeof(real_T));
+    S.rwork = calloc(S.numRWork + 1, sizeof(real_T));
+    S.outputs = calloc(S.outputWidth + 1, sizeof(real_T));
+    u_ptrs = calloc(n_u + 1, sizeof(real_T *));
+    for (i = 0; i < n_u; i++) {
+        u_ptrs[i] = &u[i];
+    }
+    S.inputPtrs = u_ptrs;
+
+    mdlStart(&S);
+    mdlInitializeConditions(&S);
+    if (S.errorStatus != NULL) {
+        fprintf(stderr, "%s\n", S.errorStatus);
+        return 1;
+    }
+    print_vector(S.contStates, S.numContStates);
+
+    for (i = 0; i < n_x; i++) {
+        S.contStates[i] = x[i];
+    }
+    mdlDerivatives(&S);
+    mdlOutputs(&S, 0);
+    mdlTerminate(&S);
+    print_vector(S.dX, S.numContStates);
+    print_vector(S.outputs, S.outputWidth);
+    return 0;
+}
@@ -0,0 +1,74 @@
+/*
+ * Minimal stand-in for the Simulink simstruc.h, only for compiling and running generated C-MEX S-Functions in the
+ * tests (without Matlab). It provides the SimStruct macros used by CSFunction.
+ */
+#ifndef SIMSTRUC_STUB_H
+#define SIMSTRUC_STUB_H
+
+#include <stddef.h>
+
+typedef double real_T;
+typedef int int_T;
+typedef const real_T *const *InputRealPtrsType;
+
+typedef struct {
+    real_T *pr;
+    size_t n;
+} mxArray;
+
+typedef struct {
+    int_T numSFcnParams;
+    int_T sFcnParamsCount;
+    const mxArray *sFcnParams[4];
+    int_T numContStates;
+    int_T numInputPorts;
+    int_T inputWidth;
+    int_T directFeedThrough;
+    int_T numOutputPorts;
+    int_T outputWidth;
+    int_T numRWork;
+    real_T *contStates;
+    real_T *dX;
+    real_T *rwork;
+    InputRealPtrsType inputPtrs;
+    real_T *outputs;
+    const char *errorStatus;
+} SimStruct;
+
+#define CONTINUOUS_SAMPLE_TIME 0.0
+#define SS_OPTION_EXCEPTION_FREE_CODE 0
+#define UNUSED_ARG(arg) (void)(arg)
+
+#define mxGetPr(a) ((a)->pr)
+#define mxGetNumberOfElements(a) ((a)->n)
+
+#define ssSetNumSFcnParams(S, n) ((S)->numSFcnParams = (n))
+#define ssGetNumSFcnParams(S) ((S)->numSFcnParams)
+#define ssGetSFcnParamsCount(S) ((S)->sFcnParamsCount)
+#define ssGetSFcnParam(S, i) ((S)->sFcnParams[i])
+#define ssSetSFcnParamTunable(S, i, tunable) ((void)(S), (void)(i), (void)(tunable))
+#define ssSetNumContStates(S, n) ((S)->numContStates = (n))
+#define ssSetNumDiscStates(S, n) ((void)(S), (void)(n))
+#define ssSetNumInputPorts(S, n) ((S)->numInputPorts = (n), 1)
+#define ssSetInputPortWidth(S, port, n) ((S)->inputWidth = (n))
+#define ssSetInputPortDirectFeedThrough(S, port, flag) ((S)->directFeedThrough = (flag))
+#define ssSetNumOutputPorts(S, n) ((S)->numOutputPorts = (n), 1)
+#define ssSetOutputPortWidth(S, port, n) ((S)->outputWidth = (n))
+#define ssSetNumSampleTimes(S, n) ((void)(S), (void)(n))
+#define ssSetNumRWork(S, n) ((S)->numRWork = (n))
+#define ssSetNumIWork(S, n) ((void)(S), (void)(n))
+#define ssSetNumPWork(S, n) ((void)(S), (void)(n))
+#define ssSetNumModes(S, n) ((void)(S), (void)(n))
+#define ssSetNumNonsampledZCs(S, n) ((void)(S), (void)(n))
+#define ssSetOptions(S, options) ((void)(S), (void)(options))
+#define ssSetSampleTime(S, i, t) ((void)(S), (void)(i), (void)(t))
+#define ssSetOffsetTime(S, i, t) ((void)(S), (void)(i), (void)(t))
+#define ssSetErrorStatus(S, msg) ((S)->errorStatus = (msg))
+
+#define ssGetContStates(S) ((S)->contStates)
+#define ssGetdX(S) ((S)->dX)
+#define ssGetRWork(S) ((S)->rwork)
+#define ssGetInputPortRealSignalPtrs(S, port) ((S)->inputPtrs)
+#define ssGetOutputPortRealSignal(S, port) ((S)->outputs)
+
+#endif
@@ -0,0 +1,33 @@
+from System_to_Matlab.Printers import CPrinter, c_code
+import pytest
+import symengine as se
+
+x, y, z = se.symbols("x y z")
+
+@pytest.mark.parametrize("expr, code", [
+    (1/x, "1.0/x"),
+    (se.sqrt(x), "sqrt(x)"),
+    (x**se.Rational(1, 3), "pow(x, 1.0/3.0)"),
+    (se.Rational(1, 3), "1.0/3.0"),
+    (se.Abs(x)*se.exp(y), "exp(y)*fabs(x)"),
+    (se.Max(x, y), "fmax(x, y)"),
+    (se.sign(x), "((x > 0) - (x < 0))"),
+    (se.Piecewise((x, x < 0), (y, True)), "(x < 0 ? x : y)"),
+    (se.And(x < y, y < z), "x < y && y < z"),
+    (se.Symbol("double") + 1, "double_ + 1"),
+    (se.oo, "INFINITY"),
+])
+def test_c_code(expr, code):
+    assert c_code(expr) == code
+
+def test_c_code_single_precision():
+    printer = CPrinter(single_precision=True)
+    assert printer.doprint(se.sin(x)**se.Rational(1, 3)) == "powf(sinf(x), 1.0f/3.0f)"
+    assert printer.doprint(se.Float(1.5)*x) == "1.5f*x"
+
+def test_c_code_matrix_and_errors():
+    assert c_code(se.Matrix([[x, 1], [2, y]])) == "{x, 1, 2, y}"
+    with pytest.raises(TypeError):
+        c_code(se.I*x)
+    with pytest.raises(ValueError):
+        c_code(se.Piecewise((x, x < 0), (y, y < 0)))
@@ -1,4 +1,5 @@
-from System_to_Matlab.Calculation import Calculation
+from System_to_Matlab.Calculation import Calculation, batched_subs, combine_subs, partitioned_cse, SparsityPattern, sparse_jacobian
+from System_to_Matlab import DynamicSymbol
 import pytest
 import symengine as se
 
@@ -106,3 +107,151 @@ def test_addCalculation_var_calc_shape_mismatch():
     var = se.Matrix([se.Symbol("var1"), se.Symbol("var2")])
     with pytest.raises(ValueError):
         calc.addCalculation(var, se.Matrix([se.sin(var[0])]))
+
+def test_addCalculation_not_inlined():
+    calc = Calculation(inline=False)
+    x, y, z, a, b = se.symbols("x y z a b")
+    calc.addCalculation(x, a + b)
+    calc.addCalculation(y, x**2)
+    calc.addCalculation(z, se.Matrix([x*y, b]).T)
+
+    assert calc._calcs == [se.Matrix([a + b]), se.Matrix([x**2]), se.Matrix([[x*y, b]])]
+    assert calc.dependencies == [(), (0,), (0, 1)]
+    assert calc._inputs == [a, b] or calc._inputs == [b, a]
+
+def test_inlined():
+    calc = Calculation(inline=False)
+    x, y, z, a, b = se.symbols("x y z a b")
+    calc.addCalculation(x, a + b)
+    calc.addCalculation(y, x**2)
+    calc.addCalculation(z, x*y)
+
+    full = calc.inlined()
+    assert full._calcs == [se.Matrix([a + b]), se.Matrix([(a + b)**2]), se.Matrix([(a + b)**3])]
+    assert full.dependencies == [(), (), ()]
+
+    partial = calc.inlined([y])
+    assert partial._calcs == [se.Matrix([a + b]), se.Matrix([x**2]), se.Matrix([x**3])]
+    assert partial.dependencies == [(), (0,), (0,)]
+
+def test_inputs_outputs_order():
+    calc = Calculation()
+    a, b, c, y1, y2 = se.symbols("a b c y1 y2")
+    calc.addCalculation(y1, a)
+    calc.addCalculation(y2, se.Matrix([b + a, c*a]))
+    calc.addCalculation(se.Matrix([y1, y2]), se.Matrix([a, b]))
+
+    assert calc._inputs == [a, b, c]
+    assert calc.inputs == se.Matrix([a, b, c])
+    assert calc.outputs == se.Matrix([y1, y2])
+    assert b in calc._inputs and y1 not in calc._inputs
+
+def test_inputs_time():
+    # t is only an input if it is used outside of the dynamic symbols
+    t = DynamicSymbol._derivation_variable
+    [q] = DynamicSymbol("q", 1, 0).vars
+    y1, y2 = se.symbols("y1 y2")
+    calc = Calculation()
+    calc.addCalculation(y1, q**2 + se.Derivative(q, t))
+    assert calc._inputs == [q]
+    calc.addCalculation(y2, se.sin(t)*q)
+    assert t in calc._inputs and q in calc._inputs
+
+def test_generate_shape_index_list_cached():
+    calc = Calculation()
+    a, b, y1, y2 = se.symbols("a b y1 y2")
+    calc.addCalculation(y1, a**2)
+    _, vec1 = calc._generate_shape_index_list()
+    assert calc._generate_shape_index_list()[1] is vec1
+
+    calc.addCalculation(y2, se.Matrix([a, b]))
+    indizes_shapes, vec2 = calc._generate_shape_index_list()
+    assert indizes_shapes == [((0, 1), (1, 1)), ((1, 3), (2, 1))]
+    assert vec2 == se.Matrix([a**2, a, b])
+
+    calc.subs({a: b})
+    assert calc._generate_shape_index_list()[1] == se.Matrix([b**2, b, b])
+
+def test_batched_subs():
+    a, b, c = se.symbols("a b c")
+    m = se.Matrix([a + b, se.sin(a)*c])
+    assert batched_subs(m, {a: b, b: a}) == se.Matrix([a + b, se.sin(b)*c])
+    assert batched_subs(a*b + c, {a*b: c}) == 2*c
+    assert batched_subs(m, {}) is m
+
+def test_batched_subs_derivative():
+    t = DynamicSymbol._derivation_variable
+    f = se.Function("f")(t)
+    a = se.Symbol("a")
+    assert batched_subs(f**2, {f: a}) == a**2
+    assert batched_subs(se.Derivative(f, t), {f: a}) == se.Derivative(f, t).subs({f: a})
+
+def test_combine_subs():
+    a, b, c, d = se.symbols("a b c d")
+    subs = combine_subs(se.Matrix([a, b]), [c, d])
+    assert combine_subs([c], [a], subs) == {a: c, b: d, c: a}
+    with pytest.raises(ValueError):
+        combine_subs([a, b], [c])
+
+
+def _undo_cse(replacements, reduced):
+    for temp, expr in reversed(replacements):
+        reduced = [r.subs({temp: expr}) for r in reduced]
+    return reduced
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_partitioned_cse(n_workers):
+    q1, q2, q3 = se.symbols("q1 q2 q3")
+    exprs = [se.sin(q1)*se.cos(q2) + se.sin(q1), se.sin(q1)*se.cos(q2)*q3, se.cos(q3)**2 + se.cos(q3)*q1, se.cos(q3)*q2 + 1]
+    replacements, reduced = partitioned_cse(exprs, n_workers=n_workers, n_clusters=2)
+
+    assert len(reduced) == len(exprs)
+    assert [r[0] for r in replacements] == [se.Symbol(f"x{i}") for i in range(len(replacements))]
+    assert [se.expand(a - b) for a, b in zip(_undo_cse(replacements, reduced), exprs)] == [0] * len(exprs)
+
+def test_partitioned_cse_duplicates():
+    q1, q2 = se.symbols("q1 q2")
+    exprs = [se.sin(q1 + q2)*q1, se.sin(q1 + q2)*q2, se.sin(q1 + q2)*q1*q2, se.sin(q1 + q2) + q2]
+    replacements, reduced = partitioned_cse(exprs, n_workers=1, n_clusters=4)
+
+    # every cluster only has one expression, but sin(q1 + q2) is shared and only kept once
+    assert len(set(r[1] for r in replacements)) == len(replacements)
+    assert [se.expand(a - b) for a, b in zip(_undo_cse(replacements, reduced), exprs)] == [0] * len(exprs)
+
+def test_partitioned_cse_wrong_values():
+    with pytest.raises(ValueError):
+        partitioned_cse([se.Symbol("q1")], n_workers=0)
+    assert partitioned_cse([]) == ([], [])
+
+def test_SparsityPattern():
+    q1, q2, q3 = se.symbols("q1 q2 q3")
+    pattern = SparsityPattern.from_expressions([se.sin(q1)*q2, q3**2, 1], [q1, q2, q3])
+
+    assert pattern.shape == (3, 3)
+    assert pattern.nnz == 3
+    assert list(pattern) == [(0, 0), (0, 1), (1, 2)]
+    assert pattern.rows == [0, 0, 1] and pattern.cols == [0, 1, 2]
+    assert pattern.row(0) == [0, 1] and pattern.row(2) == []
+    assert (1, 2) in pattern and (2, 2) not in pattern
+    assert pattern == SparsityPattern((3, 3), [(1, 2), (0, 1), (0, 0)])
+    with pytest.raises(ValueError):
+        SparsityPattern((2, 2), [(2, 0)])
+
+def test_sparse_jacobian():
+    q1, q2, q3 = se.symbols("q1 q2 q3")
+    exprs = se.Matrix([se.sin(q1)*q2, q3**2, q1 + q3])
+    variables = se.Matrix([q1, q2, q3])
+
+    assert sparse_jacobian(exprs, variables) == exprs.jacobian(variables)
+    with pytest.raises(ValueError):
+        sparse_jacobian(exprs, variables, SparsityPattern((2, 3), []))
+
+def test_addCalculation_inline_order():
+    a, b, c, x = se.symbols("a b c x")
+    calc = Calculation()
+    calc.addCalculation(a, b + 1)  # b is defined afterwards, it is substituted in later calculations
+    calc.addCalculation(b, 2*x)
+    calc.addCalculation(c, a*b)
+    assert calc._calcs[-1] == se.Matrix([(2*x + 1)*2*x])
+    calc.addCalculation(se.Matrix([a, x]), se.Matrix([c, a]))
+    assert calc._calcs[-1] == se.Matrix([(2*x + 1)*2*x, 2*x + 1])
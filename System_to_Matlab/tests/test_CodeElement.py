@@ -1,4 +1,6 @@
-from System_to_Matlab.FileGenerators.MatlabElements import CodeElement
+from System_to_Matlab.FileGenerators.MatlabElements import CodeElement, SharedCSE, VectorizedCodeElement
+from System_to_Matlab.FileGenerators.MatlabElements.Reroll import find_runs
+from System_to_Matlab.FileGenerators.MatlabElements.Chunking import split_large, function_blocks
 from System_to_Matlab.Calculation import Calculation
 import pytest
 import symengine as se
@@ -31,4 +33,133 @@ def test_CodeElement_no_cse():
 def test_CodeElement_clear():
     ce = CodeElement(R,  clear=False)
     s = ce.generateCode()
-    assert ce.generateCode() =="x0 = q1 + q2;\nx1 = cos(x0);\nx2 = sin(x0);\n\nR = [x1 -x2 0; x2 x1 0; 0 0 1];\n"
\ No newline at end of file
+    assert ce.generateCode() =="x0 = q1 + q2;\nx1 = cos(x0);\nx2 = sin(x0);\n\nR = [x1 -x2 0; x2 x1 0; 0 0 1];\n"
+def test_CodeElement_partitioned():
+    ce =  CodeElement(R, cse_mode="partitioned", n_workers=1)
+    assert ce.generateCode() =="x0 = q1 + q2;\nx1 = cos(x0);\nx2 = sin(x0);\n\nR = [x1 -x2 0; x2 x1 0; 0 0 1];\nclear x0 x1 x2;\n"
+
+def test_CodeElement_wrong_cse_mode():
+    with pytest.raises(ValueError):
+        CodeElement(R, cse_mode="fast")
+
+def test_CodeElement_sparse():
+    ce =  CodeElement(R, sparse=True)
+    assert ce.generateCode() =="x0 = q1 + q2;\nx1 = cos(x0);\nx2 = sin(x0);\n\nR = sparse([1 1 2 2 3], [1 2 1 2 3], [x1, -x2, x2, x1, 1], 3, 3);\nclear x0 x1 x2;\n"
+
+def test_CodeElement_sparse_no_cse():
+    ce =  CodeElement(R, use_cse=False, sparse=True)
+    assert ce.generateCode() =="R = sparse([1 1 2 2 3], [1 2 1 2 3], [cos(q1 + q2), -sin(q1 + q2), sin(q1 + q2), cos(q1 + q2), 1], 3, 3);\n"
+
+def test_SharedCSE_hoist_invariants():
+    a, b, c = se.symbols("a b c")
+    first = Calculation()
+    first.addCalculation(se.Symbol("y"), se.Matrix([se.sin(q1)*a/b + se.cos(q1), se.sqrt(c/a)*q2]))
+    second = Calculation()
+    second.addCalculation(se.Symbol("z"), se.sin(q1)*a/b + q2)
+    shared = SharedCSE([first, second])
+    hoisted = shared.hoist_invariants({a, b, c})
+
+    replacements = dict(shared.replacements)
+    assert {replacements[h] for h in hoisted} == {a/b, se.sqrt(c/a)}
+    # the hoisted temporaries are calculated before all others
+    assert {r[0] for r in shared.replacements[:len(hoisted)]} == hoisted
+    ce = shared.element(0, exclude=hoisted)
+    assert "a" not in ce.generateCode().replace("cos", "").replace("sin", "")
+
+def test_VectorizedCodeElement():
+    ce = VectorizedCodeElement(R)
+    assert ce.generateCode() == ("x0 = q1 + q2;\nx1 = cos(x0);\nx2 = sin(x0);\n\nR = zeros(3, 3, N);\n"
+                                 "R(1,1,:) = reshape(x1, 1, 1, []);\nR(1,2,:) = reshape(-x2, 1, 1, []);\n"
+                                 "R(2,1,:) = reshape(x2, 1, 1, []);\nR(2,2,:) = reshape(x1, 1, 1, []);\nR(3,3,:) = 1;\n")
+    ce = VectorizedCodeElement(simple, batch_size="n")
+    assert ce.generateCode() == "x = q1 + q2 + zeros(1, n);\n"
+
+    vector = Calculation()
+    vector.addCalculation(se.Symbol("v"), se.Matrix([q1, 0, 2]))
+    assert VectorizedCodeElement(vector, use_cse=False).generateCode() == "v = zeros(3, N);\nv(1,:) = q1;\nv(3,:) = 2;\n"
+
+q = se.symbols("q1:9")
+c = se.Symbol("c")
+arrays = {s: ("x", k + 1) for k, s in enumerate(q)}
+
+def test_find_runs():
+    [run] = find_runs([c*(q[k + 1] - q[k]) for k in range(6)] + [q[0]], arrays)
+    assert (run.start, run.stop, run.period) == (1, 6, 1)
+    assert run.arrays == [[("x", 1, 0), ("x", 1, 1)]]
+    # zero elements break runs, runs need min_length repetitions
+    [run] = find_runs([q[0], q[1], 0, q[2], q[3], q[4], q[5]], arrays)
+    assert (run.start, run.stop) == (4, 7)
+    assert find_runs([q[0], q[1], 0, q[2], q[3], q[4], q[5]], arrays, min_length=5) == []
+    [run] = find_runs([e for k in range(4) for e in (q[k], q[k]**2)], arrays, max_period=2)
+    assert (run.start, run.period, run.count) == (1, 2, 4)
+    assert str(run.loop_position(se.Symbol("i"), 1)) == "2*i"
+
+def test_CodeElement_reroll():
+    forces = [c*(q[k + 1] - q[k])**3 for k in range(7)]
+    chain = Calculation()
+    chain.addCalculation(se.Symbol("v"), se.Matrix([forces[k + 1] - forces[k] for k in range(6)]))
+    ce = CodeElement(chain, reroll="for", arrays=arrays)
+    assert ce.generateCode() == ("tmp = zeros(5, 1);\nfor i = 1:5\n\ttmp(i) = (-x(i + 1) + x(i + 2)).^3.*c;\nend\n\n"
+                                 "v = zeros(6, 1);\nv(1) = -(-q1 + q2).^3.*c + tmp(1);\nfor i = 2:5\n\tv(i) = -tmp(i - 1) + tmp(i);\nend\n"
+                                 "v(6) = (-q7 + q8).^3.*c - tmp(5);\nclear tmp;\n")
+    ce = CodeElement(chain, reroll="slice", arrays=arrays)
+    assert ce.generateCode() == ("tmp = zeros(5, 1);\ntmp(1:5) = (-x(2:6) + x(3:7)).^3.*c;\n\n"
+                                 "v = zeros(6, 1);\nv(1) = -(-q1 + q2).^3.*c + tmp(1);\nv(2:5) = -tmp(1:4) + tmp(2:5);\n"
+                                 "v(6) = (-q7 + q8).^3.*c - tmp(5);\nclear tmp;\n")
+    # the rerolled code is only used if it is shorter
+    assert CodeElement(R, reroll="for", arrays=arrays).generateCode() == CodeElement(R).generateCode()
+    with pytest.raises(ValueError):
+        CodeElement(R, reroll="while")
+
+def test_CodeElement_reroll_invariant():
+    # temporaries which are used by every element of a run are renamed like the other temporaries
+    a, b = se.symbols("a b")
+    forces = [(a + b)*(q[k + 1] - q[k])**3 for k in range(7)]
+    chain = Calculation()
+    chain.addCalculation(se.Symbol("v"), se.Matrix([forces[k + 1] - forces[k] for k in range(6)]))
+    code = CodeElement(chain, reroll="slice", arrays=arrays).generateCode()
+    assert "tmp(1) = a + b;\ntmp(2:6) = (-x(2:6) + x(3:7)).^3.*tmp(1);\n" in code
+    assert "x0" not in code
+
+def test_split_large():
+    names = iter(se.symbols("p0:10"))
+    temps, reduced, n_new = split_large([], [sum(q)], 3, lambda: next(names))
+    assert n_new == 2
+    assert all(se.count_ops(e) <= 3 for _, e in temps) and se.count_ops(reduced[0]) <= 3
+    assert reduced[0].xreplace(dict(temps)) == sum(q)
+    # the large arguments of other operations are moved into temporaries
+    temps, reduced, n_new = split_large([], [se.sin(sum(q))], 4, lambda: next(names))
+    assert reduced[0] == se.sin(temps[-1][0] + temps[-2][0])
+    with pytest.raises(ValueError):
+        split_large([], [sum(q)], 0, lambda: next(names))
+
+def test_function_blocks():
+    a, b, t1, t2, t3 = se.symbols("a b t1 t2 t3")
+    temps = [(t1, se.sin(a)*b), (t2, se.cos(t1) + se.Symbol("x(3)")), (t3, se.exp(a))]
+    assert function_blocks(temps, [t2 + t3], 100) == []
+    [(block1, arguments1, results1), (block2, arguments2, results2)] = function_blocks(temps, [t2 + t3], 4)
+    assert (block1, arguments1, results1) == (temps[:2], ["a", "b", "x"], [t2])
+    assert (block2, arguments2, results2) == (temps[2:], ["a"], [t3])
+    # blocks without used results are dropped
+    assert len(function_blocks(temps, [t2], 4)) == 1
+
+def test_CodeElement_chunked():
+    calc = Calculation()
+    calc.addCalculation(se.Symbol("y"), sum(se.sin(s) for s in q))
+    ce = CodeElement(calc, max_ops=4)
+    code = ce.generateCode()
+    assert code.count("part") == 12 and "y = part0 + part1 + part2 + part3;\n" in code
+    assert ce.local_functions() == ""
+
+    ce = CodeElement(calc, max_ops=4, max_function_ops=6, function_name="f_chunk")
+    code = ce.generateCode()
+    assert "[part0, part1] = f_chunk1(" in code and "[part2, part3] = f_chunk2(" in code
+    assert "sin(" not in code
+    functions = ce.local_functions()
+    assert functions.count("\nfunction [") == 2 and functions.count("\nend") == 2
+    assert "\tpart0 = sin(q1) + sin(q2);\n" in functions
+
+    with pytest.raises(ValueError):
+        CodeElement(calc, max_ops=0)
+    with pytest.raises(ValueError):
+        CodeElement(calc, max_function_ops=10)
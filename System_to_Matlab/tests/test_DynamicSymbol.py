@@ -64,4 +64,15 @@ def test_DynamicSymbols_with_as_Matrix():
     assert isinstance(dss, list)
     assert isinstance(dss[0], se.Matrix)
     assert isinstance(dss[0][0], se.Function)
-    assert str(dss) == "[[x_{1}(t)]\n[\\dot{x}_{1}(t)]\n[\\ddot{x}_{1}(t)]\n[x_{1}^{(3)}(t)]\n[x_{2}(t)]\n[\\dot{x}_{2}(t)]\n[\\ddot{x}_{2}(t)]\n[x_{2}^{(3)}(t)]\n, [y_{1}(t)]\n[\\dot{y}_{1}(t)]\n[\\ddot{y}_{1}(t)]\n[y_{1}^{(3)}(t)]\n[y_{2}(t)]\n[\\dot{y}_{2}(t)]\n[\\ddot{y}_{2}(t)]\n[y_{2}^{(3)}(t)]\n, [z_{1}(t)]\n[\\dot{z}_{1}(t)]\n[\\ddot{z}_{1}(t)]\n[z_{1}^{(3)}(t)]\n[z_{2}(t)]\n[\\dot{z}_{2}(t)]\n[\\ddot{z}_{2}(t)]\n[z_{2}^{(3)}(t)]\n]"
\ No newline at end of file
+    assert str(dss) == "[[x_{1}(t)]\n[\\dot{x}_{1}(t)]\n[\\ddot{x}_{1}(t)]\n[x_{1}^{(3)}(t)]\n[x_{2}(t)]\n[\\dot{x}_{2}(t)]\n[\\ddot{x}_{2}(t)]\n[x_{2}^{(3)}(t)]\n, [y_{1}(t)]\n[\\dot{y}_{1}(t)]\n[\\ddot{y}_{1}(t)]\n[y_{1}^{(3)}(t)]\n[y_{2}(t)]\n[\\dot{y}_{2}(t)]\n[\\ddot{y}_{2}(t)]\n[y_{2}^{(3)}(t)]\n, [z_{1}(t)]\n[\\dot{z}_{1}(t)]\n[\\ddot{z}_{1}(t)]\n[z_{1}^{(3)}(t)]\n[z_{2}(t)]\n[\\dot{z}_{2}(t)]\n[\\ddot{z}_{2}(t)]\n[z_{2}^{(3)}(t)]\n]"
+
+def test_DynamicSymbol_many_variables():
+    from System_to_Matlab import SymbolRegistry, diff_t
+    with SymbolRegistry.scope() as registry:
+        [x, x_dot, x_ddot] = DynamicSymbol("x_{cell}", 5000, 2).vars
+        assert x.shape == (5000, 1)
+        assert str(x[4999]) == "x_{{cell}_{5000}}(t)"
+        assert str(x_ddot[0]) == "\\ddot{x}_{{cell}_{1}}(t)"
+        assert registry.printable(x_dot[2]) == se.Symbol("xcell3dot")
+        assert diff_t(x[10]*x_dot[11]) == x_dot[10]*x_dot[11] + x[10]*x_ddot[11]
+        assert len(registry) == 15000
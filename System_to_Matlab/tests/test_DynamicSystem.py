@@ -1,6 +1,8 @@
 import symengine as se
 import filecmp
+import pytest
 import os
+import re
 from System_to_Matlab import DynamicSymbol, StaticSymbols, diff_t, Drehmatrix, DynamicSystem
 
 def create_sys():
@@ -185,3 +187,506 @@ def test_DynamicSystem_linearize_simple():
     assert C == se.Matrix([0, 1]).T
     assert D == se.Matrix([0])
     
+
+def test_DynamicSystem_sparsity_patterns(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sys = create_pendulum()
+    patterns = sys.sparsity_patterns()
+
+    assert list(patterns["A"]) == [(0, 1), (1, 0)]
+    assert list(patterns["B"]) == [(1, 0)]
+    assert patterns["C"].row(0) == [0, 1]
+    assert patterns["D"].nnz == 0
+    A, B, C, D = sys.linearize()
+    assert [(i, j) for i in range(2) for j in range(2) if A[i, j] != 0] == list(patterns["A"])
+
+    sys.write_ABCD_to_File("ss_sparse", sparse=True)
+    with open("ss_sparse.m") as f:
+        assert "sparse([1 2], [2 1]," in f.read()
+
+
+def create_pendulum():
+    l, m, g = StaticSymbols(["l", "m", "g"])
+    [q, q_dot, q_ddot] = DynamicSymbol("q", 1, 2).vars
+    [F] = DynamicSymbol("F", 1, 0).vars
+    x = q.col_join(q_dot)
+    f = se.Matrix([q_dot[0], -g/l*se.sin(q[0])*se.cos(q[0]) + F/(m*l**2)])
+
+    sys = DynamicSystem(x, se.Matrix([F]))
+    sys.addStateEquations(f, False)
+    sys.addCalculation(se.Symbol("y"), l*se.sin(q[0])*se.cos(q[0]) + m*q_dot[0]**2)
+    sys.addOutput(se.Symbol("y"))
+    sys.addParameter([l, m, g], [1, 1, 9.81])
+    return sys
+
+def test_DynamicSystem_shared_cse(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    create_pendulum().write_SFunction("Test_separate")
+    create_pendulum().write_SFunction("Test_once", shared_cse=True)
+    create_pendulum().write_SFunction("Test_helper", shared_cse=True, cse_helper_function=True)
+
+    separate = (tmp_path / "Test_separate.m").read_text()
+    shared = (tmp_path / "Test_once.m").read_text()
+    helper = (tmp_path / "Test_helper.m").read_text()
+
+    assert "_shared(" not in separate and "_shared(" not in shared
+    assert helper.count("] = Test_helper_shared(x, u, params);") == 2
+    assert "\nfunction [" in helper
+
+    # the shared temporaries are only calculated once in the helper function
+    case1 = helper.split("case 1")[1].split("case 3")[0]
+    case3 = helper.split("case 3")[1].split("case {2,4,9}")[0]
+    assert "sin(" not in case1 and "sin(" not in case3
+    assert helper.count("sin(x(1))") == 1
+    assert shared.count("sin(x(1))") == 2
+
+def test_DynamicSystem_hoist_parameters(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    create_pendulum().write_SFunction("Test_hoisted", hoist_parameters=True)
+    hoisted = (tmp_path / "Test_hoisted.m").read_text()
+
+    assert "persistent hoisted_params hoisted_0 hoisted_1 \n" in hoisted
+    assert "\nfunction [hoisted_0, hoisted_1] = Test_hoisted_parameters(params) \n" in hoisted
+    assert "\thoisted_0 = -g./l;\n\thoisted_1 = 1./(l.^2.*m);\n" in hoisted
+    # the parameter only subexpressions are calculated in the initialization, and only again if the parameters change
+    case0 = hoisted.split("case 0")[1].split("case 1")[0]
+    case1 = hoisted.split("case 1")[1].split("case 3")[0]
+    assert "[hoisted_0, hoisted_1] = Test_hoisted_parameters(params);" in case0
+    assert "if ~isequal(hoisted_params, params)" in case1
+    assert "sys = [x(2); F.*hoisted_1 + hoisted_0.*x0];" in case1
+
+    with pytest.raises(ValueError):
+        create_pendulum().write_SFunction("Test_error", hoist_parameters=True, cse_helper_function=True)
+
+def test_DynamicSystem_hoist_parameters_names(tmp_path, monkeypatch):
+    # the first temporary of the cse (x0) is hoisted, it must not collide with the output x0 of the S-function
+    monkeypatch.chdir(tmp_path)
+    l, g = StaticSymbols(["l", "g"])
+    [q, q_dot, q_ddot] = DynamicSymbol("q", 1, 2).vars
+    [F] = DynamicSymbol("F", 1, 0).vars
+    sys = DynamicSystem(q.col_join(q_dot), se.Matrix([F]))
+    sys.addStateEquations(se.Matrix([se.sqrt(g/l)*q_dot[0], -se.sqrt(g/l)*se.sin(q[0]) + F]), False)
+    sys.addCalculation(se.Symbol("y"), q[0])
+    sys.addOutput(se.Symbol("y"))
+    sys.addParameter([l, g], [1, 9.81])
+    sys.write_SFunction("Test_hoisted", hoist_parameters=True)
+    hoisted = (tmp_path / "Test_hoisted.m").read_text()
+
+    assert "persistent hoisted_params hoisted_0 hoisted_1 \n" in hoisted
+    assert "[hoisted_0, hoisted_1] = Test_hoisted_parameters(params);" in hoisted.split("case 0")[1].split("case 1")[0]
+    assert "\thoisted_0 = sqrt(g./l);\n" in hoisted
+    assert "x0 = x_ic;" in hoisted and not re.search(r"\bx0\b", hoisted.split("x0 = x_ic;")[1])
+
+def test_DynamicSystem_specialize(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sys = create_pendulum()
+    l, m, g = StaticSymbols(["l", "m", "g"])
+
+    A, B, C, D = sys.linearize(se.Matrix([0, 0]), se.Matrix([0]), specialize=True)
+    assert A == se.Matrix([[0, 1], [-9.81, 0]])
+    assert B == se.Matrix([0, 1])
+    # the equations of the system are not changed
+    assert g in sys._State_Equations.calcs[0].free_symbols
+
+    sys.write_MFunctions("pend", specialize=True)
+    sys.write_SFunction("pend_s", specialize=True)
+    dyn = (tmp_path / "pend_dyn.m").read_text()
+    sfunction = (tmp_path / "pend_s.m").read_text()
+    assert dyn.startswith("function [xdot] = pend_dyn(x, u, params)")
+    assert "xdot = [qdot; F - 9.81*cos(q).*sin(q)];" in dyn
+    assert "params(" not in dyn and "params(" not in sfunction
+    assert "sys = [x(2); F - 9.81*cos(x(1)).*sin(x(1))];" in sfunction
+
+def test_DynamicSystem_write_MFunctions_vectorized(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sys = create_pendulum()
+    sys.write_MFunctions("pend", vectorized=True, jacobian=True)
+    dyn = (tmp_path / "pend_dyn.m").read_text()
+
+    assert "\tq = x(1,:);\n" in dyn and "\tl = params(1,:);\n" in dyn
+    assert "\tN = max([size(x, 2), size(u, 2), size(params, 2)]);\n" in dyn
+    assert "\txdot = zeros(2, N);\n\txdot(1,:) = qdot;\n" in dyn
+    assert "\t\tJ = zeros(2, 2, N);\n\t\tJ(1,2,:) = 1;\n" in dyn
+
+    with pytest.raises(ValueError):
+        sys.write_MFunctions("pend", vectorized=True, jacobian=True, jacobian_sparse=True)
+
+def test_DynamicSystem_chunked(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sys = create_sys()
+    sys.write_MFunctions("chunked", max_ops=20, max_function_ops=300)
+    sys.write_SFunction("chunked_s", max_ops=20, max_function_ops=300)
+    dyn = (tmp_path / "chunked_dyn.m").read_text()
+    sfunction = (tmp_path / "chunked_s.m").read_text()
+
+    # the temporaries are calculated in local functions at the end of the files
+    assert "] = chunked_dyn_chunk1(" in dyn.split("\nend")[0]
+    assert "\nfunction [" in dyn.split("\nend")[1]
+    assert "] = chunked_s_dyn_chunk1(" in sfunction and "\nfunction [" in sfunction
+    assert dyn.rstrip().endswith("end") and sfunction.rstrip().endswith("end")
+
+def create_chain(n):
+    m, c, c3 = StaticSymbols(["m", "c", "c_3"])
+    [q, q_dot, q_ddot] = DynamicSymbol("q", n, 2).vars
+    [F] = DynamicSymbol("F", 1, 0).vars
+    springs = [c*(q[i + 1] - q[i]) + c3*(q[i + 1] - q[i])**3 for i in range(n - 1)]
+    forces = [(springs[i] if i < n - 1 else F) - (springs[i - 1] if i > 0 else 0) for i in range(n)]
+
+    sys = DynamicSystem(q.col_join(q_dot), se.Matrix([F]))
+    sys.addStateEquations(q_dot.col_join(se.Matrix(forces)/m), False)
+    sys.addCalculation(se.Symbol("energy"), sum(m*v**2/2 for v in q_dot))
+    sys.addOutput(se.Symbol("energy"))
+    sys.addParameter([m, c, c3], [1, 10, 1])
+    return sys
+
+@pytest.mark.parametrize("reroll", ["for", "slice"])
+def test_DynamicSystem_write_MFunctions_reroll_jacobian(tmp_path, monkeypatch, reroll):
+    monkeypatch.chdir(tmp_path)
+    create_chain(8).write_MFunctions("chain", reroll=reroll, jacobian=True)
+    dyn = (tmp_path / "chain_dyn.m").read_text()
+    assert "tmp = zeros(" in dyn
+
+    # the temporaries used by the jacobian are assigned before, although the others are stored in tmp
+    before, jacobian = dyn.split("if nargout > 1")
+    used = set(re.findall(r"\bx\d+\b", jacobian))
+    assigned = set(re.findall(r"^\s*(x\d+) = ", dyn, re.M))
+    assert used and used <= assigned
+    assert re.search(r"^\s*x0 = tmp\(\d+\);$", before, re.M)
+
+def test_DynamicSystem_write_MFunctions_jacobian(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sys = create_pendulum()
+    sys.write_MFunctions("pend", jacobian=True)
+
+    with open("pend_dyn.m") as f:
+        dyn = f.read()
+    assert dyn.startswith("function [xdot, J] = pend_dyn(x, u, params)")
+    # J reuses the temporaries of xdot and is only calculated if it is requested
+    assert "\tif nargout > 1\n\t\tJ = [0 1; x0.^2.*x2 - x1.^2.*x2 0];\n\tend\n" in dyn
+    with open("pend_jac.m") as f:
+        assert "[~, J] = pend_dyn(x, u, params);" in f.read()
+    with open("pend_jpattern.m") as f:
+        assert "S = sparse([1 2], [2 1], [1, 1], 2, 2);" in f.read()
+
+    sys.write_MFunctions("pend_sparse", jacobian=True, jacobian_sparse=True)
+    with open("pend_sparse_dyn.m") as f:
+        assert "J = sparse([1 2], [2 1], [1, x0.^2.*x2 - x1.^2.*x2], 2, 2);" in f.read()
+
+
+def test_DynamicSystem_write_PyFunctions(tmp_path):
+    import importlib.util
+    import numpy as np
+
+    sys = create_sys()
+    sys.write_PyFunctions("Test", str(tmp_path))
+    functions = {}
+    for name in ["Test_dyn", "Test_out"]:
+        spec = importlib.util.spec_from_file_location(name, tmp_path / (name + ".py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        functions[name] = getattr(module, name)
+
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0.5, 1.5, (5, 6))
+    u = rng.uniform(-1, 1, (5, 3))
+    params = np.array([p[1] for p in sys._Parameters])
+
+    xdot = functions["Test_dyn"](x, u, params)
+    y = functions["Test_out"](x, params)
+    assert xdot.shape == (5, 6)
+    assert y.shape == (5, len(sys.y))
+    assert functions["Test_dyn"](x[0], u[0], params).shape == (6,)
+
+    for k in range(5):
+        subs = dict(zip(list(sys.x) + list(sys.u) + [p[0] for p in sys._Parameters], list(x[k]) + list(u[k]) + list(params)))
+        assert xdot[k] == pytest.approx([float(e) for e in sys._State_Equations.calcs[0].subs(subs)])
+        assert y[k] == pytest.approx([float(e) for e in sys.y.subs(subs)])
+
+def test_DynamicSystem_write_PyFunctions_one_state(tmp_path):
+    # one state, one output and no parameters: the results keep their vector dimension
+    import importlib.util
+    import numpy as np
+
+    [x] = DynamicSymbol("x", 1, 1).vars[0]
+    [F] = DynamicSymbol("F", 1, 0).vars
+    sys = DynamicSystem(se.Matrix([x]), se.Matrix([F]))
+    sys.addStateEquations(se.Matrix([-x + se.sin(F)]), False)
+    sys.addCalculation(se.Symbol("y"), x**2)
+    sys.addOutput(se.Symbol("y"))
+    sys.write_PyFunctions("One", str(tmp_path))
+    functions = {}
+    for name in ["One_dyn", "One_out"]:
+        spec = importlib.util.spec_from_file_location(name, tmp_path / (name + ".py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        functions[name] = getattr(module, name)
+
+    states = np.array([[0.5], [1.0], [2.0]])
+    xdot = functions["One_dyn"](states, np.ones((3, 1)), [])
+    assert xdot.shape == (3, 1)
+    assert xdot[:, 0] == pytest.approx(-states[:, 0] + np.sin(1.0))
+    assert functions["One_dyn"](states[0], [1.0], []).shape == (1,)
+    assert functions["One_out"](states, np.zeros((3, 0))).shape == (3, len(sys.y))
+
+def test_DynamicSystem_compile():
+    import numpy as np
+
+    sys = create_sys()
+    compiled = sys.compile()
+    assert sys.compile() is compiled
+
+    rng = np.random.default_rng(1)
+    x = rng.uniform(0.5, 1.5, (4, 6))
+    u = rng.uniform(-1, 1, (4, 3))
+    params = np.array([p[1] for p in sys._Parameters])
+    f = sys._State_Equations.calcs[0]
+    symbols = list(sys.x) + list(sys.u) + [p[0] for p in sys._Parameters]
+
+    xdot = compiled.f(x, u)
+    y = compiled.y(x, u, params)
+    dfdx = compiled.dfdx(x, u)
+    assert xdot.shape == (4, 6) and y.shape == (4, len(sys.y)) and dfdx.shape == (4, 6, 6)
+    assert compiled.dydu(x, u).shape == (4, len(sys.y), 3)
+
+    k = 2
+    subs = dict(zip(symbols, list(x[k]) + list(u[k]) + list(params)))
+    assert xdot[k] == pytest.approx([float(e) for e in f.subs(subs)])
+    assert y[k] == pytest.approx([float(e) for e in sys.y.subs(subs)])
+    assert dfdx[k].ravel() == pytest.approx([float(e) for e in f.jacobian(sys.x).subs(subs)])
+
+    # output buffers are used without copying
+    out = np.empty((4, 6))
+    assert np.shares_memory(compiled.f.evaluate(np.concatenate([x, u, np.broadcast_to(params, (4, len(params)))], axis=1), out), out)
+
+    sys.addParameter(StaticSymbols(["extra"]), [1.0])
+    assert sys.compile() is not compiled
+
+def test_DynamicSystem_linearize_batch(tmp_path):
+    import numpy as np
+
+    sys = create_sys()
+    rng = np.random.default_rng(2)
+    x_ss = rng.uniform(0.5, 1.5, (10, 6))
+    u_ss = rng.uniform(-1, 1, (10, 3))
+    A, B, C, D = sys.linearize_batch(x_ss, u_ss, file=str(tmp_path / "table.npz"))
+    p = len(sys.y)
+    assert A.shape == (10, 6, 6) and B.shape == (10, 6, 3) and C.shape == (10, p, 6) and D.shape == (10, p, 3)
+
+    k = 3
+    A_k, B_k, C_k, D_k = sys.linearize(se.Matrix(list(x_ss[k])), se.Matrix(list(u_ss[k])))
+    subs = {p[0]: p[1] for p in sys._Parameters}
+    for numeric, symbolic in [(A, A_k), (B, B_k), (C, C_k), (D, D_k)]:
+        assert numeric[k].ravel() == pytest.approx([float(e) for e in symbolic.subs(subs)])
+
+    table = np.load(tmp_path / "table.npz")
+    assert table["A"] == pytest.approx(A)
+    assert table["x_ss"] == pytest.approx(x_ss)
+
+    loadmat = pytest.importorskip("scipy.io").loadmat
+    sys.linearize_batch(x_ss, u_ss, file=str(tmp_path / "table.mat"))
+    assert loadmat(str(tmp_path / "table.mat"))["D"] == pytest.approx(D)
+
+def run_CSFunction(path, name, params, x_ic, x, u, flags=()):
+    """ Compiles the generated C-MEX SFunction with the stub simstruc.h (and the additional compiler flags) and returns (x0, dx, y) """
+    import shutil
+    import subprocess
+    gcc = shutil.which("gcc")
+    if gcc is None:
+        pytest.skip("gcc is not available")
+    stubs = os.path.join(os.path.dirname(__file__), "stubs")
+    exe = str(path / name)
+    subprocess.run([gcc, "-std=c99", "-Wall", "-Werror", "-I", str(path), "-I", stubs, f'-DSFUNCTION_SOURCE="{name}.c"',
+                    os.path.join(stubs, "sfunction_harness.c"), "-lm", "-o", exe, *flags], check=True)
+    values = " ".join(f"{len(v)} " + " ".join(repr(float(e)) for e in v) for v in [params, x_ic, x, u])
+    out = subprocess.run([exe], input=values, capture_output=True, text=True, check=True).stdout
+    return [[float(e) for e in line.split()] for line in out.splitlines()]
+
+def create_pendulum_vector():
+    # vector intermediate variable in the output calculations
+    sys = create_pendulum()
+    sys.addCalculation(se.Symbol("v"), se.Matrix([se.sin(sys.x[0]), sys.x[1]**2]))
+    return sys
+
+def output_values(sys, x, u):
+    """ the compiled values of the outputs (the last calculation of every output) """
+    values = sys.compile().y(x, u)
+    positions = {}
+    k = 0
+    for var in sys._Outputs_Calcs._vars:
+        for v in var:
+            positions[v] = k
+            k += 1
+    return [values[positions[output]] for output in sys._Outputs]
+
+@pytest.mark.parametrize("create", [create_pendulum, create_sys, create_pendulum_vector])
+@pytest.mark.parametrize("hoist_parameters", [True, False])
+def test_DynamicSystem_write_CSFunction(tmp_path, monkeypatch, create, hoist_parameters):
+    import numpy as np
+    monkeypatch.chdir(tmp_path)
+
+    sys = create()
+    sys.write_CSFunction("sfun", hoist_parameters=hoist_parameters)
+    code = (tmp_path / "sfun.c").read_text()
+    assert "#define S_FUNCTION_NAME sfun" in code and "mdlDerivatives" in code
+    assert ("    /* parameter dependent temporaries */" in code) == hoist_parameters
+
+    rng = np.random.default_rng(3)
+    n, m = len(sys.x), len(sys._u)
+    params = [p[1] for p in sys._Parameters]
+    x, u = rng.uniform(0.5, 1.5, n), rng.uniform(-1, 1, m)
+    # the vector intermediate is declared but not used by the outputs
+    flags = ["-Wno-unused-but-set-variable"] if create is create_pendulum_vector else []
+    x0, dx, y = run_CSFunction(tmp_path, "sfun", params, list(range(n)), x, u, flags)
+    compiled = sys.compile()
+    assert x0 == pytest.approx(list(range(n)))
+    assert dx == pytest.approx(compiled.f(x, u))
+    assert y == pytest.approx(output_values(sys, x, u))
+
+def test_DynamicSystem_write_CSFunction_specialize(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    sys = create_pendulum()
+    sys.write_CSFunction("sfun", specialize=True)
+    code = (tmp_path / "sfun.c").read_text()
+    assert "#define NUM_PARAMS 0" in code and "9.81" in code
+    x0, dx, y = run_CSFunction(tmp_path, "sfun", [], [0.0, 0.0], [0.3, 0.4], [0.5])
+    assert dx == pytest.approx(list(sys.compile().f([0.3, 0.4], [0.5])))
+
+def test_DynamicSystem_write_Level2SFunction(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    sys = create_pendulum()
+    sys.write_Level2SFunction("sfun")
+    code = (tmp_path / "sfun.m").read_text()
+    assert code.startswith("function sfun(block)")
+    assert "block.RegBlockMethod('Start', @Start);" in code
+    assert "block.Dwork(1).Dimensions = 5;" in code
+    assert "block.Dwork(1).Data = [params(:); hoisted_0; hoisted_1];" in code
+    assert "hoisted_0 = -g./l;" in code.split("function Start")[1].split("function Derivatives")[0]
+    derivatives = code.split("function Derivatives")[1].split("function Outputs")[0]
+    assert "hoisted_0 = work(4);" in derivatives and "l.^2" not in derivatives
+    assert "block.Derivatives.Data = sys;" in derivatives
+
+    sys = create_pendulum()
+    sys.write_Level2SFunction("sfun_plain", hoist_parameters=False)
+    code = (tmp_path / "sfun_plain.m").read_text()
+    assert "block.Dwork(1).Dimensions = 3;" in code and "block.Dwork(1).Data = [params(:)];" in code
+
+def test_DynamicSystem_write_CFunctions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    sys = create_pendulum()
+    sys.write_CFunctions("pend", batch=True)
+    code = (tmp_path / "pend_dyn.c").read_text()
+    assert "void pend_dyn(const double *x, const double *u, const double *p, double *xdot)" in code
+    assert "const double q = x[0];" in code and "xdot[1] = " in code
+    assert "void pend_dyn_batch(long n, " in (tmp_path / "pend_dyn.h").read_text()
+    assert "double *y)" in (tmp_path / "pend_out.c").read_text()
+
+    sys.write_CFunctions("pend32", single_precision=True)
+    code = (tmp_path / "pend32_dyn.c").read_text()
+    assert "void pend32_dyn(const float *x, const float *u, const float *p, float *xdot)" in code
+    assert "cosf(q)" in code and "double" not in code
+
+@pytest.mark.parametrize("create", [create_pendulum, create_sys])
+def test_DynamicSystem_compile_C(tmp_path, create):
+    import shutil
+    import numpy as np
+    if shutil.which("cc") is None and shutil.which("gcc") is None:
+        pytest.skip("no C compiler available")
+
+    sys = create()
+    f, y = sys.compile_C(str(tmp_path))
+    compiled = sys.compile()
+    rng = np.random.default_rng(4)
+    x = rng.uniform(-1, 1, (7, len(sys.x)))
+    u = rng.uniform(-1, 1, (7, len(sys.u)))
+    assert f(x, u) == pytest.approx(compiled.f(x, u), rel=1e-12, abs=1e-12)
+    assert y(x, u) == pytest.approx(compiled.y(x, u), rel=1e-12, abs=1e-12)
+    assert f(x[2], u[2]) == pytest.approx(compiled.f(x[2], u[2]))
+
+    # parameters per point
+    params = np.array([[p[1] for p in sys._Parameters]] * 7)
+    params[3] *= 1.5
+    assert f(x, u, params)[3] == pytest.approx(compiled.f(x[3], u[3], params[3]))
+
+    (tmp_path / "single").mkdir()
+    f32, _ = sys.compile_C(str(tmp_path / "single"), single_precision=True)
+    assert f32(x, u).dtype == np.float32
+    assert f32(x, u) == pytest.approx(compiled.f(x, u), rel=1e-4, abs=1e-3)
+
+def test_DynamicSystem_simulate():
+    import numpy as np
+    scipy_integrate = pytest.importorskip("scipy.integrate")
+
+    sys = create_pendulum()
+    compiled = sys.compile()
+    t_eval = np.linspace(0, 3, 7)
+    reference = scipy_integrate.solve_ivp(lambda t, x: compiled.f(x, [np.sin(t)]), (0, 3), [1.0, 0.0], rtol=1e-11, atol=1e-12,
+                                          t_eval=t_eval).y.T
+    u = lambda t: [np.sin(t)]
+
+    result = sys.simulate((0, 3), [1.0, 0.0], u, t_eval=t_eval)
+    assert result.t == pytest.approx(t_eval)
+    assert result.x == pytest.approx(reference, abs=1e-5)
+    assert result.y[:, 0] == pytest.approx(compiled.y(result.x, np.sin(t_eval)[:, None])[:, 0])
+
+    assert sys.simulate((0, 3), [1.0, 0.0], u, method="rk4", dt=0.01, t_eval=t_eval).x == pytest.approx(reference, abs=1e-7)
+    result = sys.simulate((0, 3), [1.0, 0.0], u, method="rosenbrock", t_eval=t_eval)
+    assert result.x == pytest.approx(reference, abs=1e-4) and result.stats["jacobian"] > 0
+
+    steps = sys.simulate((0, 3), [1.0, 0.0], method="rk4", dt=0.1)
+    assert len(steps.t) == 31 and steps.x.shape == (31, 2)
+    with pytest.raises(ValueError):
+        sys.simulate((0, 3), [1.0, 0.0], method="rk4")
+
+def test_DynamicSystem_simulate_late_t_eval():
+    # x0 is the state at t_span[0], only the states at t_eval are returned
+    import numpy as np
+    sys = create_pendulum()
+    for method, dt in [("rk45", None), ("rk4", 0.01), ("rosenbrock", None)]:
+        full = sys.simulate((0, 2), [1.0, 0.0], method=method, dt=dt, t_eval=[0, 1, 2])
+        late = sys.simulate((0, 2), [1.0, 0.0], method=method, dt=dt, t_eval=[1, 2])
+        assert late.t == pytest.approx([1, 2])
+        assert late.x.shape == (2, 2)
+        assert late.x == pytest.approx(full.x[1:], abs=1e-4)
+        assert late.y[:, 0] == pytest.approx(full.y[1:, 0], abs=1e-4)
+
+def test_DynamicSystem_simulate_ensemble():
+    import numpy as np
+
+    sys = create_pendulum()
+    rng = np.random.default_rng(5)
+    x0 = rng.uniform(-1, 1, (6, 2))
+    params = np.array([[1.0, 1.0, 9.81]]*6)
+    params[:, 0] = np.linspace(0.5, 2.0, 6)
+    t_eval = np.linspace(0, 2, 5)
+
+    result = sys.simulate((0, 2), x0, [0.2], params, t_eval=t_eval, rtol=1e-10, atol=1e-12)
+    assert result.x.shape == (5, 6, 2)
+    for k in [0, 4]:
+        single = sys.simulate((0, 2), x0[k], [0.2], params[k], t_eval=t_eval, rtol=1e-10, atol=1e-12)
+        assert result.x[:, k] == pytest.approx(single.x, abs=1e-8)
+
+    fixed = sys.simulate((0, 2), x0, [0.2], params, method="rk4", dt=0.01, t_eval=t_eval)
+    pooled = sys.simulate((0, 2), x0, [0.2], params, method="rk4", dt=0.01, t_eval=t_eval, n_workers=2)
+    assert pooled.x == pytest.approx(fixed.x, rel=1e-12, abs=1e-12)
+    with pytest.raises(ValueError):
+        sys.simulate((0, 2), x0, n_workers=2)
+
+def test_DynamicSystem_simulate_stiff():
+    import numpy as np
+
+    [x, x_dot] = DynamicSymbol("x", 2, 1).vars
+    [u] = DynamicSymbol("u", 1, 0).vars
+    [k] = StaticSymbols(["k"])
+    sys = DynamicSystem(x, se.Matrix([u]))
+    sys.addStateEquations(se.Matrix([-k*(x[0] - se.cos(x[1])), 1]), False)
+    sys.addParameter([k], [1000.0])
+
+    exact = np.cos(10) + 1000*np.sin(10)/(1000**2 + 1)
+    explicit = sys.simulate((0, 10), [0.0, 0.0], method="rk45", rtol=1e-4, atol=1e-6)
+    implicit = sys.simulate((0, 10), [0.0, 0.0], method="rosenbrock", rtol=1e-4, atol=1e-6)
+    assert implicit.x[-1, 0] == pytest.approx(exact, abs=1e-3)
+    assert explicit.x[-1, 0] == pytest.approx(exact, abs=1e-3)
+    assert implicit.stats["steps"] < explicit.stats["steps"]/2
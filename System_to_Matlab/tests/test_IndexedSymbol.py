@@ -0,0 +1,80 @@
+import pytest
+import symengine as se
+from System_to_Matlab import IndexedSymbol, RangeEquations, DynamicSystem, DynamicSymbol, StaticSymbols, SymbolRegistry
+
+
+def create_rod(n, registry):
+    T = IndexedSymbol("T", n)
+    [a] = DynamicSymbol("a").vars
+    [Q] = DynamicSymbol("Q").vars
+    c, k = StaticSymbols(["c", "k"])
+    i = se.Symbol("i")
+    f = RangeEquations(n + 1)
+    f.set(1, c*(T[2] - T[1]) + Q)
+    f.set_range(i, 2, n - 1, c*(T[i - 1] - 2*T[i] + T[i + 1]) + k*se.sin(T[i]))
+    f.set(n, c*(T[n - 1] - T[n]))
+    f.set(n + 1, T[n] - a)
+    sys = DynamicSystem(T.vars.col_join(se.Matrix([a])), se.Matrix([Q]))
+    sys.addParameter([c, k], [1, 2])
+    sys.addStateEquations(f)
+    return T, sys
+
+def test_IndexedSymbol():
+    with SymbolRegistry.scope() as registry:
+        T = IndexedSymbol("T", 3, 1)
+        [x, x_dot] = DynamicSymbol("T", 3, 1).vars
+        i = se.Symbol("i")
+        assert len(T) == 3
+        assert T[2] == x[1] and T.at(3, 1) == x_dot[2]
+        assert T.vars[0] == x
+        assert T[i - 1] == se.Function("T")(i - 1)
+        assert T.array_name(1) == "Tdot"
+        assert registry.array("Tdot") == x_dot
+        assert registry.array_element(x[2]) == ("T", 3)
+        with pytest.raises(IndexError):
+            T[4]
+
+def test_RangeEquations():
+    with SymbolRegistry.scope():
+        T = IndexedSymbol("T", 4)
+        i = se.Symbol("i")
+        f = RangeEquations(4)
+        f.set(1, T[1])
+        f.set_range(i, 2, 4, i*T[i - 1])
+        assert f.expand() == se.Matrix([T[1], 2*T[1], 3*T[2], 4*T[3]])
+        assert f.arrays() == {"T"}
+        with pytest.raises(ValueError):
+            f.set(3, T[3])
+        g = RangeEquations(3)
+        g.set_range(i, 1, 3, T[i + 1])
+        assert g.expand()[2] == T[4]
+        g = RangeEquations(4)
+        g.set_range(i, 1, 4, T[i + 1])
+        with pytest.raises(IndexError):
+            g.expand()
+        with pytest.raises(ValueError):
+            RangeEquations(2).expand()
+
+def test_write_MFunctions_loops(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with SymbolRegistry.scope() as registry:
+        T, sys = create_rod(50, registry)
+        sys.write_MFunctions("rod")
+        code = (tmp_path / "rod_dyn.m").read_text()
+        assert "\tT = x(1:50);\n" in code
+        assert "\tfor i = 2:49\n" in code
+        assert "\t\txdot(i) = c.*(T(i + 1) + T(i - 1) - 2*T(i)) + k.*sin(T(i));\n" in code
+        assert "\txdot(51) = T50 - a;\n" in code
+        # only the variables used outside of the loop are unpacked
+        assert "T1 = x(1);" in code and "T3 = x(3);" not in code
+        unrolled = len(code)
+
+        sys.write_MFunctions("rod", loops="slice")
+        code = (tmp_path / "rod_dyn.m").read_text()
+        assert "\txdot(2:49) = c.*(T(1:48) - 2*T(2:49) + T(3:50)) + k.*sin(T(2:49));\n" in code
+
+        sys.write_MFunctions("rod", loops=None)
+        assert len((tmp_path / "rod_dyn.m").read_text()) > 5*unrolled
+        # the other functions use the expanded equations
+        sys.linearize()
+        assert sys.A.shape == (51, 51) and sys.A[1, 0] == se.Symbol("c")
@@ -0,0 +1,33 @@
+from System_to_Matlab.Printers import MatlabPrinter, matlab_code
+import pytest
+import symengine as se
+import sympy as sp
+
+x, y, z = se.symbols("x y z")
+
+@pytest.mark.parametrize("expr", [
+    x - y, -x, 1/x, 1/(x*y), se.sqrt(x), 1/se.sqrt(x), 2*x/3, x/2, x**2/y**3, -2/x, se.sin(x)**2,
+    x**(y + 1), (x + y)**2, se.exp(x), se.pi*x, se.Abs(x), x < y, -x + y - 3, se.I*x, -x*y, x**-2,
+    se.sqrt(2)*x, 2**x, x/(y + z), (x + y)/z, x**y**z, (x**y)**z, se.Rational(-1, 2), x*y/(2*z),
+    se.Piecewise((x, x < 0), (y, True)), se.Max(x, y, z), se.And(x < y, y < z), -se.sin(x)/y**2, 1/(x**3*y),
+    (-2)**x, x**se.Rational(2, 3), -5*x**se.Rational(-3, 2),
+])
+def test_matlab_code_equals_octave_code(expr):
+    assert matlab_code(expr) == sp.octave_code(expr)
+
+def test_matlab_code_matrix():
+    assert matlab_code(se.Matrix([[x, -y], [0, 1]])) == "[x -y; 0 1]"
+    assert matlab_code(se.Matrix([x, y])) == "[x; y]"
+    assert matlab_code(se.Matrix([[x + y]])) == "x + y"
+    assert matlab_code(se.zeros(0, 2)) == "zeros(0, 2)"
+
+def test_matlab_code_float_and_relational():
+    assert matlab_code(se.Float(1.5)*x) == "1.5*x"
+    assert matlab_code(se.Ne(x, y)) == "x ~= y"
+
+def test_MatlabPrinter_memoization():
+    printer = MatlabPrinter()
+    expr = se.cos(x + y)
+    assert printer.doprint(expr) == "cos(x + y)"
+    assert x + y in printer._memo
+    assert printer.doprint(se.Matrix([expr, -expr])) == "[cos(x + y); -cos(x + y)]"
@@ -0,0 +1,34 @@
+from System_to_Matlab.Printers import NumPyPrinter, numpy_code
+import numpy as np
+import pytest
+import symengine as se
+
+x, y, z = se.symbols("x y z")
+values = {x: 0.7, y: 1.3, z: 2.1}
+
+@pytest.mark.parametrize("expr", [
+    x - y, -x, 1/x, 1/(x*y), se.sqrt(x), 1/se.sqrt(x), 2*x/3, x/2, x**2/y**3, -2/x, se.sin(x)**2,
+    x**(y + 1), (x + y)**2, se.exp(x), se.pi*x, se.Abs(x - y), -x + y - 3, -x*y, x**-2,
+    se.sqrt(2)*x, 2**x, x/(y + z), (x + y)/z, x**y**z, (x**y)**z, x*y/(2*z), se.atan2(x, y),
+    -se.sin(x)/y**2, 1/(x**3*y), x**se.Rational(2, 3), -5*x**se.Rational(-3, 2), se.asin(x)*se.E,
+])
+def test_numpy_code_values(expr):
+    code = numpy_code(expr)
+    value = eval(code, {"np": np}, {str(k): v for k, v in values.items()})
+    assert value == pytest.approx(float(expr.subs(values)))
+
+def test_numpy_code_arrays():
+    code = numpy_code(se.Piecewise((x, x < 0), (y, True)) + se.Max(x, y))
+    value = eval(code, {"np": np}, {"x": np.array([-1.0, 1.0]), "y": np.array([2.0, 0.5])})
+    assert value == pytest.approx([1.0, 1.5])
+    code = numpy_code(se.Piecewise((1, se.And(x < y, y < z)), (0, True)))
+    value = eval(code, {"np": np}, {"x": np.array([0.0, 2.0]), "y": 1.0, "z": 3.0})
+    assert value == pytest.approx([1.0, 0.0])
+
+def test_numpy_code_special():
+    assert numpy_code(se.Matrix([[x, -y], [0, 1]])) == "np.array([[x, -y], [0, 1]])"
+    assert numpy_code(se.Symbol("lambda")*x) == "lambda_*x"
+    assert numpy_code(se.Ne(x, y)) == "x != y"
+    assert numpy_code(se.I*x) == "1j*x"
+    with pytest.raises(TypeError):
+        NumPyPrinter().doprint(se.gamma(x))
@@ -0,0 +1,69 @@
+import os
+import tracemalloc
+
+import symengine as se
+from System_to_Matlab import Profiler, StaticSystem, StaticSymbols
+from System_to_Matlab.Instrumentation import stage, add_listener, remove_listener, is_active, count_ops
+
+
+def create_static():
+    x, y = StaticSymbols(["x", "y"])
+    sys = StaticSystem()
+    sys.addInput(se.Matrix([x, y]), "in")
+    sys.addCalculation(se.Symbol("a"), se.sin(x)*y + se.sin(x)**2)
+    sys.addCalculation(se.Symbol("b"), se.sin(x)*y - se.cos(y))
+    sys.addOutput(se.Symbol("a"))
+    sys.addOutput(se.Symbol("b"))
+    return sys
+
+def test_Profiler_write_MFunctions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with Profiler() as profiler:
+        create_static().write_MFunctions("static")
+    report = profiler.report
+    for name in ["Calculation.addCalculation", "StaticSystem.write_MFunctions", "MFunction.generateFile",
+                 "MFunction.generateCode", "MFunction.write", "CodeElement.cse", "CodeElement.print"]:
+        assert name in report
+    assert report["StaticSystem.write_MFunctions"].calls == 1
+    assert report["Calculation.addCalculation"].calls >= 2
+    cse = report["CodeElement.cse"].values
+    assert 0 < cse["ops_after"] <= cse["ops_before"]
+    assert report["CodeElement.cse"].ratios["ops_ratio"] == cse["ops_after"]/cse["ops_before"]
+    assert report["MFunction.write"].values["bytes"] == os.path.getsize("static.m")
+    assert report["MFunction.generateFile"].peak_kb is None
+    assert report.to_dict()["MFunction.generateFile"]["calls"] == 1
+    assert "MFunction.generateFile" in report.table(sort="time")
+    assert not is_active()
+
+def test_Profiler_memory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with Profiler(memory=True) as profiler:
+        create_static().write_MFunctions("static")
+    report = profiler.report
+    assert not tracemalloc.is_tracing()
+    # the peak of a stage contains the peaks of the nested stages
+    assert report["StaticSystem.write_MFunctions"].peak_kb >= report["MFunction.generateFile"].peak_kb > 0
+    assert report["MFunction.generateFile"].peak_kb >= report["CodeElement.print"].peak_kb
+
+def test_stage_listener():
+    events = []
+    with stage("inactive") as s:
+        assert not s.active
+    add_listener(events.append)
+    try:
+        with stage("outer") as outer:
+            with stage("inner") as inner:
+                inner.record(count=2)
+            outer.record(count=1)
+            outer.record(count=1)
+    finally:
+        remove_listener(events.append)
+    assert [e.name for e in events] == ["inner", "outer"]
+    assert events[1].values == {"count": 2}
+    assert events[1].duration >= events[0].duration
+    assert events[0].peak_kb is None
+
+def test_count_ops():
+    x, y = se.symbols("x y")
+    assert count_ops([x*y + se.sin(x), se.Matrix([x + 1, x*y]), None]) == 5
+    assert count_ops([]) == 0
@@ -26,7 +26,10 @@ def test_StaticSymbols_standard():
     ss = StaticSymbols(["x","y","z"])
     assert isinstance(ss, list)
     assert isinstance(ss[0], se.Symbol)
-    
 
-    
-    
\ No newline at end of file
+def test_SymbolicMatrix():
+    from System_to_Matlab.HelperFunctions import SymbolicMatrix
+    A = SymbolicMatrix("A", 2, 3)
+    assert A.shape == (2, 3)
+    assert A[1, 2] == se.Symbol("A_{12}")
+    assert A[0, 1] == se.Symbol("A_{01}")
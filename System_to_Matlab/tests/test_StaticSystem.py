@@ -79,4 +79,46 @@ def test_write_MFunctions():
 #     sys.addOutput(x**2, 'y')
 #     sys.addAdditionalEquation(x**2 + u, 'x')
 #     sys.write_init_File('test_init_File')
-#     # TODO: add assertions for file existence and content
\ No newline at end of file
+#     # TODO: add assertions for file existence and content
+
+
+def test_compile():
+    import numpy as np
+    import pytest
+
+    sys = StaticSystem(inline=False)
+    sys.addInput(se.Matrix([in1, in2]), "u")
+    sys.addInput(in3, "v")
+    sys.addCalculation(x, in1*in2)
+    sys.addCalculation(y, se.sin(x) + in3)
+    sys.addOutput(x, "out_1")
+    sys.addOutput(y**2, "out_2")
+
+    compiled = sys.compile()
+    assert sys.compile() is compiled
+    u = np.array([[1.0, 2.0], [0.5, -1.0], [2.0, 0.1]])
+    v = np.array([[0.3], [0.1], [-0.2]])
+    out = compiled.y(u, v)
+    assert out.shape == (3, 2)
+    assert out[:, 0] == pytest.approx(u[:, 0]*u[:, 1])
+    assert out[:, 1] == pytest.approx((np.sin(u[:, 0]*u[:, 1]) + v[:, 0])**2)
+    jac = compiled.dydu(u, v)
+    assert jac.shape == (3, 2, 3)
+    assert jac[:, 0, :] == pytest.approx(np.stack([u[:, 1], u[:, 0], 0*u[:, 0]], axis=-1))
+
+    sys.addOutput(in3, "out_3")
+    assert sys.compile() is not compiled
+    assert sys.compile().y(u, v).shape == (3, 3)
+
+def test_write_MFunctions_not_inlined(tmp_path, monkeypatch):
+    # temporaries which use a kept intermediate variable are calculated after it
+    monkeypatch.chdir(tmp_path)
+    sys = StaticSystem(inline=False)
+    sys.addInput(se.Matrix([in1, in2]), "u")
+    sys.addCalculation(x, in1 + in2)
+    sys.addCalculation(y, se.sin(x)**2 + se.sin(x)*in2 + se.sin(x)**3)
+    sys.addOutput(y, "out")
+    sys.write_MFunctions("not_inlined")
+    code = (tmp_path / "not_inlined.m").read_text()
+
+    assert "\tx = in1 + in2;\n\tx0 = sin(x);\n\ty = in2.*x0 + x0.^2 + x0.^3;\n" in code
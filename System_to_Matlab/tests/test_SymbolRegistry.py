@@ -0,0 +1,56 @@
+import pytest
+import symengine as se
+from System_to_Matlab import DynamicSymbol, StaticSymbols, StaticSystem, SymbolRegistry, diff_t
+from System_to_Matlab.Symbols import current_registry
+from System_to_Matlab.Symbols.Symbol import Symbol
+
+
+def test_SymbolRegistry_scope():
+    outer = StaticSymbols(["a_{outer}"])[0]
+    global_size = len(current_registry())
+    with SymbolRegistry.scope() as registry:
+        assert current_registry() is registry
+        [q, q_dot] = DynamicSymbol("q_{scoped}", 2, 1).vars
+        assert len(registry) == 4
+        assert registry.to_printable(q[0]*outer + q_dot[1]) == se.Symbol("qscoped1")*se.Symbol("aouter") + se.Symbol("qscoped2dot")
+        assert diff_t(q[0]**2) == 2*q[0]*q_dot[0]
+        assert q[0] not in Symbol._Symbol_to_printable_dict
+    assert current_registry() is not registry
+    assert len(current_registry()) == global_size
+    assert q[0] not in current_registry()
+    assert current_registry().to_printable(q[0]) == q[0]
+    # the derivative substitution was released as well
+    assert diff_t(q[0]) != q_dot[0]
+
+def test_SymbolRegistry_printable_subs_only_uses_atoms():
+    with SymbolRegistry.scope() as registry:
+        x, y, z = StaticSymbols(["x_{s}", "y_{s}", "z_{s}"])
+        assert registry.printable_subs(se.sin(x)*y) == {x: se.Symbol("xs"), y: se.Symbol("ys")}
+        assert registry.printable_subs(se.Matrix([x, 1]), [z]) == {x: se.Symbol("xs"), z: se.Symbol("zs")}
+        registry.release([y])
+        assert y not in registry and x in registry
+
+def test_SymbolRegistry_generation_in_scope(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def write(name):
+        x, y = StaticSymbols(["x", "y"])
+        sys = StaticSystem()
+        sys.addInput(se.Matrix([x, y]), "in")
+        sys.addCalculation(se.Symbol("a"), se.sin(x)*y + se.sin(x)**2)
+        sys.addOutput(se.Symbol("a"))
+        sys.write_MFunctions(name)
+        return (tmp_path / (name + ".m")).read_text()
+
+    expected = write("same")
+    with SymbolRegistry.scope():
+        assert write("same") == expected
+
+def test_SymbolRegistry_scope_order():
+    first = SymbolRegistry.scope()
+    second = SymbolRegistry(first)
+    with first:
+        second.__enter__()
+        with pytest.raises(RuntimeError):
+            first.__exit__(None, None, None)
+        second.__exit__(None, None, None)
@@ -0,0 +1,59 @@
+""" Evaluations per second of the generated C functions (DynamicSystem.compile_C) compared with the symengine
+evaluators of DynamicSystem.compile.
+
+Usage: python benchmarks/c_functions.py [n_masses] [n_points]
+
+The model is a chain of n masses connected by nonlinear (cubic) springs and dampers, the force acts on the last mass.
+"""
+import sys
+import time
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from models import mass_chain, build_dynamic
+
+
+def best_time(function, repeat: int = 3) -> float:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    points = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+
+    system = build_dynamic(mass_chain(n))
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-1, 1, (points, 2*n))
+    u = rng.uniform(-1, 1, (points, 1))
+
+    start = time.perf_counter()
+    f_c, _ = system.compile_C()
+    compile_c = time.perf_counter() - start
+    f_c32, _ = system.compile_C(single_precision=True)
+    start = time.perf_counter()
+    compiled = system.compile()
+    compiled.f(x[0], u[0])
+    compile_se = time.perf_counter() - start
+
+    error = np.abs(f_c(x[:1000], u[:1000]) - compiled.f(x[:1000], u[:1000])).max()
+    print(f"{n}-mass chain, {2*n} states, {points} points, max. difference C - symengine: {error:.2e}")
+    print(f"{'evaluator':<28}{'setup [s]':>10}{'evals/s':>14}")
+    for label, setup, function in [
+        ("C (double, batch)", compile_c, lambda: f_c(x, u)),
+        ("C (float, batch)", None, lambda: f_c32(x, u)),
+        ("symengine Lambdify", compile_se, lambda: compiled.f(x, u)),
+    ]:
+        duration = best_time(function)
+        print(f"{label:<28}{'' if setup is None else f'{setup:.3f}':>10}{points/duration:>14.3e}")
+
+    single = 10_000
+    duration = best_time(lambda: [f_c(x[k], u[k]) for k in range(single)])
+    print(f"{'C (double, single calls)':<28}{'':>10}{single/duration:>14.3e}")
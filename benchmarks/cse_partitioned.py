@@ -0,0 +1,57 @@
+""" Compares the single pass cse with the partitioned (parallel) cse of CodeElement.
+
+Usage: python benchmarks/cse_partitioned.py [n_links] [n_workers]
+
+The model is the forward kinematics (positions and velocities of every joint) of a planar n-link chain,
+which gives many outputs sharing the same trigonometric subexpressions.
+"""
+import sys
+import time
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import symengine as se
+from System_to_Matlab import DynamicSymbol, StaticSymbols
+from System_to_Matlab.Calculation import Calculation
+from System_to_Matlab.FileGenerators.MatlabElements import CodeElement
+
+
+def chain_model(n: int) -> Calculation:
+    [q, q_dot] = DynamicSymbol("q", n, 1).vars
+    lengths = StaticSymbols([f"l_{i}" for i in range(n)])
+    # the outputs do not depend on each other, so nothing has to be inlined
+    calc = Calculation(inline=False)
+    x, y = 0, 0
+    vx, vy = 0, 0
+    angle = 0
+    angle_dot = 0
+    for i in range(n):
+        angle += q[i]
+        angle_dot += q_dot[i]
+        x += lengths[i]*se.cos(angle)
+        y += lengths[i]*se.sin(angle)
+        vx += -lengths[i]*se.sin(angle)*angle_dot
+        vy += lengths[i]*se.cos(angle)*angle_dot
+        calc.addCalculation(se.Matrix(se.symbols(f"p{i}_x p{i}_y v{i}_x v{i}_y")), se.Matrix([x, y, vx, vy]))
+    return calc
+
+
+def run(n: int, mode: str, n_workers: int = None) -> tuple[float, int, int]:
+    element = CodeElement(chain_model(n), cse_mode=mode, n_workers=n_workers, clear=False)
+    start = time.perf_counter()
+    code = element.generateCode()
+    duration = time.perf_counter() - start
+    return duration, len(code), code.count("\n")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+
+    print(f"{n}-link chain, {4*n} outputs")
+    print(f"{'mode':<22}{'time [s]':>10}{'chars':>10}{'lines':>8}")
+    for mode, n_workers in [("single", None), ("partitioned", 1), ("partitioned", workers)]:
+        duration, chars, lines = run(n, mode, n_workers)
+        label = mode if n_workers is None else f"{mode} ({n_workers})"
+        print(f"{label:<22}{duration:>10.3f}{chars:>10}{lines:>8}")
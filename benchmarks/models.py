@@ -0,0 +1,129 @@
+""" Scalable reference models of the benchmarks.
+
+Every model is split into the symbolic derivation (derive) and the construction of the system from the derived
+expressions (build), so the benchmarks can time them separately.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import symengine as se
+from System_to_Matlab import DynamicSymbol, StaticSymbols, Drehmatrix, diff_t, DynamicSystem, StaticSystem
+
+
+def pendulum(n: int) -> dict:
+    """ planar n-link pendulum with point masses at the link ends and a torque in every joint, derived with rotation
+    matrices (Drehmatrix) and the projection of Newton's equations (q_ddot = M(q)^-1 (tau - h(q, q_dot)))
+    """
+    [q, q_dot, q_ddot] = DynamicSymbol("q", n, 2).vars
+    tau = DynamicSymbol("tau", n, 0).vars
+    g = StaticSymbols(["g"])[0]
+    masses = StaticSymbols([f"m_{i}" for i in range(n)])
+    lengths = StaticSymbols([f"l_{i}" for i in range(n)])
+
+    eom = se.zeros(n, 1)
+    R = se.eye(3)
+    position = se.zeros(3, 1)
+    tip = []
+    for i in range(n):
+        R = R*Drehmatrix([0, 0, q[i]])
+        position = position + R*se.Matrix([lengths[i], 0, 0])
+        velocity = diff_t(position)
+        acceleration = diff_t(velocity)
+        Jv = velocity.jacobian(q_dot)
+        eom += Jv.T*(masses[i]*acceleration + se.Matrix([0, masses[i]*g, 0]))
+        tip = position
+    M = eom.jacobian(q_ddot)
+    h = (eom - M*q_ddot).expand()
+    f = q_dot.col_join(M.LUsolve(se.Matrix(list(tau)) - h))
+
+    return {
+        "x": q.col_join(q_dot),
+        "u": se.Matrix(list(tau)),
+        "f": f,
+        "outputs": {"x_tip": tip[0], "y_tip": tip[1]},
+        "params": [g] + list(masses) + list(lengths),
+        "values": [9.81] + [1.0]*n + [0.5]*n,
+    }
+
+
+def mass_chain(n: int) -> dict:
+    """ chain of n masses connected by nonlinear (cubic) springs and dampers, the force acts on the last mass
+    """
+    [q, q_dot, q_ddot] = DynamicSymbol("q", n, 2).vars
+    [F] = DynamicSymbol("F", 1, 0).vars
+    m, c, c3, d = StaticSymbols(["m", "c", "c_3", "d"])
+
+    forces = []
+    for i in range(n):
+        left = q[i] - (q[i - 1] if i > 0 else 0)
+        left_dot = q_dot[i] - (q_dot[i - 1] if i > 0 else 0)
+        force = -c*left - c3*left**3 - d*left_dot
+        if i < n - 1:
+            right = q[i + 1] - q[i]
+            right_dot = q_dot[i + 1] - q_dot[i]
+            force += c*right + c3*right**3 + d*right_dot
+        else:
+            force += F
+        forces.append(force/m)
+
+    return {
+        "x": q.col_join(q_dot),
+        "u": se.Matrix([F]),
+        "f": q_dot.col_join(se.Matrix(forces)),
+        "outputs": {"energy": sum(m*v**2/2 for v in q_dot) + sum(c*(q[i] - (q[i - 1] if i > 0 else 0))**2/2 for i in range(n))},
+        "params": [m, c, c3, d],
+        "values": [1.0, 10.0, 1.0, 0.1],
+    }
+
+
+def build_dynamic(model: dict) -> DynamicSystem:
+    sys = DynamicSystem(model["x"], model["u"])
+    sys.addStateEquations(model["f"], False)
+    for name, expr in model["outputs"].items():
+        sys.addCalculation(se.Symbol(name), expr)
+        sys.addOutput(se.Symbol(name))
+    sys.addParameter(model["params"], model["values"])
+    return sys
+
+
+def static_kinematics(n: int) -> dict:
+    """ large StaticSystem: positions, velocities and the orientation of every joint of a spatial n-link chain
+    (alternating joint axes)
+    """
+    q = StaticSymbols([f"q_{i}" for i in range(n)])
+    q_dot = StaticSymbols([f"qd_{i}" for i in range(n)])
+    lengths = StaticSymbols([f"l_{i}" for i in range(n)])
+
+    calculations = []
+    R = se.eye(3)
+    position = se.zeros(3, 1)
+    for i in range(n):
+        angles = [0, 0, 0]
+        angles[i % 3] = q[i]
+        R = R*Drehmatrix(angles)
+        position = position + R*se.Matrix([lengths[i], 0, 0])
+        velocity = position.jacobian(se.Matrix(q))*se.Matrix(q_dot)
+        calculations.append((f"p_{i}", position))
+        calculations.append((f"v_{i}", velocity))
+    calculations.append(("R_end", R))
+
+    return {"inputs": [(se.Matrix(q), "q"), (se.Matrix(q_dot), "q_dot"), (se.Matrix(lengths), "l")], "calculations": calculations}
+
+
+def build_static(model: dict) -> StaticSystem:
+    sys = StaticSystem()
+    for input, name in model["inputs"]:
+        sys.addInput(input, name)
+    for name, expr in model["calculations"]:
+        sys.addCalculation(se.Symbol(name), expr)
+        sys.addOutput(se.Symbol(name))
+    return sys
+
+
+MODELS = {
+    "pendulum": (pendulum, build_dynamic),
+    "mass_chain": (mass_chain, build_dynamic),
+    "static_kinematics": (static_kinematics, build_static),
+}
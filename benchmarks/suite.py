@@ -0,0 +1,241 @@
+""" Benchmark suite of the generation pipeline with scalable reference models (see models.py).
+
+Usage: python benchmarks/suite.py [--models pendulum:2,3 mass_chain:10,40] [--repeat 3]
+                                  [--output results.json] [--save-baseline] [--baseline benchmarks/baseline.json]
+
+Every stage is timed separately (best of --repeat runs):
+    derive           symbolic derivation of the model (Drehmatrix, diff_t, jacobians, ...)
+    addCalculation   construction of the DynamicSystem / StaticSystem (addStateEquations, addCalculation, ...)
+    linearize        DynamicSystem.linearize (dynamic models only)
+    cse              se.cse of all expressions of the system
+    printing         matlab_code of the temporaries and the reduced expressions
+    write_MFunctions generateFile (incl. its cse) of the MFunctions
+    write_SFunction  generateFile (incl. its cse) of the SFunction (dynamic models only)
+In an additional run the peak of the python allocations (tracemalloc) of every stage is recorded, together with
+the size of the generated files and the maximum resident set size of the process.
+
+With --save-baseline the results are written to the baseline file, with --baseline they are compared with it and
+stages that are more than --threshold times slower (or use more memory) are reported as regressions
+(exit code 1), as well as generated files of a different size.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import symengine as se
+from System_to_Matlab import DynamicSystem
+from System_to_Matlab.Calculation import Calculation
+from System_to_Matlab.Printers import matlab_code
+from System_to_Matlab.Symbols import current_registry
+
+from models import MODELS
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = {"pendulum": [2, 3], "mass_chain": [10, 40], "static_kinematics": [6, 10]}
+# differences below this duration [s] are considered noise
+TIME_FLOOR = 0.05
+
+
+def code_vector(system) -> list:
+    """ all expressions of the system as they are passed to the cse of the file generators
+    """
+    if isinstance(system, DynamicSystem):
+        calcs = [system._State_Equations, system._Outputs_Calcs]
+    else:
+        calcs = [system._Equations, system._Outputs_Calcs]
+    vector = Calculation.append_Calculations(calcs)._generate_shape_index_list()[1]
+    return [] if vector is None else list(vector)
+
+
+def pipeline(name: str, n: int, directory: str):
+    """ the stages of a model as a generator of (stage, function), each function gets the result of the previous one
+    """
+    derive, build = MODELS[name]
+    yield "derive", lambda _: derive(n)
+    yield "addCalculation", build
+    dynamic = build is MODELS["pendulum"][1]
+    if dynamic:
+        yield "linearize", lambda system: (system.linearize(), system)[1]
+    yield "cse", lambda system: (system, se.cse(code_vector(system)))
+
+    def printing(previous):
+        system, (temporaries, reduced) = previous
+        registry = current_registry()
+        for var, expr in temporaries:
+            matlab_code(registry.to_printable(expr))
+        for expr in reduced:
+            matlab_code(registry.to_printable(expr))
+        return system
+    yield "printing", printing
+
+    def write(method):
+        def stage(system):
+            with working_directory(directory):
+                getattr(system, method)(name)
+            return system
+        return stage
+    yield "write_MFunctions", write("write_MFunctions")
+    if dynamic:
+        yield "write_SFunction", write("write_SFunction")
+
+
+@contextlib.contextmanager
+def working_directory(directory: str):
+    # the file generators write relative to the working directory
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+def run_stages(name: str, n: int, directory: str, memory: bool) -> dict:
+    """ runs all stages once, returns the duration [s] or the tracemalloc peak [kB] of every stage
+    """
+    results = {}
+    value = None
+    for stage, function in pipeline(name, n, directory):
+        if memory:
+            tracemalloc.start()
+            value = function(value)
+            results[stage] = tracemalloc.get_traced_memory()[1]/1024
+            tracemalloc.stop()
+        else:
+            start = time.perf_counter()
+            value = function(value)
+            results[stage] = time.perf_counter() - start
+    return results
+
+
+def benchmark(name: str, n: int, repeat: int) -> dict:
+    with tempfile.TemporaryDirectory(prefix="System_to_Matlab_bench_") as directory:
+        runs = [run_stages(name, n, directory, False) for _ in range(repeat)]
+        times = {stage: min(r[stage] for r in runs) for stage in runs[0]}
+        peaks = run_stages(name, n, directory, True)
+        files = {f: os.path.getsize(os.path.join(directory, f)) for f in sorted(os.listdir(directory))}
+    return {
+        "time_s": times,
+        "peak_kb": peaks,
+        "files_bytes": files,
+        "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "symengine": se.__version__,
+        "platform": platform.platform(),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """ returns the regressions of results compared with baseline
+    """
+    regressions = []
+    for key, current in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        for stage, value in current["time_s"].items():
+            reference = old["time_s"].get(stage)
+            if reference is not None and value > threshold*reference and value - reference > TIME_FLOOR:
+                regressions.append(f"{key} {stage}: {reference:.3f}s -> {value:.3f}s ({value/reference:.2f}x)")
+        for stage, value in current["peak_kb"].items():
+            reference = old["peak_kb"].get(stage)
+            if reference is not None and value > threshold*reference and value - reference > 1024:
+                regressions.append(f"{key} {stage}: peak {reference:.0f}kB -> {value:.0f}kB ({value/reference:.2f}x)")
+        for file, size in current["files_bytes"].items():
+            reference = old["files_bytes"].get(file)
+            if reference is not None and size != reference:
+                regressions.append(f"{key} {file}: {reference} -> {size} bytes")
+    return regressions
+
+
+def table(results: dict, baseline: dict = None) -> str:
+    stages = []
+    for r in results.values():
+        stages += [s for s in r["time_s"] if s not in stages]
+    lines = [f"{'model':<24}" + "".join(f"{s:>17}" for s in stages) + f"{'peak [kB]':>12}{'files [B]':>12}"]
+    for key, r in results.items():
+        cells = []
+        for s in stages:
+            if s not in r["time_s"]:
+                cells.append(f"{'-':>17}")
+                continue
+            cell = f"{r['time_s'][s]:.3f}"
+            reference = (baseline or {}).get(key, {}).get("time_s", {}).get(s)
+            if reference:
+                cell += f" ({r['time_s'][s]/reference:.2f}x)"
+            cells.append(f"{cell:>17}")
+        lines.append(f"{key:<24}" + "".join(cells) + f"{max(r['peak_kb'].values()):>12.0f}{sum(r['files_bytes'].values()):>12}")
+    return "\n".join(lines)
+
+
+def parse_models(specs: list[str]) -> list[tuple[str, int]]:
+    """ "pendulum:2,3" -> [("pendulum", 2), ("pendulum", 3)], a model without sizes uses the default sizes
+    """
+    runs = []
+    for spec in specs:
+        name, _, sizes = spec.partition(":")
+        if name not in MODELS:
+            raise SystemExit(f"unknown model {name}, available: {', '.join(MODELS)}")
+        runs += [(name, int(n)) for n in (sizes.split(",") if sizes else DEFAULT_SIZES[name])]
+    return runs
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", nargs="*", default=list(MODELS), help="model[:n1,n2,...], by default all models")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs (the best is used)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", nargs="?", const=BASELINE, help="compare with this baseline JSON file")
+    parser.add_argument("--save-baseline", nargs="?", const=BASELINE, help="write the results as baseline")
+    parser.add_argument("--threshold", type=float, default=1.5, help="slowdown factor reported as regression")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, n in parse_models(args.models):
+        results[f"{name}[n={n}]"] = benchmark(name, n, args.repeat)
+        print(f"{name}[n={n}] done", file=sys.stderr)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print(table(results, baseline))
+
+    document = {"meta": metadata(), "results": results}
+    for filename in (args.output, args.save_baseline):
+        if filename:
+            with open(filename, "w") as f:
+                json.dump(document, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print("REGRESSION " + line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())